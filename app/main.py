@@ -1,28 +1,77 @@
+import json
 import os
+import time
 import uuid
+from contextlib import asynccontextmanager
 from typing import Optional
-from pathlib import Path
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query, Form, Request
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
-from app.services.ocr import extract_text_from_file
-from app.services.llm import simplify_text_with_llm, generate_checklist_with_llm, explain_notice_with_llm, translate_text_with_llm
+from app.services.ocr import extract_text_from_file, iter_extracted_pages
+from app.services import pipeline
+from app.services.documents import documents
+from app.services.llm import answer_question_with_llm, explain_notice_with_llm, translate_text_with_llm
+from app.services.model_router import router as model_router
 from app.services.translate import translate_text_with_provider
-from app.utils.cleaning import clean_extracted_text
-from app.models.schemas import SimplifyRequest, SimplifyResponse, TranslateRequest, TranslateResponse, ChecklistRequest, ChecklistResponse, UploadResponse, ExplainNoticeRequest, ExplainNoticeResponse, ChecklistItem
+from app.services.speculation import speculator
+from app.services.scheduler import SchedulerRejected, SchedulingMiddleware, classify_text, client_id_from_headers, llm_scheduler, ocr_scheduler
+from app.services.usage import UsageMiddleware, get_ledger, is_admin
+from app.services.warmup import start_warm_up, warm_up_status
+from app.utils import metrics
+from app.utils.cancellation import CancelToken, run_cancellable, stream_cancellable
+from app.utils.compression import CompressionMiddleware
+from app.utils.static_files import CachedIndex, PrecompressedStaticFiles, default_build_path
+from app.models.schemas import SimplifyRequest, SimplifyResponse, TranslateRequest, TranslateResponse, ChecklistRequest, ChecklistResponse, UploadResponse, ExplainNoticeRequest, ExplainNoticeResponse, ChecklistItem, AskRequest, AskResponse
+
+try:
+    import orjson
+    _response_class = ORJSONResponse
+except Exception:
+    orjson = None
+    _response_class = JSONResponse
+
+
+def _ndjson_line(payload: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload) + b"\n"
+    return (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Preload only the configured OCR/LLM/translate backends; by default this runs in
+    # a background thread so /health is ready immediately.
+    # .br/.gz siblings of build assets are written once, by the build step or by app.server
+    # before workers start, never by each worker
+    start_warm_up()
+    yield
+    # Write usage charges still batched in memory
+    ledger = get_ledger()
+    if ledger is not None:
+        ledger.flush()
 
 
 app = FastAPI(
     title="AIDocMate API",
     description="AI-powered document simplification and analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=_response_class,
 )
 
-# Add CORS middleware
+# The last middleware added is the outermost
+# Brotli/gzip for text-heavy JSON above COMPRESSION_MIN_SIZE bytes
+app.add_middleware(CompressionMiddleware)
+# Per-tenant quotas and usage accounting; inside SchedulingMiddleware, which identifies the tenant
+app.add_middleware(UsageMiddleware)
+# Client/priority/deadline for the OCR and LLM scheduler, plus Server-Timing
+app.add_middleware(SchedulingMiddleware)
+# Add CORS middleware, outermost so responses sent by the middlewares above (e.g. a
+# quota 429) carry CORS headers too
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # In production, restrict this to your domain
@@ -31,34 +80,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.exception_handler(SchedulerRejected)
+async def scheduler_rejected_handler(request: Request, exc: SchedulerRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
 # Mount static files from the React build
-# Try inner project path first, then fallback to parent (for different repo layouts)
-_inner_build_path = Path(__file__).parent.parent / "frontend" / "build"
-_outer_build_path = Path(__file__).parent.parent.parent / "frontend" / "build"
-build_path = _inner_build_path if _inner_build_path.exists() else _outer_build_path
+build_path = default_build_path()
+_index = CachedIndex(build_path / "index.html")
 if build_path.exists():
-    app.mount("/static", StaticFiles(directory=str(build_path / "static")), name="static")
+    app.mount("/static", PrecompressedStaticFiles(directory=str(build_path / "static")), name="static")
 
 @app.get("/", response_class=HTMLResponse)
-async def root():
+async def root(request: Request):
     """Serve the React frontend"""
-    index_path = build_path / "index.html"
-    if index_path.exists():
-        with open(index_path, "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read())
+    if _index.exists():
+        return _index.response(request.headers)
     else:
         return HTMLResponse(content="<h1>AIDocMate Backend Running</h1><p>Frontend not found. Please build the React app first.</p>")
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "AIDocMate API"}
+    return {"status": "healthy", "service": "AIDocMate API", "warmup": warm_up_status()["status"]}
 
 @app.post("/upload")
 async def upload_document(
+    http_request: Request,
     file: UploadFile = File(...),
     use_vision: bool = Query(False, description="Use Google Vision API instead of Tesseract"),
     language_hint: Optional[str] = Query(default=None, description="ISO language hint for OCR, e.g., 'en', 'hi'"),
+    stream: bool = Query(False, description="Stream each page as newline-delimited JSON as soon as it is extracted"),
+    speculate: bool = Query(False, description="Precompute /simplify and /checklist in the background once the text is ready"),
 ):
     """
     Upload and extract text from a document (PDF/Image)
@@ -78,28 +135,53 @@ async def upload_document(
                 "file_type": file.content_type,
             }
 
-        # Extract text
-        text = extract_text_from_file(
+        if stream:
+            token = CancelToken()
+            pages = iter_extracted_pages(
+                file_bytes=file_bytes,
+                filename=file.filename or "uploaded",
+                use_vision=use_vision,
+                language_hint=language_hint,
+                cancel_token=token,
+            )
+            return StreamingResponse(
+                stream_cancellable(_stream_upload_pages(pages, file.filename, len(file_bytes), file.content_type, speculate), token),
+                media_type="application/x-ndjson",
+            )
+
+        # Extract cleaned text (off the event loop; cancelled if the client disconnects)
+        extracted_text = await run_cancellable(
+            http_request,
+            extract_text_from_file,
             file_bytes=file_bytes,
             filename=file.filename or "uploaded",
             use_vision=use_vision,
             language_hint=language_hint,
         )
-        extracted_text = clean_extracted_text(text)
         print(f"[upload] extracted length = {len(extracted_text or '')}")
         if extracted_text:
             print(f"[upload] first 100 chars: {extracted_text[:100]}...")
         
         if not extracted_text:
             extracted_text = "Could not extract text."
+            document_id = None
+            speculating = []
+        else:
+            # Index now so /ask can refer to the document by id
+            document_id = (await run_in_threadpool(documents.register, extracted_text)).document_id
+            speculating = pipeline.speculate(extracted_text) if speculate else []
         
         return {
             "extracted_text": extracted_text,
             "file_name": file.filename,
             "file_size": file.size,
             "file_type": file.content_type,
+            "document_id": document_id,
+            "speculating": speculating,
         }
         
+    except SchedulerRejected:
+        raise
     except Exception:
         return {
             "extracted_text": "Could not extract text.",
@@ -108,17 +190,74 @@ async def upload_document(
             "file_type": file.content_type or "unknown",
         }
 
+def _stream_upload_pages(pages, file_name: Optional[str], file_size: int, file_type: Optional[str], speculate: bool = False):
+    """
+    NDJSON body for /upload?stream=true: one {"type": "page"} line per page as soon as it
+    is cleaned, then a {"type": "done"} summary. Runs in Starlette's threadpool; when the
+    client disconnects, iteration stops and the remaining pages are never extracted.
+    """
+    start = time.perf_counter()
+    count = 0
+    extracted = 0
+    texts = []
+    try:
+        for page in pages:
+            # Already cleaned page by page (TextCleaner) inside iter_extracted_pages
+            text = page.text
+            count += 1
+            extracted += len(text)
+            if text:
+                texts.append(text)
+            yield _ndjson_line({
+                "type": "page",
+                "page": page.page,
+                "text": text,
+                "method": page.method,
+                "elapsed_ms": round(page.elapsed_ms, 1),
+            })
+    except SchedulerRejected as e:
+        yield _ndjson_line({"type": "error", "detail": str(e), "status": e.status_code, "pages": count})
+        return
+    except Exception as e:
+        print(f"[upload.stream] extraction failed after {count} page(s): {e}")
+        yield _ndjson_line({"type": "error", "detail": "Could not extract text.", "pages": count})
+        return
+    document_id = None
+    speculating = []
+    if texts:
+        # Same text the client assembles from the page lines (pages separated by form
+        # feeds, as extract_text_from_file does), so speculative results match
+        full_text = "\f".join(texts)
+        document_id = documents.register(full_text).document_id
+        if speculate:
+            speculating = pipeline.speculate(full_text)
+    yield _ndjson_line({
+        "type": "done",
+        "pages": count,
+        "extracted_length": extracted,
+        "document_id": document_id,
+        "speculating": speculating,
+        "file_name": file_name,
+        "file_size": file_size,
+        "file_type": file_type,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    })
+
 @app.post("/simplify")
-async def simplify_document(request: SimplifyRequest):
+async def simplify_document(request: SimplifyRequest, http_request: Request):
     """
     Simplify complex document text using AI
     """
+    classify_text(len(request.text))
     try:
-        result = simplify_text_with_llm(
+        result, meta = await run_cancellable(
+            http_request,
+            pipeline.simplify,
             text=request.text,
             language=request.language,
             reading_level=request.reading_level,
             use_bullets=request.use_bullets,
+            incremental=request.incremental,
         )
         
         if not result.text:
@@ -134,8 +273,11 @@ async def simplify_document(request: SimplifyRequest):
             "original_length": len(request.text),
             "simplified_length": len(result.text),
             "language": result.language,
+            **meta,
         }
         
+    except SchedulerRejected:
+        raise
     except Exception:
         return {
             "simplified_text": "Sorry, we couldn't simplify the text right now.",
@@ -145,49 +287,66 @@ async def simplify_document(request: SimplifyRequest):
         }
 
 @app.post("/translate")
-async def translate_document(request: TranslateRequest):
+async def translate_document(
+    request: TranslateRequest,
+    http_request: Request,
+    echo: bool = Query(True, description="Echo original_text back in the response; set false to halve the payload"),
+):
     """
     Translate document text to target language
     """
+    original = {"original_text": request.text} if echo else {}
+    classify_text(len(request.text))
     try:
         # Prefer LLM-based translation when OpenAI is configured; fallback to provider
-        translated_text = translate_text_with_llm(text=request.text, target_language=request.target_language)
+        meta = {}
+        if request.incremental:
+            translated_text, meta = await run_cancellable(http_request, pipeline.translate, text=request.text, target_language=request.target_language)
+        else:
+            translated_text = await run_cancellable(http_request, translate_text_with_llm, text=request.text, target_language=request.target_language)
         provider = "openai"
         
         if not translated_text:
             return {
                 "translated_text": "Sorry, we couldn't translate the text right now.",
-                "original_text": request.text,
+                **original,
                 "source_language": "auto",
                 "target_language": request.target_language,
             }
         
         return {
             "translated_text": translated_text,
-            "original_text": request.text,
+            **original,
             "source_language": "auto",
             "target_language": request.target_language,
             "provider": provider,
+            **meta,
         }
         
+    except SchedulerRejected:
+        raise
     except Exception:
         return {
             "translated_text": "Sorry, we couldn't translate the text right now.",
-            "original_text": request.text,
+            **original,
             "source_language": "auto",
             "target_language": request.target_language,
         }
 
 @app.post("/checklist")
-async def generate_checklist(request: ChecklistRequest):
+async def generate_checklist(request: ChecklistRequest, http_request: Request):
     """
     Generate checklist of required documents
     """
+    classify_text(len(request.text))
     try:
-        checklist = generate_checklist_with_llm(
+        checklist, meta = await run_cancellable(
+            http_request,
+            pipeline.checklist,
             text=request.text,
             document_type=request.document_type,
             context=request.context,
+            incremental=request.incremental,
         )
         
         if not checklist or not checklist.items:
@@ -203,8 +362,11 @@ async def generate_checklist(request: ChecklistRequest):
             "items": [item.model_dump() for item in checklist.items],
             "total_items": len(checklist.items),
             "message": "Checklist generated successfully",
+            **meta,
         }
         
+    except SchedulerRejected:
+        raise
     except Exception:
         return {
             "document_type": request.document_type,
@@ -214,12 +376,13 @@ async def generate_checklist(request: ChecklistRequest):
         }
 
 @app.post("/explain")
-async def explain_notice(request: ExplainNoticeRequest):
+async def explain_notice(request: ExplainNoticeRequest, http_request: Request):
     """
     Explain legal notices and suggest next steps
     """
+    classify_text(len(request.text))
     try:
-        explanation = explain_notice_with_llm(text=request.text, language=request.language)
+        explanation = await run_cancellable(http_request, explain_notice_with_llm, text=request.text, language=request.language)
         
         if not explanation or not explanation.steps:
             return {
@@ -236,6 +399,8 @@ async def explain_notice(request: ExplainNoticeRequest):
             "urgency_level": "normal",
         }
         
+    except SchedulerRejected:
+        raise
     except Exception:
         return {
             "summary": "Sorry, we couldn't explain the notice right now.",
@@ -244,6 +409,76 @@ async def explain_notice(request: ExplainNoticeRequest):
             "urgency_level": "unknown",
         }
 
+@app.post("/ask", response_model=AskResponse)
+async def ask_document(request: AskRequest, http_request: Request):
+    """
+    Answer a question about a document using only its most relevant passages
+    """
+    if request.document_id:
+        # Persisted documents are shared by all workers; the index may need rebuilding here
+        document = await run_in_threadpool(documents.get, request.document_id)
+        if document is None and not request.text:
+            raise HTTPException(status_code=404, detail="Unknown document_id; upload the document again or send its text")
+        index = document.index if document is not None else (await run_in_threadpool(documents.register, request.text)).index
+    elif request.text:
+        index = (await run_in_threadpool(documents.register, request.text)).index
+    else:
+        raise HTTPException(status_code=400, detail="Provide a document_id or the document text")
+
+    hits = index.search(request.question, k=request.k)
+    passages = [chunk.text for chunk, _ in hits]
+    context_chars = sum(len(p) for p in passages)
+    metrics.observe("ask.context_chars", context_chars)
+    classify_text(context_chars)
+    try:
+        answer = await run_cancellable(
+            http_request,
+            answer_question_with_llm,
+            question=request.question,
+            passages=passages,
+            language=request.language,
+        )
+    except SchedulerRejected:
+        raise
+    except Exception:
+        answer = "Sorry, we couldn't answer the question right now."
+
+    return {
+        "answer": answer,
+        "passages": [{"chunk": chunk.index, "score": round(score, 3), "text": chunk.text} for chunk, score in hits],
+        "context_chars": context_chars,
+    }
+
+@app.get("/metrics")
+async def metrics_snapshot():
+    """Process-local counters and timings (cancelled work, scheduler queues, etc.)"""
+    return {
+        **metrics.snapshot(),
+        "scheduler": {"ocr": ocr_scheduler.stats(), "llm": llm_scheduler.stats()},
+        "llm_models": model_router.stats(),
+        "speculation": speculator.stats(),
+    }
+
+@app.get("/usage")
+async def usage_report(
+    http_request: Request,
+    days: int = Query(1, ge=1, le=366, description="Number of UTC days to include, ending today"),
+    tenant: Optional[str] = Query(default=None, description="Only this tenant, e.g. 'key:1a2b3c4d5e6f' (admin only)"),
+):
+    """
+    Tokens, OCR pages, cache savings and latency with daily quotas, for the caller's own
+    tenant; with X-Admin-Key (USAGE_ADMIN_KEY) for every tenant or the one requested
+    """
+    ledger = get_ledger()
+    if ledger is None:
+        raise HTTPException(status_code=404, detail="Usage accounting is disabled (USAGE_ACCOUNTING=false)")
+    if not is_admin(http_request.headers):
+        own = client_id_from_headers(http_request.headers, http_request.client.host if http_request.client else None)
+        if tenant not in (None, own):
+            raise HTTPException(status_code=403, detail="Only your own usage can be reported without X-Admin-Key")
+        tenant = own
+    return await run_in_threadpool(ledger.report, days=days, tenant=tenant)
+
 @app.get("/debug/openai")
 async def debug_openai():
     """Debug endpoint to check OpenAI configuration"""
@@ -13,6 +13,7 @@ class SimplifyRequest(BaseModel):
 	language: str = Field(default="en", min_length=2, max_length=10, description="Language for simplified output (e.g., 'en' or 'hi')")
 	reading_level: str = Field(default="basic", description="Reading level: basic, intermediate, advanced")
 	use_bullets: bool = Field(default=True, description="Return bullet-point summary")
+	incremental: bool = Field(default=False, description="Reuse cached per-chunk results from earlier revisions of this document")
 
 
 class SimplifyResponse(BaseModel):
@@ -24,6 +25,7 @@ class SimplifyResponse(BaseModel):
 class TranslateRequest(BaseModel):
 	text: str = Field(..., min_length=1)
 	target_language: str = Field(..., min_length=2, max_length=10, description="Target language code, e.g., 'hi' or 'mr'")
+	incremental: bool = Field(default=False, description="Reuse cached per-chunk results from earlier revisions of this document")
 
 
 class TranslateResponse(BaseModel):
@@ -36,6 +38,7 @@ class ChecklistRequest(BaseModel):
 	text: str = Field(..., min_length=1)
 	document_type: Optional[str] = Field(default=None, description="e.g., 'PAN Application', 'Scholarship Form'")
 	context: Optional[str] = Field(default=None, description="User context: student, farmer, job seeker, etc.")
+	incremental: bool = Field(default=False, description="Reuse cached per-chunk results from earlier revisions of this document")
 
 
 class ChecklistItem(BaseModel):
@@ -60,4 +63,24 @@ class ExplainNoticeRequest(BaseModel):
 class ExplainNoticeResponse(BaseModel):
 	language: str
 	steps: List[str]
-	next_actions: List[str] 
\ No newline at end of file
+	next_actions: List[str] 
+
+
+class AskRequest(BaseModel):
+	question: str = Field(..., min_length=1)
+	document_id: Optional[str] = Field(default=None, description="ID returned by /upload")
+	text: Optional[str] = Field(default=None, description="Document text, if it was not uploaded")
+	k: int = Field(default=4, ge=1, le=20, description="Number of passages sent to the model")
+	language: str = Field(default="en", min_length=2, max_length=10)
+
+
+class AskPassage(BaseModel):
+	chunk: int
+	score: float
+	text: str
+
+
+class AskResponse(BaseModel):
+	answer: str
+	passages: List[AskPassage]
+	context_chars: int
@@ -1,7 +1,31 @@
 from typing import List, Optional
 
+from app.services.scheduler import current_job
+from app.utils.boilerplate import strip_for_prompt
 
-def build_simplify_messages(text: str, language: str = "en", reading_level: str = "basic", use_bullets: bool = True) -> List[dict]:
+
+def _prompt_text(text: str) -> str:
+	"""Document text with page furniture removed; tokens saved are reported on the request."""
+	result = strip_for_prompt(text)
+	job = current_job()
+	if job is not None:
+		job.prompt_tokens_saved += result.tokens_saved
+	return result.text
+
+
+def _previous_hint(previous: Optional[str]) -> str:
+	"""An earlier answer for a near-identical document, offered as a starting point only."""
+	if not previous:
+		return ""
+	return (
+		"\n\nA near-identical version of this document was answered earlier as below. Reuse its wording where "
+		"the text still says the same thing, but every fact (names, dates, amounts, documents) must come from the "
+		f"text above; correct or drop anything that differs.\n\nEarlier answer:\n{previous}"
+	)
+
+
+def build_simplify_messages(text: str, language: str = "en", reading_level: str = "basic", use_bullets: bool = True, previous: Optional[str] = None) -> List[dict]:
+	text = _prompt_text(text)
 	style = "bullet points" if use_bullets else "short paragraphs"
 	return [
 		{
@@ -16,19 +40,22 @@ def build_simplify_messages(text: str, language: str = "en", reading_level: str
 			"content": (
 				f"Simplify the following text for a {reading_level} reader in language code '{language}'. "
 				f"Use {style}. Include key actions, deadlines, eligibility, and required fees/documents if present.\n\n{text}"
+				f"{_previous_hint(previous)}"
 			),
 		},
 	]
 
 
 def build_explain_notice_messages(text: str, language: str = "en") -> List[dict]:
+	text = _prompt_text(text)
 	return [
 		{"role": "system", "content": "You explain legal/government notices step-by-step in clear plain language for Indian citizens."},
 		{"role": "user", "content": f"Explain this notice step-by-step in '{language}' and list next steps and deadlines:\n\n{text}"},
 	]
 
 
-def build_checklist_messages(text: str, document_type: Optional[str] = None, context: Optional[str] = None) -> List[dict]:
+def build_checklist_messages(text: str, document_type: Optional[str] = None, context: Optional[str] = None, previous: Optional[str] = None) -> List[dict]:
+	text = _prompt_text(text)
 	context_str = f" for {context}" if context else ""
 	doc_str = f" ({document_type})" if document_type else ""
 	instruction = (
@@ -38,5 +65,45 @@ def build_checklist_messages(text: str, document_type: Optional[str] = None, con
 	)
 	return [
 		{"role": "system", "content": "You generate precise checklists for Indian government/legal procedures."},
-		{"role": "user", "content": f"Create a checklist{context_str}{doc_str}. {instruction} Text:\n\n{text}"},
-	] 
\ No newline at end of file
+		{"role": "user", "content": f"Create a checklist{context_str}{doc_str}. {instruction} Text:\n\n{text}{_previous_hint(previous)}"},
+	] 
+
+
+def build_translate_messages(text: str, target_language: str = "hi") -> List[dict]:
+	text = _prompt_text(text)
+	return [
+		{"role": "system", "content": "You are a helpful translator. Translate the user's input into the requested target language without adding extra commentary."},
+		{"role": "user", "content": f"Translate the following text into {target_language}.\n\n{text}"},
+	]
+
+
+def build_ask_messages(question: str, passages: List[str], language: str = "en") -> List[dict]:
+	context = "\n\n".join(f"[{i + 1}] {_prompt_text(passage)}" for i, passage in enumerate(passages))
+	return [
+		{
+			"role": "system",
+			"content": (
+				"You are AIDocMate. Answer questions about Indian government and legal documents using only the "
+				"numbered excerpts provided. Cite excerpt numbers like [1]. If the excerpts do not contain the answer, say so."
+			),
+		},
+		{"role": "user", "content": f"Excerpts:\n\n{context}\n\nQuestion: {question}\nAnswer in language code '{language}'."},
+	]
+
+
+def build_extract_fields_messages(passages: List[str], fields: dict) -> List[dict]:
+	wanted = "\n".join(f"- {name}: {description}" for name, description in fields.items())
+	excerpt = "\n\n".join(_prompt_text(passage) for passage in passages)
+	return [
+		{
+			"role": "system",
+			"content": "You extract field values from Indian government forms and notices. Only output valid JSON.",
+		},
+		{
+			"role": "user",
+			"content": (
+				f"Return a JSON object with exactly these keys, using null when a value is not stated:\n{wanted}\n\n"
+				f"Text:\n\n{excerpt}"
+			),
+		},
+	]
@@ -0,0 +1,179 @@
+"""
+Production launcher for the AIDocMate API.
+
+Runs gunicorn with uvicorn workers when gunicorn is installed (POSIX), otherwise
+falls back to uvicorn's own multi-process supervisor (e.g. on Windows).
+Everything is configured through environment variables:
+
+    HOST / PORT                bind address (default 0.0.0.0:8000)
+    WEB_CONCURRENCY            worker processes (default: CPU count, max 8)
+    SERVER_LOOP / SERVER_HTTP  event loop / HTTP parser (default uvloop / httptools when installed)
+    PRELOAD_APP                import the app and warm backends before forking (default true;
+                               WARMUP=off still skips the warm-up)
+    MAX_REQUESTS               recycle a worker after this many requests (default 1000, 0 = never)
+    MAX_REQUESTS_JITTER        random spread so workers don't recycle together (default 100)
+    GRACEFUL_TIMEOUT           seconds to drain in-flight requests on SIGTERM (default 30)
+    WORKER_TIMEOUT             seconds before a silent worker is killed (default 120)
+    KEEPALIVE                  keep-alive timeout in seconds (default 5)
+    BACKLOG                    listen backlog (default 2048)
+    LOG_LEVEL                  default info
+    PRECOMPRESS_STATIC         write missing .br/.gz build assets once before workers start (default true)
+"""
+
+import importlib.util
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+APP_IMPORT_PATH = "app.main:app"
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in {"1", "true", "yes"}
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+@dataclass
+class ServerSettings:
+    host: str
+    port: int
+    workers: int
+    loop: str
+    http: str
+    preload_app: bool
+    max_requests: int
+    max_requests_jitter: int
+    graceful_timeout: int
+    worker_timeout: int
+    keepalive: int
+    backlog: int
+    log_level: str
+
+
+def load_settings() -> ServerSettings:
+    """Read launcher settings from the environment."""
+    return ServerSettings(
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=_env_int("PORT", 8000),
+        workers=max(1, _env_int("WEB_CONCURRENCY", min(os.cpu_count() or 1, 8))),
+        loop=os.getenv("SERVER_LOOP") or ("uvloop" if _installed("uvloop") else "asyncio"),
+        http=os.getenv("SERVER_HTTP") or ("httptools" if _installed("httptools") else "h11"),
+        preload_app=_env_bool("PRELOAD_APP", True),
+        max_requests=max(0, _env_int("MAX_REQUESTS", 1000)),
+        max_requests_jitter=max(0, _env_int("MAX_REQUESTS_JITTER", 100)),
+        graceful_timeout=_env_int("GRACEFUL_TIMEOUT", 30),
+        worker_timeout=_env_int("WORKER_TIMEOUT", 120),
+        keepalive=_env_int("KEEPALIVE", 5),
+        backlog=_env_int("BACKLOG", 2048),
+        log_level=os.getenv("LOG_LEVEL", "info"),
+    )
+
+
+def gunicorn_options(settings: ServerSettings) -> Dict[str, object]:
+    return {
+        "bind": f"{settings.host}:{settings.port}",
+        "workers": settings.workers,
+        "worker_class": "app.server.AIDocMateWorker",
+        "preload_app": settings.preload_app,
+        "max_requests": settings.max_requests,
+        "max_requests_jitter": settings.max_requests_jitter,
+        "graceful_timeout": settings.graceful_timeout,
+        "timeout": settings.worker_timeout,
+        "keepalive": settings.keepalive,
+        "backlog": settings.backlog,
+        "loglevel": settings.log_level,
+        "accesslog": "-",
+    }
+
+
+try:
+    from gunicorn.app.base import BaseApplication
+    from uvicorn.workers import UvicornWorker
+    _has_gunicorn = True
+except Exception:
+    _has_gunicorn = False
+
+
+if _has_gunicorn:
+
+    class AIDocMateWorker(UvicornWorker):
+        """Uvicorn worker pinned to the loop/parser chosen by SERVER_LOOP/SERVER_HTTP."""
+
+        _settings = load_settings()
+        CONFIG_KWARGS = {"loop": _settings.loop, "http": _settings.http}
+
+    class _GunicornServer(BaseApplication):
+        def __init__(self, settings: ServerSettings):
+            self.settings = settings
+            super().__init__()
+
+        def load_config(self):
+            for key, value in gunicorn_options(self.settings).items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+
+            if self.settings.preload_app:
+                # Warm backends in the master so every forked worker shares the
+                # already-imported modules instead of importing them per process.
+                # WARMUP=off skips it here too, as it does in the app lifespan.
+                from app.services.warmup import warm_up_backends, warm_up_disabled
+
+                if not warm_up_disabled():
+                    warm_up_backends()
+            return app
+
+
+def precompress_static() -> int:
+    """Precompress the frontend build once, in the launcher, so workers never write it concurrently."""
+    if not _env_bool("PRECOMPRESS_STATIC", True):
+        return 0
+    from app.utils.static_files import default_build_path, precompress_directory
+
+    return precompress_directory(default_build_path())
+
+
+def run(settings: Optional[ServerSettings] = None) -> None:
+    settings = settings or load_settings()
+    precompress_static()
+    print(
+        f"[server] {settings.workers} worker(s) on {settings.host}:{settings.port} "
+        f"loop={settings.loop} http={settings.http} max_requests={settings.max_requests}"
+    )
+    if _has_gunicorn and os.name != "nt":
+        _GunicornServer(settings).run()
+        return
+
+    # Fallback: uvicorn's supervisor. It spawns workers from the import string, so
+    # the app is not preloaded and max-requests recycling has no jitter.
+    import uvicorn
+
+    uvicorn.run(
+        APP_IMPORT_PATH,
+        host=settings.host,
+        port=settings.port,
+        workers=settings.workers,
+        loop=settings.loop,
+        http=settings.http,
+        limit_max_requests=settings.max_requests or None,
+        timeout_keep_alive=settings.keepalive,
+        timeout_graceful_shutdown=settings.graceful_timeout,
+        backlog=settings.backlog,
+        log_level=settings.log_level,
+    )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,124 @@
+"""
+Registry of uploaded documents.
+
+/upload registers the cleaned text under a content-derived document_id so later calls
+(/ask, ...) can refer to the document without resending it. The text is persisted in
+SQLite under AIDOCMATE_DATA_DIR (up to DOCUMENT_STORE_PERSIST_MAX documents, least
+recently registered dropped first), so a document uploaded through one worker can be
+asked about through any other. Each worker keeps the BM25 chunk indexes of its
+DOCUMENT_STORE_MAX most recently used documents in memory and rebuilds the rest from the
+stored text on demand.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from app.services.near_duplicates import data_dir
+from app.services.retrieval import BM25Index
+from app.utils.chunking import split_into_chunks
+
+_max_documents = int(os.getenv("DOCUMENT_STORE_MAX", "256"))
+_max_persisted = int(os.getenv("DOCUMENT_STORE_PERSIST_MAX", "10000"))
+
+
+@dataclass
+class Document:
+	document_id: str
+	text: str
+	index: BM25Index
+
+
+def document_id_for(text: str) -> str:
+	return hashlib.sha1(text.encode("utf-8")).hexdigest()[:20]
+
+
+class DocumentStore:
+	def __init__(self, path: Optional[Path] = None, max_documents: int = _max_documents, max_persisted: int = _max_persisted):
+		self.path = Path(path) if path is not None else None
+		self.max_documents = max_documents
+		self.max_persisted = max_persisted
+		self._documents: "OrderedDict[str, Document]" = OrderedDict()
+		self._lock = threading.Lock()
+		self._db_lock = threading.Lock()
+		self._db: Optional[sqlite3.Connection] = None
+
+	def _connect(self) -> sqlite3.Connection:
+		"""Open the SQLite file on first use (caller holds _db_lock), so importing the module writes nothing."""
+		if self._db is None:
+			path = self.path or data_dir() / "documents.sqlite3"
+			path.parent.mkdir(parents=True, exist_ok=True)
+			db = sqlite3.connect(str(path), check_same_thread=False)
+			db.execute("PRAGMA journal_mode=WAL")
+			db.execute("CREATE TABLE IF NOT EXISTS documents (document_id TEXT PRIMARY KEY, text TEXT NOT NULL, registered REAL NOT NULL)")
+			db.execute("CREATE INDEX IF NOT EXISTS documents_registered ON documents (registered)")
+			db.commit()
+			self._db = db
+		return self._db
+
+	def _cache(self, document: Document) -> Document:
+		with self._lock:
+			self._documents[document.document_id] = document
+			self._documents.move_to_end(document.document_id)
+			while len(self._documents) > self.max_documents:
+				self._documents.popitem(last=False)
+		return document
+
+	def _cached(self, document_id: str) -> Optional[Document]:
+		with self._lock:
+			document = self._documents.get(document_id)
+			if document is not None:
+				self._documents.move_to_end(document_id)
+			return document
+
+	def register(self, text: str) -> Document:
+		document_id = document_id_for(text)
+		try:
+			with self._db_lock:
+				db = self._connect()
+				db.execute(
+					"INSERT INTO documents (document_id, text, registered) VALUES (?, ?, ?) ON CONFLICT (document_id) DO UPDATE SET registered = excluded.registered",
+					(document_id, text, time.time()),
+				)
+				db.execute(
+					"DELETE FROM documents WHERE document_id IN (SELECT document_id FROM documents ORDER BY registered DESC LIMIT -1 OFFSET ?)",
+					(self.max_persisted,),
+				)
+				db.commit()
+		except sqlite3.Error as e:
+			print(f"[documents.register] not persisted, {document_id} is only known to this worker: {e}")
+		existing = self._cached(document_id)
+		if existing is not None:
+			return existing
+		# Index outside the lock; a concurrent duplicate registration is harmless
+		return self._cache(Document(document_id, text, BM25Index(split_into_chunks(text))))
+
+	def get(self, document_id: str) -> Optional[Document]:
+		document = self._cached(document_id)
+		if document is not None:
+			return document
+		# Registered through another worker, or evicted from this worker's index cache
+		try:
+			with self._db_lock:
+				row = self._connect().execute("SELECT text FROM documents WHERE document_id = ?", (document_id,)).fetchone()
+		except sqlite3.Error as e:
+			print(f"[documents.get] lookup of {document_id} failed: {e}")
+			return None
+		if row is None:
+			return None
+		return self._cache(Document(document_id, row[0], BM25Index(split_into_chunks(row[0]))))
+
+	def close(self) -> None:
+		with self._db_lock:
+			if self._db is not None:
+				self._db.close()
+				self._db = None
+
+
+documents = DocumentStore()
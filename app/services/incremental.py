@@ -0,0 +1,155 @@
+"""
+Chunk-level incremental processing for revised documents.
+
+Departments reissue notices with small edits. With `incremental=true` the text is split
+into content-defined chunks (app.utils.chunking.content_defined_chunks) and each chunk's
+LLM output is cached in SQLite under AIDOCMATE_DATA_DIR, keyed by (kind, params, chunk
+digest). A revised document only sends its changed chunks to the LLM; the per-chunk
+outputs are then merged by the caller. Cost and latency follow the size of the edit.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from app.services.near_duplicates import data_dir, params_key
+from app.utils import metrics
+from app.utils.chunking import content_defined_chunks
+
+_max_entries = int(os.getenv("CHUNK_CACHE_MAX_ENTRIES", "200000"))
+_workers = int(os.getenv("CHUNK_WORKERS", "4"))
+_min_chunk_chars = int(os.getenv("CHUNK_MIN_CHARS", "400"))
+_max_chunk_chars = int(os.getenv("CHUNK_MAX_CHARS", "3000"))
+
+
+class ChunkCache:
+	def __init__(self, path: Path, max_entries: int = _max_entries):
+		self.path = Path(path)
+		self.max_entries = max_entries
+		self._lock = threading.Lock()
+		self._writes = 0
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+		self._db.execute("PRAGMA journal_mode=WAL")
+		self._db.execute(
+			"CREATE TABLE IF NOT EXISTS chunk_results (kind TEXT NOT NULL, params TEXT NOT NULL, digest TEXT NOT NULL, payload TEXT NOT NULL, used_at REAL NOT NULL, PRIMARY KEY (kind, params, digest))"
+		)
+		self._db.execute("CREATE INDEX IF NOT EXISTS chunk_results_used ON chunk_results (used_at)")
+		self._db.commit()
+
+	def get_many(self, kind: str, params: str, digests: List[str]) -> dict:
+		if not digests:
+			return {}
+		marks = ",".join("?" for _ in digests)
+		with self._lock:
+			rows = self._db.execute(
+				f"SELECT digest, payload FROM chunk_results WHERE kind = ? AND params = ? AND digest IN ({marks})",
+				(kind, params, *digests),
+			).fetchall()
+			if rows:
+				self._db.execute(
+					f"UPDATE chunk_results SET used_at = ? WHERE kind = ? AND params = ? AND digest IN ({','.join('?' for _ in rows)})",
+					(time.time(), kind, params, *[digest for digest, _ in rows]),
+				)
+				self._db.commit()
+		return {digest: json.loads(payload) for digest, payload in rows}
+
+	def put(self, kind: str, params: str, digest: str, payload: dict) -> None:
+		with self._lock:
+			self._db.execute(
+				"INSERT OR REPLACE INTO chunk_results (kind, params, digest, payload, used_at) VALUES (?, ?, ?, ?, ?)",
+				(kind, params, digest, json.dumps(payload, ensure_ascii=False), time.time()),
+			)
+			self._writes += 1
+			if self._writes % 500 == 0:
+				# Drop least recently used entries beyond the cap
+				self._db.execute(
+					"DELETE FROM chunk_results WHERE rowid IN (SELECT rowid FROM chunk_results ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+					(self.max_entries,),
+				)
+			self._db.commit()
+
+	def close(self) -> None:
+		with self._lock:
+			self._db.close()
+
+
+_cache: Optional[ChunkCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ChunkCache:
+	global _cache
+	if _cache is None:
+		with _cache_lock:
+			if _cache is None:
+				_cache = ChunkCache(data_dir() / "chunk_cache.sqlite3")
+	return _cache
+
+
+def process(kind: str, text: str, params: dict, run_chunk: Callable[[str], Optional[dict]]) -> Tuple[Optional[List[dict]], dict]:
+	"""
+	Per-chunk payloads for text in document order, computing only chunks missing from the
+	cache with run_chunk(chunk_text) -> payload (None means failure, which is not cached).
+	Returns (None, meta) if any chunk failed.
+	"""
+	chunks = content_defined_chunks(text, min_chars=_min_chunk_chars, max_chars=_max_chunk_chars)
+	pkey = params_key(params)
+	cache = get_cache()
+	cached = cache.get_many(kind, pkey, list({c.digest for c in chunks}))
+	todo = {}
+	for chunk in chunks:
+		if chunk.digest not in cached and chunk.digest not in todo:
+			todo[chunk.digest] = chunk.text
+
+	# Changed chunks run in parallel on this request's own threads (at most CHUNK_WORKERS),
+	# each with the caller's cancel token and job context. There is no process-wide pool to
+	# queue behind: ordering between requests is left to llm_scheduler, which sees every
+	# chunk call under the caller's client id and priority. Payloads are cached as they
+	# complete; on the first failure the chunks not yet started are cancelled and those
+	# already running are cached when they finish, without holding up the response.
+	failed = False
+	if todo:
+		executor = ThreadPoolExecutor(max_workers=min(max(1, _workers), len(todo)), thread_name_prefix="aidocmate-chunks")
+		futures = {
+			executor.submit(contextvars.copy_context().run, run_chunk, chunk_text): digest
+			for digest, chunk_text in todo.items()
+		}
+		stored = set()
+
+		def store_late(future, digest):
+			if not future.cancelled() and future.exception() is None and future.result() is not None:
+				cache.put(kind, pkey, digest, future.result())
+
+		try:
+			for future in as_completed(futures):
+				digest = futures[future]
+				payload = future.result()
+				stored.add(future)
+				if payload is None:
+					failed = True
+					break
+				cached[digest] = payload
+				cache.put(kind, pkey, digest, payload)
+		finally:
+			for future, digest in futures.items():
+				if future not in stored and not future.cancel():
+					future.add_done_callback(functools.partial(store_late, digest=digest))
+			executor.shutdown(wait=False)
+
+	reused = len(chunks) - sum(1 for c in chunks if c.digest in todo)
+	metrics.increment(f"incremental.{kind}.chunks", len(chunks))
+	metrics.increment(f"incremental.{kind}.chunks_reused", reused)
+	metrics.increment(f"incremental.{kind}.chars_processed", sum(len(t) for t in todo.values()))
+	meta = {"chunks": len(chunks), "chunks_reused": reused}
+	print(f"[incremental.{kind}] {len(chunks)} chunk(s), {reused} reused, {len(todo)} processed")
+	if failed:
+		return None, meta
+	return [cached[c.digest] for c in chunks], meta
@@ -2,22 +2,39 @@ import json
 import os
 from typing import List, Optional, Tuple
 
-try:
-	from openai import OpenAI
-	_openai_model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-except Exception:
-	OpenAI = None
-	_openai_model = "gpt-4o-mini"
+_openai_model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
+# The openai SDK is imported on first use (or by warm_up) to keep startup cheap.
+OpenAI = None
+_has_openai: Optional[bool] = None
 _client = None
 
 
+def _load_openai():
+	global OpenAI, _has_openai
+	if _has_openai is None:
+		try:
+			from openai import OpenAI as _OpenAI
+			OpenAI, _has_openai = _OpenAI, True
+		except Exception:
+			_has_openai = False
+	return OpenAI if _has_openai else None
+
+
+def warm_up() -> dict:
+	"""Preload the OpenAI SDK when an API key is configured."""
+	if not os.getenv("OPENAI_API_KEY"):
+		return {}
+	return {"openai": _load_openai() is not None}
+
+
 def _get_openai_client():
 	"""Get or create OpenAI client with current API key"""
 	global _client
 	print(f"[llm] _get_openai_client() called")
 	
 	# Check if OpenAI module is available
+	OpenAI = _load_openai()
 	if OpenAI is None:
 		print("[llm] ERROR: OpenAI module not available")
 		return None
@@ -53,8 +70,77 @@ def _get_openai_client():
 		return None
 
 
-from app.prompts import build_simplify_messages, build_checklist_messages, build_explain_notice_messages
+from app.prompts import build_simplify_messages, build_checklist_messages, build_explain_notice_messages, build_translate_messages, build_ask_messages, build_extract_fields_messages
 from app.models.schemas import SimplifyResponse, ChecklistItem, ChecklistResponse, ExplainNoticeResponse
+from app.services.model_router import router as model_router
+from app.services import usage
+from app.services.scheduler import SchedulerRejected
+from app.utils import metrics
+from app.utils.boilerplate import estimate_tokens
+from app.utils.cancellation import OperationCancelled, current_token
+
+# Errors that must reach the HTTP layer instead of becoming "AI processing failed" text
+_PROPAGATE = (OperationCancelled, SchedulerRejected)
+
+
+def llm_failed(text: Optional[str]) -> bool:
+	"""True for the placeholder texts returned when no real LLM output was produced."""
+	return not text or text.startswith("AI processing failed") or text == "No text available for processing."
+
+
+def _complete(client, model: str, messages: List[dict], temperature: float) -> str:
+	"""
+	Run one chat completion as a stream so it can be aborted mid-generation: when the
+	request's cancel token fires, the HTTP stream is closed and OperationCancelled raised.
+	Token usage from the stream's final chunk is charged to the current tenant; a stream
+	closed before that chunk (a cancelled request or a losing hedge) is charged an estimate
+	of the prompt plus what was generated. The caller (model_router) holds the
+	llm_scheduler slot.
+	"""
+	token = current_token()
+	if token is not None and token.cancelled:
+		metrics.increment("cancel.llm_calls_skipped")
+		raise OperationCancelled(token.reason)
+	stream = client.chat.completions.create(
+		model=model,
+		messages=messages,
+		temperature=temperature,
+		stream=True,
+		stream_options={"include_usage": True},
+	)
+	handle = token.add_callback(stream.close) if token is not None else 0
+	parts: List[str] = []
+	tokens_used = None
+	try:
+		for chunk in stream:
+			if token is not None and token.cancelled:
+				break
+			if chunk.choices:
+				parts.append(chunk.choices[0].delta.content or "")
+			if getattr(chunk, "usage", None) is not None:
+				tokens_used = chunk.usage
+	except Exception:
+		if token is None or not token.cancelled:
+			raise
+	finally:
+		if token is not None:
+			token.remove_callback(handle)
+		stream.close()
+	if tokens_used is not None:
+		prompt_tokens, completion_tokens = tokens_used.prompt_tokens or 0, tokens_used.completion_tokens or 0
+	else:
+		# The provider bills for the prompt and every token generated before the close
+		prompt_tokens = sum(estimate_tokens(message.get("content") or "") for message in messages)
+		completion_tokens = estimate_tokens("".join(parts))
+		metrics.increment(f"llm.{model}.estimated_usage")
+	if prompt_tokens or completion_tokens:
+		metrics.increment(f"llm.{model}.prompt_tokens", prompt_tokens)
+		metrics.increment(f"llm.{model}.completion_tokens", completion_tokens)
+		usage.charge(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+	if token is not None and token.cancelled:
+		metrics.increment("cancel.llm_calls_aborted")
+		raise OperationCancelled(token.reason)
+	return "".join(parts)
 
 
 def _chat(messages: List[dict], response_format: Optional[str] = None, temperature: float = 0.2) -> str:
@@ -65,7 +151,7 @@ def _chat(messages: List[dict], response_format: Optional[str] = None, temperatu
 		error_msg = f"OpenAI client not available. "
 		if not api_key:
 			error_msg += "OPENAI_API_KEY environment variable is not set."
-		elif OpenAI is None:
+		elif _load_openai() is None:
 			error_msg += "OpenAI module failed to import."
 		else:
 			error_msg += "Client initialization failed."
@@ -74,48 +160,29 @@ def _chat(messages: List[dict], response_format: Optional[str] = None, temperatu
 		raise RuntimeError(error_msg)
 	
 	print(f"[llm._chat] invoking OpenAI with {len(messages)} messages")
-	print(f"[llm._chat] model: {_openai_model}")
+	print(f"[llm._chat] models: {model_router.models()}")
 	print(f"[llm._chat] temperature: {temperature}")
 	print(f"[llm._chat] first 100 chars of user message: {messages[-1]['content'][:100]}...")
 	
 	try:
 		print(f"[llm._chat] Making OpenAI API call...")
-		completion = client.chat.completions.create(
-			model=_openai_model,
-			messages=messages,
-			temperature=temperature,
-		)
-		content = completion.choices[0].message.content or ""
+		# Primary model with a hedged/failover call to the secondary; see model_router
+		content = model_router.complete(lambda model: _complete(client, model, messages, temperature))
 		print(f"[llm._chat] API call successful!")
 		print(f"[llm._chat] response length = {len(content)}")
 		print(f"[llm._chat] first 100 chars of response: {content[:100]}...")
 		return content
+	except _PROPAGATE as e:
+		print(f"[llm._chat] {type(e).__name__}; not retrying")
+		raise
 	except Exception as e:
 		print(f"[llm._chat] OpenAI API call failed!")
 		print(f"[llm._chat] Error type: {type(e).__name__}")
 		print(f"[llm._chat] Error message: {e}")
-		print(f"[llm._chat] Full error details: {str(e)}")
-		
-		# Try with a fallback model if the main one fails
-		if "gpt-4o-mini" in _openai_model and "gpt-3.5-turbo" not in _openai_model:
-			print(f"[llm._chat] Trying fallback model: gpt-3.5-turbo")
-			try:
-				completion = client.chat.completions.create(
-					model="gpt-3.5-turbo",
-					messages=messages,
-					temperature=temperature,
-				)
-				content = completion.choices[0].message.content or ""
-				print(f"[llm._chat] Fallback model successful!")
-				print(f"[llm._chat] response length = {len(content)}")
-				return content
-			except Exception as fallback_error:
-				print(f"[llm._chat] Fallback model also failed: {fallback_error}")
-		
 		raise
 
 
-def simplify_text_with_llm(text: str, language: str = "en", reading_level: str = "basic", use_bullets: bool = True) -> SimplifyResponse:
+def simplify_text_with_llm(text: str, language: str = "en", reading_level: str = "basic", use_bullets: bool = True, previous: Optional[str] = None) -> SimplifyResponse:
 	if not text or not text.strip():
 		print("[llm.simplify] No text provided")
 		return SimplifyResponse(language=language, reading_level=reading_level, text="No text available for processing.")
@@ -124,7 +191,7 @@ def simplify_text_with_llm(text: str, language: str = "en", reading_level: str =
 	print(f"[llm.simplify] first 100 chars: {text[:100]}...")
 	
 	try:
-		messages = build_simplify_messages(text=text, language=language, reading_level=reading_level, use_bullets=use_bullets)
+		messages = build_simplify_messages(text=text, language=language, reading_level=reading_level, use_bullets=use_bullets, previous=previous)
 		content = _chat(messages)
 		result = SimplifyResponse(
 			language=language,
@@ -133,13 +200,15 @@ def simplify_text_with_llm(text: str, language: str = "en", reading_level: str =
 		)
 		print(f"[llm.simplify] success - result length: {len(result.text)}")
 		return result
+	except _PROPAGATE:
+		raise
 	except Exception as e:
 		error_msg = f"OpenAI API failed: {type(e).__name__} - {str(e)}"
 		print(f"[llm.simplify] {error_msg}")
 		return SimplifyResponse(language=language, reading_level=reading_level, text=f"AI processing failed: {type(e).__name__}. Please check your API key and try again.")
 
 
-def generate_checklist_with_llm(text: str, document_type: Optional[str] = None, context: Optional[str] = None) -> ChecklistResponse:
+def generate_checklist_with_llm(text: str, document_type: Optional[str] = None, context: Optional[str] = None, previous: Optional[str] = None) -> ChecklistResponse:
 	if not text or not text.strip():
 		print("[llm.checklist] No text provided")
 		return ChecklistResponse(items=[ChecklistItem(name="Info", description="No text available for processing.", mandatory=True, copies=1)])
@@ -148,7 +217,7 @@ def generate_checklist_with_llm(text: str, document_type: Optional[str] = None,
 	print(f"[llm.checklist] first 100 chars: {text[:100]}...")
 	
 	try:
-		messages = build_checklist_messages(text=text, document_type=document_type, context=context)
+		messages = build_checklist_messages(text=text, document_type=document_type, context=context, previous=previous)
 		content = _chat(messages)
 		print(f"[llm.checklist] raw response length = {len(content)}")
 		
@@ -175,6 +244,8 @@ def generate_checklist_with_llm(text: str, document_type: Optional[str] = None,
 			result = ChecklistResponse(items=items, raw=content)
 			print(f"[llm.checklist] fallback success - 1 item")
 			return result
+	except _PROPAGATE:
+		raise
 	except Exception as e:
 		error_msg = f"OpenAI API failed: {type(e).__name__} - {str(e)}"
 		print(f"[llm.checklist] {error_msg}")
@@ -211,6 +282,8 @@ def explain_notice_with_llm(text: str, language: str = "en") -> ExplainNoticeRes
 		result = ExplainNoticeResponse(language=language, steps=steps, next_actions=actions)
 		print(f"[llm.explain] success - {len(steps)} steps, {len(actions)} actions")
 		return result
+	except _PROPAGATE:
+		raise
 	except Exception as e:
 		error_msg = f"OpenAI API failed: {type(e).__name__} - {str(e)}"
 		print(f"[llm.explain] {error_msg}")
@@ -226,24 +299,60 @@ def translate_text_with_llm(text: str, target_language: str = "hi") -> str:
 	print(f"[llm.translate] first 100 chars: {text[:100]}...")
 	
 	try:
-		messages = [
-			{"role": "system", "content": "You are a helpful translator. Translate the user's input into the requested target language without adding extra commentary."},
-			{"role": "user", "content": f"Translate the following text into {target_language}.\n\n{text}"},
-		]
+		messages = build_translate_messages(text=text, target_language=target_language)
 		content = _chat(messages)
 		result = (content or "").strip()
 		print(f"[llm.translate] success - result length: {len(result)}")
 		return result
+	except _PROPAGATE:
+		raise
 	except Exception as e:
 		error_msg = f"OpenAI API failed: {type(e).__name__} - {str(e)}"
 		print(f"[llm.translate] {error_msg}")
 		return f"AI processing failed: {type(e).__name__}. Please check your API key and try again."
 
 
+def answer_question_with_llm(question: str, passages: List[str], language: str = "en") -> str:
+	if not passages:
+		print("[llm.ask] No passages retrieved")
+		return "The document does not seem to mention this."
+	
+	print(f"[llm.ask] question length = {len(question)}, passages = {len(passages)}, context chars = {sum(len(p) for p in passages)}")
+	
+	try:
+		messages = build_ask_messages(question=question, passages=passages, language=language)
+		content = _chat(messages)
+		result = (content or "").strip()
+		print(f"[llm.ask] success - answer length: {len(result)}")
+		return result
+	except _PROPAGATE:
+		raise
+	except Exception as e:
+		error_msg = f"OpenAI API failed: {type(e).__name__} - {str(e)}"
+		print(f"[llm.ask] {error_msg}")
+		return f"AI processing failed: {type(e).__name__}. Please check your API key and try again."
+
+
+def extract_fields_with_llm(passages: List[str], fields: dict) -> dict:
+	"""Small structured call that fills a template's variable fields; {} on failure."""
+	print(f"[llm.extract_fields] fields = {list(fields)}, context chars = {sum(len(p) for p in passages)}")
+	try:
+		content = _chat(build_extract_fields_messages(passages=passages, fields=fields), temperature=0)
+		payload = json.loads(content)
+		result = {k: str(v).strip() for k, v in payload.items() if k in fields and v not in (None, "")}
+		print(f"[llm.extract_fields] success - filled {len(result)} of {len(fields)}")
+		return result
+	except _PROPAGATE:
+		raise
+	except Exception as e:
+		print(f"[llm.extract_fields] failed: {type(e).__name__} - {e}")
+		return {}
+
+
 def test_environment():
 	"""Test function to debug environment variable issues"""
 	print("=== LLM Environment Test ===")
-	print(f"OpenAI module available: {OpenAI is not None}")
+	print(f"OpenAI module available: {_load_openai() is not None}")
 	print(f"OpenAI model: {_openai_model}")
 	
 	api_key = os.getenv("OPENAI_API_KEY")
@@ -265,7 +374,7 @@ def test_environment():
 	
 	print("=== End Test ===")
 	return {
-		"openai_available": OpenAI is not None,
+		"openai_available": _load_openai() is not None,
 		"api_key_set": bool(api_key),
 		"api_key_length": len(api_key) if api_key else 0,
 		"client_created": _get_openai_client() is not None
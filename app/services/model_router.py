@@ -0,0 +1,305 @@
+"""
+Routing of chat completions across LLM models.
+
+The primary model is tried first. Each attempt holds an llm_scheduler slot, and its
+latency and the hedge timer start only once the slot is acquired, so local queueing never
+looks like a slow model. If the primary has not answered by the time its recent p95
+latency has elapsed, a hedged duplicate is sent to the secondary model; whichever finishes
+first wins and the other is cancelled through its own CancelToken, which closes its HTTP
+stream (the loser's tokens are still charged, see llm._complete, and its time until
+cancellation joins the latency window as a lower bound). Hedges are capped at
+LLM_HEDGE_BUDGET of the last LLM_HEDGE_WINDOW requests, and there is no hedge when only
+one model is configured. Failures fail over to the secondary immediately. Each model has a circuit breaker: after
+LLM_BREAKER_FAILURES consecutive errors it is skipped for LLM_BREAKER_COOLDOWN seconds,
+then one trial request is let through (half-open).
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, List, Optional
+
+from app.services.scheduler import SchedulerRejected, llm_scheduler
+from app.utils import metrics
+from app.utils.cancellation import CancelToken, OperationCancelled, current_token, use_token
+
+_primary_model = os.getenv("LLM_PRIMARY_MODEL", os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
+_secondary_model = os.getenv("LLM_SECONDARY_MODEL", "gpt-3.5-turbo")
+_hedge_enabled = os.getenv("LLM_HEDGE", "true").lower() in {"1", "true", "yes"}
+_hedge_percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+_hedge_min_ms = float(os.getenv("LLM_HEDGE_MIN_MS", "1500"))
+_hedge_default_ms = float(os.getenv("LLM_HEDGE_DEFAULT_MS", "10000"))
+_hedge_min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+_hedge_budget = float(os.getenv("LLM_HEDGE_BUDGET", "0.05"))
+_hedge_window = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+_breaker_failures = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+_breaker_cooldown = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+_router_threads = int(os.getenv("LLM_ROUTER_THREADS", "32"))
+
+
+class ModelUnavailable(RuntimeError):
+	"""Every configured model is behind an open circuit breaker."""
+
+
+class ModelHealth:
+	"""Rolling latency window plus a consecutive-failure circuit breaker for one model."""
+
+	def __init__(self, name: str, window: int = 200, failures: Optional[int] = None, cooldown: Optional[float] = None):
+		self.name = name
+		self.failures_to_open = failures if failures is not None else _breaker_failures
+		self.cooldown = cooldown if cooldown is not None else _breaker_cooldown
+		self._latencies: Deque[float] = deque(maxlen=window)
+		self._lock = threading.Lock()
+		self._consecutive_failures = 0
+		self._open_until = 0.0
+		self._trial_in_flight = False
+		self.successes = 0
+		self.errors = 0
+
+	def state(self) -> str:
+		with self._lock:
+			return self._state_locked(time.monotonic())
+
+	def _state_locked(self, now: float) -> str:
+		if self._consecutive_failures < self.failures_to_open:
+			return "closed"
+		return "open" if now < self._open_until else "half_open"
+
+	def allow(self) -> bool:
+		"""Whether a request may be sent now; in half-open state only one trial at a time."""
+		with self._lock:
+			state = self._state_locked(time.monotonic())
+			if state == "closed":
+				return True
+			if state == "half_open" and not self._trial_in_flight:
+				self._trial_in_flight = True
+				return True
+			return False
+
+	def record_success(self, elapsed_ms: float) -> None:
+		with self._lock:
+			self._latencies.append(elapsed_ms)
+			self._consecutive_failures = 0
+			self._trial_in_flight = False
+			self.successes += 1
+		metrics.observe(f"llm.model.{self.name}.latency_ms", elapsed_ms)
+
+	def record_latency(self, elapsed_ms: float) -> None:
+		"""A hedge loser's time until it was cancelled: a lower bound on its latency, so the
+		window does not hold only the fast requests that won."""
+		with self._lock:
+			self._latencies.append(elapsed_ms)
+		metrics.observe(f"llm.model.{self.name}.latency_ms", elapsed_ms)
+
+	def record_failure(self) -> None:
+		with self._lock:
+			self.errors += 1
+			self._consecutive_failures += 1
+			self._trial_in_flight = False
+			opened = self._consecutive_failures >= self.failures_to_open
+			if opened:
+				self._open_until = time.monotonic() + self.cooldown
+		metrics.increment(f"llm.model.{self.name}.errors")
+		if opened:
+			metrics.increment(f"llm.model.{self.name}.breaker_opened")
+			print(f"[model_router] circuit open for {self.name} ({self.cooldown:.0f}s cooldown)")
+
+	def release_trial(self) -> None:
+		"""A half-open trial ended without a verdict (cancelled or lost a hedge)."""
+		with self._lock:
+			self._trial_in_flight = False
+
+	def latency_percentile(self, percentile: float) -> Optional[float]:
+		with self._lock:
+			if len(self._latencies) < _hedge_min_samples:
+				return None
+			ordered = sorted(self._latencies)
+		return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+	def stats(self) -> dict:
+		p50 = self.latency_percentile(50)
+		p95 = self.latency_percentile(95)
+		return {
+			"state": self.state(),
+			"successes": self.successes,
+			"errors": self.errors,
+			"p50_ms": round(p50, 1) if p50 is not None else None,
+			"p95_ms": round(p95, 1) if p95 is not None else None,
+		}
+
+
+class ModelRouter:
+	def __init__(self, primary: str = _primary_model, secondary: Optional[str] = _secondary_model, hedge: bool = _hedge_enabled):
+		self.primary = primary
+		self.secondary = secondary if secondary and secondary != primary else None
+		self.hedge = hedge
+		self._health: Dict[str, ModelHealth] = {m: ModelHealth(m) for m in self.models()}
+		# One [hedged] flag per recent request, for the hedge budget
+		self._recent: Deque[List[bool]] = deque(maxlen=_hedge_window)
+		self._recent_lock = threading.Lock()
+		self._executor = ThreadPoolExecutor(max_workers=_router_threads, thread_name_prefix="aidocmate-llm")
+
+	def models(self) -> List[str]:
+		return [self.primary] + ([self.secondary] if self.secondary else [])
+
+	def health(self, model: str) -> ModelHealth:
+		return self._health[model]
+
+	def hedge_delay_ms(self) -> float:
+		p = self._health[self.primary].latency_percentile(_hedge_percentile)
+		return max(_hedge_min_ms, p if p is not None else _hedge_default_ms)
+
+	def _track_request(self) -> List[bool]:
+		entry = [False]
+		with self._recent_lock:
+			self._recent.append(entry)
+		return entry
+
+	def _take_hedge(self, entry: List[bool]) -> bool:
+		"""Whether the hedge budget allows one more hedge; marks the request as hedged if so."""
+		with self._recent_lock:
+			hedged = sum(1 for e in self._recent if e[0])
+			if hedged >= max(1, int(_hedge_budget * len(self._recent))):
+				return False
+			entry[0] = True
+			return True
+
+	def _submit(self, call: Callable[[str], str], model: str, parent: Optional[CancelToken]):
+		token = CancelToken()
+		handle = parent.add_callback(lambda: token.cancel(parent.reason or "cancelled")) if parent is not None else 0
+		# Keep the scheduler's JobContext (client, priority, deadline) in the worker thread
+		context = contextvars.copy_context()
+		# Resolves with the monotonic time the attempt got its llm_scheduler slot
+		started: Future = Future()
+
+		def call_in_slot():
+			with use_token(token), llm_scheduler.slot():
+				started.set_result(time.monotonic())
+				return call(model)
+
+		def run():
+			try:
+				result = context.run(call_in_slot)
+			except (OperationCancelled, SchedulerRejected):
+				self._health[model].release_trial()
+				if started.done() and not (parent is not None and parent.cancelled):
+					self._health[model].record_latency((time.monotonic() - started.result()) * 1000)
+				raise
+			except Exception:
+				self._health[model].record_failure()
+				raise
+			finally:
+				if parent is not None:
+					parent.remove_callback(handle)
+			self._health[model].record_success((time.monotonic() - started.result()) * 1000)
+			return result
+
+		future = self._executor.submit(run)
+		future.model = model
+		future.token = token
+		future.started = started
+		return future
+
+	def _next_allowed(self, models: List[str]) -> Optional[str]:
+		while models:
+			model = models.pop(0)
+			if self._health[model].allow():
+				return model
+		return None
+
+	def complete(self, call: Callable[[str], str]) -> str:
+		"""
+		Run call(model) -> text with hedging and failover. Runs call in router threads
+		under a child CancelToken of the current one, so a client disconnect still aborts it.
+		"""
+		parent = current_token()
+		if parent is not None:
+			parent.raise_if_cancelled()
+		remaining = self.models()
+		first_model = self._next_allowed(remaining)
+		if first_model is None:
+			metrics.increment("llm.router.all_open")
+			raise ModelUnavailable("All LLM models are temporarily unavailable (circuit open)")
+
+		request = self._track_request()
+		first = self._submit(call, first_model, parent)
+		pending: List[Future] = [first]
+		# Hedge at most once, never after a failover, and only onto a different model
+		can_hedge = self.hedge and bool(remaining)
+		delay = self.hedge_delay_ms() / 1000
+		last_error: Optional[BaseException] = None
+		try:
+			while pending:
+				watch = list(pending)
+				hedge_in = None
+				if can_hedge:
+					if first.started.done():
+						hedge_in = max(0.0, first.started.result() + delay - time.monotonic())
+					else:
+						# Time queued for a local slot is not model latency; arm the timer once it starts
+						watch.append(first.started)
+				done, _ = wait(watch, timeout=hedge_in, return_when=FIRST_COMPLETED)
+				done = [future for future in done if future in pending]
+				if not done:
+					if hedge_in is None:
+						continue
+					can_hedge = False
+					# Check the budget first so a refused hedge leaves the secondary for failover
+					if not self._take_hedge(request):
+						metrics.increment("llm.router.hedges_over_budget")
+						continue
+					target = self._next_allowed(remaining)
+					if target is None:
+						with self._recent_lock:
+							request[0] = False
+						continue
+					metrics.increment("llm.router.hedges")
+					print(f"[model_router] {first_model} slower than {delay * 1000:.0f}ms; hedging on {target}")
+					pending.append(self._submit(call, target, parent))
+					continue
+				for future in done:
+					pending.remove(future)
+					try:
+						result = future.result()
+					except SchedulerRejected:
+						if pending:
+							continue
+						raise
+					except OperationCancelled:
+						if parent is not None and parent.cancelled:
+							raise
+						continue
+					except Exception as e:
+						last_error = e
+						print(f"[model_router] {future.model} failed: {type(e).__name__}: {e}")
+						if not pending:
+							can_hedge = False
+							backup = self._next_allowed(remaining)
+							if backup is not None:
+								metrics.increment("llm.router.failovers")
+								pending.append(self._submit(call, backup, parent))
+						continue
+					if future is not first:
+						metrics.increment("llm.router.hedge_wins")
+					return result
+		finally:
+			for future in pending:
+				future.token.cancel("superseded by another model")
+		if last_error is not None:
+			raise last_error
+		raise OperationCancelled(parent.reason if parent is not None else "cancelled")
+
+	def stats(self) -> dict:
+		return {
+			"primary": self.primary,
+			"secondary": self.secondary,
+			"hedge_delay_ms": round(self.hedge_delay_ms(), 1) if self.hedge and self.secondary else None,
+			"hedge_budget": _hedge_budget,
+			"models": {m: h.stats() for m, h in self._health.items()},
+		}
+
+
+router = ModelRouter()
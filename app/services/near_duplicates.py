@@ -0,0 +1,206 @@
+"""
+Near-duplicate reuse of LLM outputs.
+
+The same circular is often re-scanned with slightly different OCR noise. Documents are
+fingerprinted with MinHash over word shingles of the cleaned text and indexed with LSH;
+when a new document is at least NEAR_DUP_THRESHOLD similar to one the same tenant already
+processed with the same parameters, its stored simplification/checklist is offered back.
+Callers reuse it verbatim only when the two texts differ by OCR noise alone (see
+differs_only_by_noise); otherwise it is at most a hint for the LLM. Signatures, source
+texts and results persist in SQLite under AIDOCMATE_DATA_DIR, keyed by digest, and every
+worker picks up rows added by the others.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import List, Optional
+
+from app.utils import metrics
+from app.utils.minhash import LSHIndex, MinHasher
+
+_enabled = os.getenv("NEAR_DUP_ENABLED", "true").lower() in {"1", "true", "yes"}
+_threshold = float(os.getenv("NEAR_DUP_THRESHOLD", "0.85"))
+_max_entries = int(os.getenv("NEAR_DUP_MAX_ENTRIES", "100000"))
+_min_chars = int(os.getenv("NEAR_DUP_MIN_CHARS", "200"))
+NUM_PERM = 64
+BANDS = 8
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+# Two differing words count as the same OCR'd word above this character similarity
+_NOISE_RATIO = 0.75
+
+
+def data_dir() -> Path:
+	return Path(os.getenv("AIDOCMATE_DATA_DIR", "data"))
+
+
+def document_key(text: str) -> str:
+	return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def entry_key(tenant: str, text: str) -> str:
+	"""Row key of a tenant's document; the same text uploaded by two tenants is two entries."""
+	return hashlib.sha1(f"{tenant}\0{text}".encode("utf-8")).hexdigest()
+
+
+def params_key(params: dict) -> str:
+	return json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+def _words(text: str) -> List[str]:
+	return _WORD.findall(unicodedata.normalize("NFC", text).lower())
+
+
+def differs_only_by_noise(stored: str, text: str) -> bool:
+	"""
+	True when text is stored with nothing but OCR-level noise: whitespace, punctuation,
+	case, or words misread by a character or two. Any inserted or deleted word, or any
+	changed number (dates, fees, counts), means the stored output may be wrong for text.
+	"""
+	old, new = _words(stored), _words(text)
+	for op, i1, i2, j1, j2 in SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+		if op == "equal":
+			continue
+		if op != "replace" or i2 - i1 != j2 - j1:
+			return False
+		for a, b in zip(old[i1:i2], new[j1:j2]):
+			if any(char.isdigit() for char in a + b) or SequenceMatcher(None, a, b).ratio() < _NOISE_RATIO:
+				return False
+	return True
+
+
+@dataclass
+class NearDuplicateHit:
+	document_key: str
+	similarity: float
+	payload: dict
+	text: str
+
+	def reusable_for(self, text: str) -> bool:
+		return differs_only_by_noise(self.text, text)
+
+
+class NearDuplicateStore:
+	def __init__(self, path: Path, threshold: float = _threshold, max_entries: int = _max_entries):
+		self.path = Path(path)
+		self.threshold = threshold
+		self.hasher = MinHasher(NUM_PERM)
+		self.index = LSHIndex(NUM_PERM, BANDS, capacity=max_entries)
+		self._lock = threading.Lock()
+		# Highest signatures.seq loaded into this process's index
+		self._seq = 0
+		# lookup() and the remember() that follows a miss share one MinHash computation
+		self._recent_sigs: "OrderedDict[str, array]" = OrderedDict()
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+		self._db.execute("PRAGMA journal_mode=WAL")
+		self._db.execute(
+			"CREATE TABLE IF NOT EXISTS signatures (seq INTEGER PRIMARY KEY AUTOINCREMENT, doc_key TEXT NOT NULL UNIQUE, tenant TEXT NOT NULL, text TEXT NOT NULL, signature BLOB NOT NULL)"
+		)
+		self._db.execute(
+			"CREATE TABLE IF NOT EXISTS outputs (doc_key TEXT NOT NULL, kind TEXT NOT NULL, params TEXT NOT NULL, payload TEXT NOT NULL, PRIMARY KEY (doc_key, kind, params))"
+		)
+		self._db.commit()
+		with self._lock:
+			self._refresh()
+		print(f"[near_dup] loaded {len(self.index)} document signature(s) from {self.path}")
+
+	def _refresh(self) -> None:
+		"""Index signatures other workers (or earlier runs) added since the last refresh; caller holds _lock."""
+		rows = self._db.execute("SELECT seq, doc_key, signature FROM signatures WHERE seq > ? ORDER BY seq", (self._seq,)).fetchall()
+		evicted = []
+		for seq, doc_key, blob in rows:
+			sig = array("I")
+			sig.frombytes(blob)
+			_, dropped = self.index.add(doc_key, sig)
+			if dropped is not None:
+				evicted.append((dropped,))
+			self._seq = seq
+		if evicted:
+			self._db.executemany("DELETE FROM signatures WHERE doc_key = ?", evicted)
+			self._db.executemany("DELETE FROM outputs WHERE doc_key = ?", evicted)
+			self._db.commit()
+
+	def _signature(self, text: str, text_key: str) -> array:
+		with self._lock:
+			sig = self._recent_sigs.get(text_key)
+		if sig is None:
+			sig = self.hasher.signature(text)
+			with self._lock:
+				self._recent_sigs[text_key] = sig
+				if len(self._recent_sigs) > 32:
+					self._recent_sigs.popitem(last=False)
+		return sig
+
+	def lookup(self, tenant: str, text: str, kind: str, params: dict) -> Optional[NearDuplicateHit]:
+		"""Find the tenant's stored result of `kind` for a near-duplicate document with identical params."""
+		if len(text) < _min_chars:
+			return None
+		sig = self._signature(text, document_key(text))
+		pkey = params_key(params)
+		with self._lock:
+			self._refresh()
+			candidates = self.index.query(sig, threshold=self.threshold)
+			for doc_key, score in candidates:
+				row = self._db.execute(
+					"SELECT o.payload, s.text FROM outputs o JOIN signatures s ON s.doc_key = o.doc_key "
+					"WHERE o.doc_key = ? AND s.tenant = ? AND o.kind = ? AND o.params = ?",
+					(doc_key, tenant, kind, pkey),
+				).fetchone()
+				if row:
+					metrics.increment(f"near_dup.{kind}.hits")
+					return NearDuplicateHit(doc_key, score, json.loads(row[0]), row[1])
+		metrics.increment(f"near_dup.{kind}.misses")
+		return None
+
+	def remember(self, tenant: str, text: str, kind: str, params: dict, payload: dict) -> None:
+		if len(text) < _min_chars:
+			return
+		doc_key = entry_key(tenant, text)
+		sig = self._signature(text, document_key(text))
+		with self._lock:
+			self._db.execute(
+				"INSERT OR IGNORE INTO signatures (doc_key, tenant, text, signature) VALUES (?, ?, ?, ?)",
+				(doc_key, tenant, text, sig.tobytes()),
+			)
+			self._db.execute(
+				"INSERT OR REPLACE INTO outputs (doc_key, kind, params, payload) VALUES (?, ?, ?, ?)",
+				(doc_key, kind, params_key(params), json.dumps(payload, ensure_ascii=False)),
+			)
+			self._db.commit()
+			self._refresh()
+
+	def close(self) -> None:
+		with self._lock:
+			self._db.close()
+
+
+_store: Optional[NearDuplicateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[NearDuplicateStore]:
+	"""Process-wide store, opened on first use; None when disabled or unavailable."""
+	global _store, _enabled
+	if not _enabled:
+		return None
+	if _store is None:
+		with _store_lock:
+			if _store is None:
+				try:
+					_store = NearDuplicateStore(data_dir() / "near_duplicates.sqlite3")
+				except Exception as e:
+					print(f"[near_dup] disabled: {e}")
+					_enabled = False
+					return None
+	return _store
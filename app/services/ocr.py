@@ -1,33 +1,81 @@
+import contextvars
 import io
 import os
-from typing import Optional, List
-
-try:
-	import fitz  # PyMuPDF
-	_has_fitz = True
-except Exception:
-	fitz = None  # type: ignore
-	_has_fitz = False
+import subprocess
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Deque, Iterator, Optional, Tuple, Union
 
 from PIL import Image
 import pytesseract
 
-# Text-based PDF extraction (no OCR)
-try:
-	from pypdf import PdfReader  # type: ignore
-	_has_pypdf = True
-except Exception:
-	PdfReader = None  # type: ignore
-	_has_pypdf = False
+from app.services import usage
+from app.services.scheduler import classify_pages, ocr_scheduler
+from app.utils import metrics
+from app.utils.cancellation import CancelToken, OperationCancelled, current_token
+from app.utils.cleaning import TextCleaner
+
+# PyMuPDF, pypdf and Google Vision are imported on first use (or by warm_up) so
+# importing this module - and therefore app startup - stays cheap.
+fitz = None  # type: ignore
+PdfReader = None  # type: ignore
+vision = None  # type: ignore
+_has_fitz: Optional[bool] = None
+_has_pypdf: Optional[bool] = None
+_has_vision: Optional[bool] = None
+
+
+def _load_fitz():
+	global fitz, _has_fitz
+	if _has_fitz is None:
+		try:
+			import fitz as _fitz  # PyMuPDF
+			fitz, _has_fitz = _fitz, True
+		except Exception:
+			_has_fitz = False
+	return fitz if _has_fitz else None
+
+
+def _load_pypdf():
+	"""Text-based PDF extraction (no OCR)"""
+	global PdfReader, _has_pypdf
+	if _has_pypdf is None:
+		try:
+			from pypdf import PdfReader as _PdfReader  # type: ignore
+			PdfReader, _has_pypdf = _PdfReader, True
+		except Exception:
+			_has_pypdf = False
+	return PdfReader if _has_pypdf else None
 
-try:
-	from google.cloud import vision
-	_has_vision = True
-except Exception:
-	_has_vision = False
 
+def _load_vision():
+	global vision, _has_vision
+	if _has_vision is None:
+		try:
+			from google.cloud import vision as _vision
+			vision, _has_vision = _vision, True
+		except Exception:
+			_has_vision = False
+	return vision if _has_vision else None
 
-SUPPORTED_IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".webp"}
+
+def warm_up() -> dict:
+	"""Preload the OCR backends this deployment is configured to use."""
+	loaded = {
+		"pypdf": _load_pypdf() is not None,
+		"fitz": _load_fitz() is not None,
+	}
+	if os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
+		loaded["vision"] = _load_vision() is not None
+	if _auto_language:
+		loaded["tesseract_languages"] = len(_available_tesseract_languages())
+	return loaded
+
+
+SUPPORTED_IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
 SUPPORTED_PDF_EXTENSIONS = {".pdf"}
 
 
@@ -35,41 +83,173 @@ def _get_file_extension(filename: str) -> str:
 	return os.path.splitext(filename or "")[1].lower()
 
 
-def _render_pdf_to_images(file_bytes: bytes, dpi: int = 240) -> List[Image.Image]:
-	if not _has_fitz:
-		raise RuntimeError("PDF support requires PyMuPDF (fitz), which is not installed.")
-	doc = fitz.open(stream=file_bytes, filetype="pdf")
-	images: List[Image.Image] = []
-	for page_index in range(len(doc)):
+class _PdfRenderer:
+	"""Opens the PDF with PyMuPDF on first use and rasterises single pages."""
+
+	def __init__(self, file_bytes: bytes, dpi: int = 240):
+		self.file_bytes = file_bytes
+		self.dpi = dpi
+		self._doc = None
+
+	def _open(self):
+		if self._doc is None:
+			fitz = _load_fitz()
+			if fitz is None:
+				raise RuntimeError("PDF support requires PyMuPDF (fitz), which is not installed.")
+			self._doc = fitz.open(stream=self.file_bytes, filetype="pdf")
+		return self._doc
+
+	def page_count(self) -> int:
+		return len(self._open())
+
+	def render(self, page_index: int) -> Image.Image:
+		doc = self._open()
 		page = doc.load_page(page_index)
-		matrix = fitz.Matrix(dpi / 72, dpi / 72)
+		matrix = fitz.Matrix(self.dpi / 72, self.dpi / 72)
 		pix = page.get_pixmap(matrix=matrix, alpha=False)
-		img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-		images.append(img)
-	doc.close()
-	return images
-
-
-def _tesseract_ocr_image(image: Image.Image, language_hint: Optional[str]) -> str:
-	lang = language_hint or "eng"
-	# Map simple language codes to Tesseract traineddata if needed
-	lang_map = {
-		"en": "eng",
-		"hi": "hin",
-		"mr": "mar",
-		"bn": "ben",
-		"ta": "tam",
-		"te": "tel",
-		"kn": "kan",
-		"ml": "mal",
-		"gu": "guj",
-	}
-	lang = lang_map.get(lang, lang)
+		return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+	def close(self) -> None:
+		if self._doc is not None:
+			self._doc.close()
+			self._doc = None
+
+
+def _render_pdf_to_images(file_bytes: bytes, dpi: int = 240) -> Iterator[Image.Image]:
+	"""Yield page images one at a time so OCR can start before the whole PDF is rendered."""
+	renderer = _PdfRenderer(file_bytes, dpi=dpi)
+	try:
+		for page_index in range(renderer.page_count()):
+			yield renderer.render(page_index)
+	finally:
+		renderer.close()
+
+
+# Map simple language codes to Tesseract traineddata
+_LANG_MAP = {
+	"en": "eng",
+	"hi": "hin",
+	"mr": "mar",
+	"bn": "ben",
+	"ta": "tam",
+	"te": "tel",
+	"kn": "kan",
+	"ml": "mal",
+	"gu": "guj",
+}
+
+# Minimal traineddata set per script reported by Tesseract OSD. Indian documents
+# routinely mix English into regional-script text, so eng rides along.
+_SCRIPT_LANGS = {
+	"Latin": "eng",
+	"Devanagari": "hin+mar+eng",
+	"Bengali": "ben+eng",
+	"Tamil": "tam+eng",
+	"Telugu": "tel+eng",
+	"Kannada": "kan+eng",
+	"Malayalam": "mal+eng",
+	"Gujarati": "guj+eng",
+}
+
+_auto_language = os.getenv("OCR_AUTO_LANGUAGE", "true").lower() in {"1", "true", "yes"}
+_osd_max_side = int(os.getenv("OCR_OSD_MAX_SIDE", "1200"))
+_osd_min_confidence = float(os.getenv("OCR_OSD_MIN_CONFIDENCE", "1.0"))
+# Pages of one document OCR'd concurrently (still bounded globally by OCR_CONCURRENCY)
+_page_workers = max(1, int(os.getenv("OCR_PAGE_WORKERS", "4")))
+# Longest side Tesseract gets; A4 at 300 dpi is 3508 px
+_max_image_side = int(os.getenv("OCR_MAX_IMAGE_SIDE", "3600"))
+_installed_langs: Optional[set] = None
+
+
+def _available_tesseract_languages() -> set:
+	global _installed_langs
+	if _installed_langs is None:
+		try:
+			_installed_langs = set(pytesseract.get_languages())
+		except Exception:
+			_installed_langs = set()
+	return _installed_langs
+
+
+def _restrict_to_installed(lang: str) -> str:
+	installed = _available_tesseract_languages()
+	if not installed:
+		return lang
+	kept = [part for part in lang.split("+") if part in installed]
+	return "+".join(kept) if kept else "eng"
+
+
+def _detect_orientation_and_script(image: Image.Image) -> Tuple[int, Optional[str]]:
+	"""
+	Cheap OSD pass on a downscaled copy of the page.
+	Returns (clockwise rotation needed to make the page upright, script name or None).
+	"""
+	thumb = image
+	if max(image.size) > _osd_max_side:
+		thumb = image.copy()
+		thumb.thumbnail((_osd_max_side, _osd_max_side))
+	try:
+		osd = pytesseract.image_to_osd(thumb, output_type=pytesseract.Output.DICT)
+	except Exception as e:
+		# OSD fails on blank/tiny images or when osd.traineddata is missing
+		print(f"[ocr.osd] detection skipped: {e}")
+		return 0, None
+	rotate = int(osd.get("rotate", 0) or 0) % 360
+	script = osd.get("script")
+	if float(osd.get("script_conf", 0) or 0) < _osd_min_confidence:
+		script = None
+	return rotate, script
+
+
+def _prepare_for_tesseract(image: Image.Image, language_hint: Optional[str]) -> Tuple[Image.Image, str]:
+	"""Resolve the traineddata to use and, without a hint, auto-rotate the page."""
+	if language_hint:
+		return image, _LANG_MAP.get(language_hint, language_hint)
+	if not _auto_language:
+		return image, "eng"
+	rotate, script = _detect_orientation_and_script(image)
+	if rotate:
+		# PIL rotates counter-clockwise; OSD reports the clockwise correction
+		image = image.rotate(-rotate, expand=True)
+	lang = _restrict_to_installed(_SCRIPT_LANGS.get(script or "", "eng"))
+	print(f"[ocr.osd] script={script} rotate={rotate} lang={lang}")
+	return image, lang
+
+
+def _run_tesseract_cancellable(image: Image.Image, lang: str, cancel_token: CancelToken) -> str:
+	"""Run the tesseract binary directly so the process can be killed when the request is cancelled."""
+	with tempfile.TemporaryDirectory(prefix="aidocmate-ocr-") as tmp:
+		source = os.path.join(tmp, "page.png")
+		image.save(source)
+		cancel_token.raise_if_cancelled()
+		proc = subprocess.Popen(
+			[pytesseract.pytesseract.tesseract_cmd, source, "stdout", "-l", lang],
+			stdout=subprocess.PIPE,
+			stderr=subprocess.PIPE,
+		)
+		handle = cancel_token.add_callback(proc.kill)
+		try:
+			out, err = proc.communicate()
+		finally:
+			cancel_token.remove_callback(handle)
+		if cancel_token.cancelled:
+			metrics.increment("cancel.ocr_processes_killed")
+			raise OperationCancelled(cancel_token.reason)
+		if proc.returncode:
+			raise pytesseract.TesseractError(proc.returncode, err.decode("utf-8", "ignore"))
+		return out.decode("utf-8")
+
+
+def _tesseract_ocr_image(image: Image.Image, language_hint: Optional[str], cancel_token: Optional[CancelToken] = None) -> str:
+	image, lang = _prepare_for_tesseract(image, language_hint)
+	if cancel_token is not None:
+		return _run_tesseract_cancellable(image, lang, cancel_token)
 	return pytesseract.image_to_string(image, lang=lang)
 
 
 def _vision_ocr_image_bytes(image_bytes: bytes, language_hint: Optional[str]) -> str:
-	if not _has_vision:
+	vision = _load_vision()
+	if vision is None:
 		raise RuntimeError("google-cloud-vision is not installed/configured")
 	client = vision.ImageAnnotatorClient()
 	image = vision.Image(content=image_bytes)
@@ -80,48 +260,226 @@ def _vision_ocr_image_bytes(image_bytes: bytes, language_hint: Optional[str]) ->
 	return response.full_text_annotation.text or ""
 
 
-def extract_text_from_file(file_bytes: bytes, filename: str, use_vision: bool = False, language_hint: Optional[str] = None) -> str:
+@dataclass
+class PageText:
+	page: int
+	text: str
+	method: str  # "text_layer", "tesseract", "vision" or "unavailable"
+	elapsed_ms: float
+
+
+def _image_to_png_bytes(image: Image.Image) -> bytes:
+	buf = io.BytesIO()
+	image.save(buf, format="PNG")
+	return buf.getvalue()
+
+
+def _ocr_page(image: Union[Image.Image, Callable[[], Image.Image]], image_bytes: Optional[bytes], use_vision: bool, language_hint: Optional[str], cancel_token: Optional[CancelToken] = None) -> Tuple[str, str]:
 	"""
-	Extracts text from an uploaded file. Supports images and PDFs.
-	- If use_vision is True and Google Vision is available, uses Vision for OCR.
-	- Otherwise, uses Tesseract OCR.
-	- For PDFs, pages are rendered with PyMuPDF and OCR is applied per page. If PyMuPDF is not available, PDF OCR is unavailable.
+	OCR one page image; returns (text, method). Waits for an OCR slot from the scheduler.
+	`image` may be a loader, called only if pixels are needed (Tesseract, or Vision
+	without the original bytes), so a Vision upload is never decoded.
 	"""
-	ext = _get_file_extension(filename)
-
-	if ext in SUPPORTED_IMAGE_EXTENSIONS:
-		image = Image.open(io.BytesIO(file_bytes)).convert("RGB")
+	with ocr_scheduler.slot():
+		usage.charge(ocr_pages=1)
 		if use_vision:
 			try:
-				return _vision_ocr_image_bytes(file_bytes, language_hint)
+				if image_bytes is None:
+					image_bytes = _image_to_png_bytes(image() if callable(image) else image)
+				return _vision_ocr_image_bytes(image_bytes, language_hint), "vision"
 			except Exception:
 				# Fallback to Tesseract if Vision fails
-				return _tesseract_ocr_image(image, language_hint)
-		else:
-			return _tesseract_ocr_image(image, language_hint)
+				if cancel_token is not None:
+					cancel_token.raise_if_cancelled()
+		return _tesseract_ocr_image(image() if callable(image) else image, language_hint, cancel_token), "tesseract"
 
-	if ext in SUPPORTED_PDF_EXTENSIONS:
-		# 1) Try direct text extraction using pypdf (works for digital PDFs)
-		if _has_pypdf:
+
+def _check_cancelled(cancel_token: Optional[CancelToken], pages_left: int) -> None:
+	if cancel_token is not None and cancel_token.cancelled:
+		metrics.increment("cancel.pages_skipped", pages_left)
+		raise OperationCancelled(cancel_token.reason)
+
+
+def _timed_page(page: int, run: Callable[[], Tuple[str, str]]) -> Callable[[], PageText]:
+	def task() -> PageText:
+		start = time.perf_counter()
+		text, method = run()
+		return PageText(page, text, method, (time.perf_counter() - start) * 1000)
+	return task
+
+
+def _run_pages_in_order(tasks: Iterator[Callable[[], PageText]], page_total: Optional[int], cancel_token: Optional[CancelToken]) -> Iterator[PageText]:
+	"""
+	Run page tasks up to OCR_PAGE_WORKERS ahead and yield results in page order. `tasks`
+	is consumed on the calling thread, so rendering, pypdf and frame seeking stay
+	sequential; only the returned callables (OCR) run in parallel, each still waiting for
+	an ocr_scheduler slot. Producers stop early once cancel_token fires.
+	"""
+	executor = ThreadPoolExecutor(max_workers=max(1, _page_workers), thread_name_prefix="aidocmate-ocr-page")
+	pending: Deque[Future] = deque()
+	done = 0
+
+	def pages_left() -> int:
+		return page_total - done if page_total is not None else max(1, len(pending))
+
+	try:
+		for task in tasks:
+			_check_cancelled(cancel_token, pages_left())
+			# Copy per task: the job (scheduler, usage) and cancel token follow the page
+			pending.append(executor.submit(contextvars.copy_context().run, task))
+			if len(pending) >= _page_workers:
+				yield pending.popleft().result()
+				done += 1
+		while pending:
+			_check_cancelled(cancel_token, pages_left())
+			yield pending.popleft().result()
+			done += 1
+	finally:
+		executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _stopped(cancel_token: Optional[CancelToken]) -> bool:
+	return cancel_token is not None and cancel_token.cancelled
+
+
+def _iter_pdf_pages(file_bytes: bytes, use_vision: bool, language_hint: Optional[str], cancel_token: Optional[CancelToken] = None) -> Iterator[PageText]:
+	# 1) Direct text extraction using pypdf (works for digital PDFs); pages without a
+	#    text layer are rendered and OCR'd individually.
+	reader = None
+	PdfReader = _load_pypdf()
+	if PdfReader is not None:
+		try:
+			reader = PdfReader(io.BytesIO(file_bytes))
+			reader_pages = reader.pages
+			page_total = len(reader_pages)
+			classify_pages(page_total)
+		except Exception:
+			reader = None
+
+	if reader is None:
+		# 2) Unparseable or pypdf missing: OCR every rendered page
+		def rendered_tasks() -> Iterator[Callable[[], PageText]]:
+			for index, image in enumerate(_render_pdf_to_images(file_bytes)):
+				if _stopped(cancel_token):
+					return
+				yield _timed_page(index + 1, lambda image=image: _ocr_page(image, None, use_vision, language_hint, cancel_token))
+
+		try:
+			yield from _run_pages_in_order(rendered_tasks(), None, cancel_token)
+		except RuntimeError as e:
+			print(f"[extract_text_from_file] PDF OCR unavailable: {e}")
+		return
+
+	def page_tasks() -> Iterator[Callable[[], PageText]]:
+		for index, page in enumerate(reader_pages):
+			if _stopped(cancel_token):
+				return
+			start = time.perf_counter()
 			try:
-				reader = PdfReader(io.BytesIO(file_bytes))
-				text_parts: List[str] = []
-				for page in reader.pages:
-					try:
-						page_text = page.extract_text() or ""
-					except Exception:
-						page_text = ""
-					if page_text:
-						text_parts.append(page_text)
-				text = "\n".join(text_parts).strip()
-				print(f"[extract_text_from_file] PDF text length (pypdf) = {len(text)}")
-				if text:
-					return text
+				page_text = page.extract_text() or ""
 			except Exception:
-				# fall through
-				pass
+				page_text = ""
+			if page_text.strip():
+				elapsed_ms = (time.perf_counter() - start) * 1000
+				yield lambda index=index, page_text=page_text, elapsed_ms=elapsed_ms: PageText(index + 1, page_text, "text_layer", elapsed_ms)
+				continue
+			try:
+				image = renderer.render(index)
+			except RuntimeError as e:
+				print(f"[extract_text_from_file] page {index + 1} has no text layer and OCR is unavailable: {e}")
+				yield lambda index=index: PageText(index + 1, "", "unavailable", 0.0)
+				continue
+			yield _timed_page(index + 1, lambda image=image: _ocr_page(image, None, use_vision, language_hint, cancel_token))
+
+	renderer = _PdfRenderer(file_bytes)
+	try:
+		yield from _run_pages_in_order(page_tasks(), page_total, cancel_token)
+	finally:
+		renderer.close()
+
+
+def _load_pixels(image: Image.Image) -> Image.Image:
+	"""
+	Decode the current frame for Tesseract. Huge phone photos are shrunk to
+	OCR_MAX_IMAGE_SIDE: JPEG scales by 1/2-1/8 while decoding (draft), then a thumbnail
+	pass finishes. Bilevel/greyscale scans keep their mode instead of tripling into RGB.
+	"""
+	if max(image.size) > _max_image_side:
+		image.draft("RGB", (_max_image_side, _max_image_side))
+	pixels = image.convert("RGB") if image.mode not in {"1", "L", "RGB"} else image.copy()
+	if max(pixels.size) > _max_image_side:
+		metrics.increment("ocr.images_downsampled")
+		pixels.thumbnail((_max_image_side, _max_image_side))
+	return pixels
+
+
+def _iter_image_pages(file_bytes: bytes, use_vision: bool, language_hint: Optional[str], cancel_token: Optional[CancelToken] = None) -> Iterator[PageText]:
+	_check_cancelled(cancel_token, 1)
+	# Image.open only parses the header; pixels are decoded when a page needs them
+	image = Image.open(io.BytesIO(file_bytes))
+	frame_total = getattr(image, "n_frames", 1)
+	if frame_total == 1:
+		# Vision gets the uploaded bytes as-is; decoding happens only for Tesseract
+		task = _timed_page(1, lambda: _ocr_page(lambda: _load_pixels(image), file_bytes, use_vision, language_hint, cancel_token))
+		yield from _run_pages_in_order(iter([task]), 1, cancel_token)
+		return
+
+	# Multi-page TIFF (fax scans): every frame is a page. Frames are decoded here, in
+	# order, since seeking is not thread-safe; OCR runs in parallel
+	classify_pages(frame_total)
+
+	def frame_tasks() -> Iterator[Callable[[], PageText]]:
+		for index in range(frame_total):
+			if _stopped(cancel_token):
+				return
+			image.seek(index)
+			frame = _load_pixels(image)
+			yield _timed_page(index + 1, lambda frame=frame: _ocr_page(frame, None, use_vision, language_hint, cancel_token))
+
+	yield from _run_pages_in_order(frame_tasks(), frame_total, cancel_token)
+
+
+def _cleaned(pages: Iterator[PageText]) -> Iterator[PageText]:
+	"""Page texts through one TextCleaner, flushed after each page so every page is whole."""
+	cleaner = TextCleaner()
+	try:
+		for page in pages:
+			page.text = cleaner.feed(page.text) + cleaner.flush()
+			yield page
+	finally:
+		# Closing early (client gone) must still stop the page workers
+		pages.close()
+
+
+def iter_extracted_pages(file_bytes: bytes, filename: str, use_vision: bool = False, language_hint: Optional[str] = None, cancel_token: Optional[CancelToken] = None) -> Iterator[PageText]:
+	"""
+	Extract text page by page, yielding each page, cleaned (app.utils.cleaning), as soon
+	as it is done. Raises ValueError up front for unsupported file types. Once
+	cancel_token (default: the request's current token) fires, remaining pages are
+	skipped and a running Tesseract process is killed.
+	"""
+	cancel_token = cancel_token or current_token()
+	ext = _get_file_extension(filename)
+	if ext in SUPPORTED_IMAGE_EXTENSIONS:
+		return _cleaned(_iter_image_pages(file_bytes, use_vision, language_hint, cancel_token))
+	if ext in SUPPORTED_PDF_EXTENSIONS:
+		return _cleaned(_iter_pdf_pages(file_bytes, use_vision, language_hint, cancel_token))
+	raise ValueError(f"Unsupported file type: {ext}")
 
-		# 2) Friendly message when no extractable text is found
-		return "No extractable text found in this PDF. It may be a scanned image."
 
-	raise ValueError(f"Unsupported file type: {ext}") 
\ No newline at end of file
+def extract_text_from_file(file_bytes: bytes, filename: str, use_vision: bool = False, language_hint: Optional[str] = None) -> str:
+	"""
+	Extracts cleaned text from an uploaded file, pages separated by form feeds. Supports images and PDFs.
+	- If use_vision is True and Google Vision is available, uses Vision for OCR.
+	- Otherwise, uses Tesseract OCR.
+	- For PDFs, the pypdf text layer is used where present; other pages are rendered with PyMuPDF and OCR'd. If PyMuPDF is not available, PDF OCR is unavailable.
+	"""
+	pages = iter_extracted_pages(file_bytes, filename, use_vision=use_vision, language_hint=language_hint)
+	# Pages stay separated by form feeds so boilerplate stripping can see page boundaries
+	text = "\f".join(p.text for p in pages if p.text)
+	if _get_file_extension(filename) in SUPPORTED_PDF_EXTENSIONS:
+		print(f"[extract_text_from_file] PDF text length = {len(text)}")
+		if not text:
+			# Friendly message when no extractable text is found
+			return "No extractable text found in this PDF. It may be a scanned image."
+	return text
@@ -0,0 +1,182 @@
+"""
+Result reuse in front of the LLM calls behind /simplify and /checklist.
+
+Results speculatively computed after /upload are claimed first, then known templates
+(vetted output, only variable fields filled), then near-duplicates of earlier documents,
+then the LLM. A near-duplicate is scoped to the requesting tenant and served as-is only when
+the texts differ by OCR noise alone; otherwise its output is passed to the LLM as a hint. With `incremental=True` the near-duplicate layer is skipped and the LLM
+runs per content-defined chunk, reusing cached outputs for unchanged chunks (see
+app.services.incremental). Each function returns the response model plus a small `meta` dict
+describing where the result came from ("template", "near_duplicate", "llm" or "incremental", with
+"speculative": true when precomputed) so endpoints can report it.
+"""
+
+import json
+import os
+from typing import List, Optional, Tuple
+
+from app.models.schemas import ChecklistItem, ChecklistResponse, SimplifyResponse
+from app.services import incremental as incremental_chunks
+from app.services import llm
+from app.services.near_duplicates import get_store
+from app.services.scheduler import current_job
+from app.services.speculation import speculator
+from app.services.templates import get_registry
+from app.services.usage import charge_result
+
+# Parameters the frontend uses right after an upload; speculation precomputes exactly these
+SPECULATIVE_SIMPLIFY = {
+	"language": os.getenv("SPECULATE_LANGUAGE", "en"),
+	"reading_level": os.getenv("SPECULATE_READING_LEVEL", "simple"),
+	"use_bullets": True,
+}
+SPECULATIVE_CHECKLIST = {
+	"document_type": os.getenv("SPECULATE_DOCUMENT_TYPE", "government_form"),
+	"context": None,
+}
+
+
+def speculate(text: str) -> List[str]:
+	"""Start background simplify/checklist for freshly uploaded text; returns what was scheduled."""
+	scheduled = []
+	if speculator.schedule("simplify", text, SPECULATIVE_SIMPLIFY, _simplify):
+		scheduled.append("simplify")
+	if speculator.schedule("checklist", text, SPECULATIVE_CHECKLIST, _checklist):
+		scheduled.append("checklist")
+	return scheduled
+
+
+def simplify(text: str, language: str = "en", reading_level: str = "basic", use_bullets: bool = True, incremental: bool = False) -> Tuple[SimplifyResponse, dict]:
+	if not incremental:
+		speculative = speculator.claim("simplify", text, {"language": language, "reading_level": reading_level, "use_bullets": use_bullets})
+		if speculative is not None and not llm.llm_failed(speculative[0].text):
+			return _accounted(speculative[0], {**speculative[1], "speculative": True})
+	return _accounted(*_simplify(text, language, reading_level, use_bullets, incremental))
+
+
+def checklist(text: str, document_type: Optional[str] = None, context: Optional[str] = None, incremental: bool = False) -> Tuple[ChecklistResponse, dict]:
+	if not incremental:
+		speculative = speculator.claim("checklist", text, {"document_type": document_type, "context": context})
+		if speculative is not None and not _checklist_failed(speculative[0]):
+			return _accounted(speculative[0], {**speculative[1], "speculative": True})
+	return _accounted(*_checklist(text, document_type, context, incremental))
+
+
+def translate(text: str, target_language: str = "hi") -> Tuple[str, dict]:
+	"""Incremental translation: only changed chunks are translated, then rejoined in order."""
+	def run_chunk(chunk_text: str) -> Optional[dict]:
+		translated = llm.translate_text_with_llm(text=chunk_text, target_language=target_language)
+		return None if llm.llm_failed(translated) else {"text": translated}
+
+	payloads, meta = incremental_chunks.process("translate", text, {"target_language": target_language}, run_chunk)
+	charge_result(meta)
+	if payloads is None:
+		return "", {"source": "incremental", **meta}
+	return "\n\n".join(p["text"] for p in payloads), {"source": "incremental", **meta}
+
+
+def _accounted(result, meta: dict):
+	"""Charge cache reuse to the requesting tenant (see app.services.usage)."""
+	charge_result(meta)
+	return result, meta
+
+
+def _tenant() -> str:
+	job = current_job()
+	return job.client_id if job is not None else "anonymous"
+
+
+def _checklist_failed(result: ChecklistResponse) -> bool:
+	return not result.items or result.items[0].name == "Error"
+
+
+def _simplify(text: str, language: str = "en", reading_level: str = "basic", use_bullets: bool = True, incremental: bool = False) -> Tuple[SimplifyResponse, dict]:
+	registry = get_registry()
+	match = registry.match(text) if registry is not None else None
+	if match is not None:
+		result = registry.simplify(match, text, language, reading_level, use_bullets)
+		if result is not None:
+			print(f"[pipeline.simplify] serving template {match.template.id} (score {match.score:.2f})")
+			return result, {"source": "template", "template": match.template.id}
+
+	params = {"language": language, "reading_level": reading_level, "use_bullets": use_bullets}
+	if incremental:
+		def run_chunk(chunk_text: str) -> Optional[dict]:
+			part = llm.simplify_text_with_llm(text=chunk_text, language=language, reading_level=reading_level, use_bullets=use_bullets)
+			return None if llm.llm_failed(part.text) else {"text": part.text}
+
+		payloads, meta = incremental_chunks.process("simplify", text, params, run_chunk)
+		merged = ("\n" if use_bullets else "\n\n").join(p["text"] for p in payloads) if payloads is not None else ""
+		return SimplifyResponse(language=language, reading_level=reading_level, text=merged), {"source": "incremental", **meta}
+
+	store = get_store()
+	tenant = _tenant()
+	hit = store.lookup(tenant, text, "simplify", params) if store is not None else None
+	if hit is not None and hit.reusable_for(text):
+		print(f"[pipeline.simplify] reusing near-duplicate {hit.document_key[:8]} (similarity {hit.similarity:.2f})")
+		return SimplifyResponse(**hit.payload), {"source": "near_duplicate", "similarity": round(hit.similarity, 3)}
+
+	previous = hit.payload.get("text") if hit is not None else None
+	result = llm.simplify_text_with_llm(text=text, language=language, reading_level=reading_level, use_bullets=use_bullets, previous=previous)
+	if store is not None and not llm.llm_failed(result.text):
+		store.remember(tenant, text, "simplify", params, result.model_dump())
+	return result, _llm_meta(hit)
+
+
+def _checklist(text: str, document_type: Optional[str] = None, context: Optional[str] = None, incremental: bool = False) -> Tuple[ChecklistResponse, dict]:
+	registry = get_registry()
+	match = registry.match(text) if registry is not None else None
+	if match is not None:
+		result = registry.checklist(match, text, document_type, context)
+		if result is not None:
+			print(f"[pipeline.checklist] serving template {match.template.id} (score {match.score:.2f})")
+			return result, {"source": "template", "template": match.template.id}
+
+	params = {"document_type": document_type, "context": context}
+	if incremental:
+		def run_chunk(chunk_text: str) -> Optional[dict]:
+			part = llm.generate_checklist_with_llm(text=chunk_text, document_type=document_type, context=context)
+			return None if _checklist_failed(part) else {"items": [item.model_dump() for item in part.items]}
+
+		payloads, meta = incremental_chunks.process("checklist", text, params, run_chunk)
+		if payloads is None:
+			return ChecklistResponse(items=[]), {"source": "incremental", **meta}
+		return ChecklistResponse(items=_merge_items(p["items"] for p in payloads)), {"source": "incremental", **meta}
+
+	store = get_store()
+	tenant = _tenant()
+	hit = store.lookup(tenant, text, "checklist", params) if store is not None else None
+	if hit is not None and hit.reusable_for(text):
+		print(f"[pipeline.checklist] reusing near-duplicate {hit.document_key[:8]} (similarity {hit.similarity:.2f})")
+		return ChecklistResponse(**hit.payload), {"source": "near_duplicate", "similarity": round(hit.similarity, 3)}
+
+	previous = json.dumps({"items": hit.payload.get("items", [])}, ensure_ascii=False) if hit is not None else None
+	result = llm.generate_checklist_with_llm(text=text, document_type=document_type, context=context, previous=previous)
+	if store is not None and not _checklist_failed(result):
+		store.remember(tenant, text, "checklist", params, result.model_dump())
+	return result, _llm_meta(hit)
+
+
+def _llm_meta(hit) -> dict:
+	"""meta for an LLM answer; a near-duplicate that differed in substance was only a hint."""
+	if hit is None:
+		return {"source": "llm"}
+	print(f"[pipeline] near-duplicate {hit.document_key[:8]} differs beyond OCR noise; used as a prompt hint")
+	return {"source": "llm", "hint": "near_duplicate", "similarity": round(hit.similarity, 3)}
+
+
+def _merge_items(item_lists) -> List[ChecklistItem]:
+	"""Union of per-chunk checklists; the same document named twice becomes one item."""
+	merged = {}
+	for items in item_lists:
+		for raw in items:
+			item = ChecklistItem(**raw)
+			key = " ".join(item.name.lower().split())
+			existing = merged.get(key)
+			if existing is None:
+				merged[key] = item
+			else:
+				existing.mandatory = existing.mandatory or item.mandatory
+				existing.copies = max(existing.copies, item.copies)
+				existing.description = existing.description or item.description
+	return list(merged.values())
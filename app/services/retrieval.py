@@ -0,0 +1,69 @@
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+from app.utils.chunking import Chunk
+
+# \w alone splits Indic words at vowel signs and viramas (combining marks), so the
+# Brahmic script blocks U+0900-U+0DFF (Devanagari ... Sinhala) are matched explicitly.
+# Dandas (U+0964/U+0965) are punctuation and excluded.
+_TOKEN = re.compile(r"[\w\u0900-\u0963\u0966-\u0DFF\u200c\u200d]+")
+_ZERO_WIDTH = {0x200C: None, 0x200D: None}
+
+STOPWORDS = {
+	# English
+	"a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "i", "in", "is",
+	"it", "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "where", "which",
+	"who", "will", "with", "how", "do", "does", "my", "me", "can", "should",
+	# Hindi / Marathi function words
+	"का", "की", "के", "को", "में", "है", "हैं", "और", "से", "पर", "यह", "वह", "भी", "तो", "ही",
+	"क्या", "कब", "कैसे", "आहे", "आणि", "व", "हे", "या", "ला", "चा", "ची", "चे",
+}
+
+
+def tokenize(text: str) -> List[str]:
+	"""Lower-cased, NFC-normalised word tokens that keep Indic words (with matras) intact."""
+	normalized = unicodedata.normalize("NFC", text or "").lower()
+	tokens = []
+	for raw in _TOKEN.findall(normalized):
+		token = raw.translate(_ZERO_WIDTH).strip("_")
+		if token and token not in STOPWORDS:
+			tokens.append(token)
+	return tokens
+
+
+class BM25Index:
+	"""In-process Okapi BM25 over a document's chunks (inverted index of term -> postings)."""
+
+	def __init__(self, chunks: List[Chunk], k1: float = 1.5, b: float = 0.75):
+		self.chunks = chunks
+		self.k1 = k1
+		self.b = b
+		self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+		self._lengths: List[int] = []
+		for chunk in chunks:
+			counts = Counter(tokenize(chunk.text))
+			self._lengths.append(sum(counts.values()))
+			for term, tf in counts.items():
+				self._postings[term].append((chunk.index, tf))
+		self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+	def _idf(self, term: str) -> float:
+		df = len(self._postings.get(term, ()))
+		n = len(self.chunks)
+		return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+	def search(self, query: str, k: int = 4) -> List[Tuple[Chunk, float]]:
+		scores: Dict[int, float] = defaultdict(float)
+		for term in set(tokenize(query)):
+			postings = self._postings.get(term)
+			if not postings:
+				continue
+			idf = self._idf(term)
+			for index, tf in postings:
+				norm = 1 - self.b + self.b * self._lengths[index] / (self._avg_length or 1)
+				scores[index] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+		ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+		return [(self.chunks[index], score) for index, score in ranked]
@@ -0,0 +1,368 @@
+"""
+Admission control in front of the OCR and LLM backends.
+
+Each backend has a fixed number of concurrent slots. Work that cannot get a slot waits
+in per-priority queues; within a priority class, API clients are served round-robin so
+one bulk client cannot starve the others. Requests carry an optional deadline and are
+rejected up front when the estimated queue wait means they could not finish in time.
+When a queue is full the lowest-priority (newest) waiter is shed first.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterator, Optional
+
+from app.utils import metrics
+from app.utils.cancellation import OperationCancelled, current_token
+
+# Lower number = served first
+PRIORITIES = {"interactive": 0, "batch": 1, "speculative": 2}
+DEFAULT_PRIORITY = "interactive"
+
+_bulk_pages = int(os.getenv("SCHEDULER_BULK_PAGES", "5"))
+_bulk_text_chars = int(os.getenv("SCHEDULER_BULK_TEXT_CHARS", "20000"))
+_default_deadline_ms = {
+	"interactive": float(os.getenv("SCHEDULER_INTERACTIVE_DEADLINE_MS", "60000")),
+	"batch": float(os.getenv("SCHEDULER_BATCH_DEADLINE_MS", "600000")),
+	"speculative": float(os.getenv("SCHEDULER_SPECULATIVE_DEADLINE_MS", "120000")),
+}
+
+
+class SchedulerRejected(Exception):
+	status_code = 503
+
+	def __init__(self, message: str, retry_after: float = 1.0):
+		super().__init__(message)
+		self.retry_after = retry_after
+
+
+class Overloaded(SchedulerRejected):
+	"""Queue is full (or this request was shed to make room for higher priority work)."""
+
+	status_code = 503
+
+
+class DeadlineExceeded(SchedulerRejected):
+	"""The request cannot start (or finish) before its deadline."""
+
+	status_code = 504
+
+
+@dataclass
+class JobContext:
+	client_id: str = "anonymous"
+	endpoint: str = ""
+	priority: str = DEFAULT_PRIORITY
+	priority_explicit: bool = False
+	deadline: Optional[float] = None  # time.monotonic() value
+	queue_wait_ms: float = 0.0
+	service_ms: float = 0.0
+	prompt_tokens_saved: int = 0
+
+	def remaining_ms(self) -> Optional[float]:
+		if self.deadline is None:
+			return None
+		return (self.deadline - time.monotonic()) * 1000
+
+	def demote(self, priority: str) -> None:
+		"""Lower the priority unless the client asked for one explicitly."""
+		if not self.priority_explicit and PRIORITIES[priority] > PRIORITIES[self.priority]:
+			self.priority = priority
+			self.deadline = None if self.deadline is None else max(self.deadline, time.monotonic() + _default_deadline_ms[priority] / 1000)
+
+
+_current_job: ContextVar[Optional[JobContext]] = ContextVar("aidocmate_job", default=None)
+
+
+def current_job() -> Optional[JobContext]:
+	return _current_job.get()
+
+
+@contextmanager
+def use_job(job: JobContext) -> Iterator[JobContext]:
+	reset = _current_job.set(job)
+	try:
+		yield job
+	finally:
+		_current_job.reset(reset)
+
+
+def client_id_from_headers(headers, client_host: Optional[str] = None) -> str:
+	"""Identify the API client: hashed X-API-Key if present, else the peer address."""
+	api_key = headers.get("x-api-key")
+	if api_key:
+		return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+	return f"ip:{client_host}" if client_host else "anonymous"
+
+
+def job_from_headers(headers, client_host: Optional[str] = None) -> JobContext:
+	priority = (headers.get("x-priority") or "").lower()
+	explicit = priority in PRIORITIES
+	if not explicit:
+		priority = DEFAULT_PRIORITY
+	deadline_ms = headers.get("x-deadline-ms")
+	try:
+		budget_ms = float(deadline_ms) if deadline_ms else _default_deadline_ms[priority]
+	except ValueError:
+		budget_ms = _default_deadline_ms[priority]
+	return JobContext(
+		client_id=client_id_from_headers(headers, client_host),
+		priority=priority,
+		priority_explicit=explicit,
+		deadline=time.monotonic() + budget_ms / 1000 if budget_ms > 0 else None,
+	)
+
+
+def background_job(priority: str, client_id: str = "anonymous", endpoint: str = "background") -> JobContext:
+	"""JobContext for work started by the server itself (e.g. speculation) rather than a request."""
+	return JobContext(
+		client_id=client_id,
+		endpoint=endpoint,
+		priority=priority,
+		priority_explicit=True,
+		deadline=time.monotonic() + _default_deadline_ms[priority] / 1000,
+	)
+
+
+def classify_pages(page_count: int) -> None:
+	"""Multi-page documents are bulk work unless the client said otherwise."""
+	job = current_job()
+	if job is not None and page_count > _bulk_pages:
+		job.demote("batch")
+
+
+def classify_text(length: int) -> None:
+	job = current_job()
+	if job is not None and length > _bulk_text_chars:
+		job.demote("batch")
+
+
+@dataclass
+class _Waiter:
+	job: JobContext
+	seq: int
+	event: threading.Event = field(default_factory=threading.Event)
+	granted: bool = False
+	shed: bool = False
+
+
+class BackendScheduler:
+	def __init__(self, name: str, capacity: int, max_queue: int):
+		self.name = name
+		self.capacity = max(1, capacity)
+		self.max_queue = max(0, max_queue)
+		self._lock = threading.Lock()
+		self._active = 0
+		self._seq = 0
+		self._queued = 0
+		# priority -> client_id -> FIFO of waiters; OrderedDict rotation gives round-robin
+		self._queues: Dict[int, "OrderedDict[str, Deque[_Waiter]]"] = {p: OrderedDict() for p in PRIORITIES.values()}
+		self._service_ewma_ms = 0.0
+
+	# -- queue helpers (call with self._lock held) --
+
+	def _enqueue(self, waiter: _Waiter) -> None:
+		clients = self._queues[PRIORITIES[waiter.job.priority]]
+		clients.setdefault(waiter.job.client_id, deque()).append(waiter)
+		self._queued += 1
+
+	def _remove(self, waiter: _Waiter) -> None:
+		for clients in self._queues.values():
+			queue = clients.get(waiter.job.client_id)
+			if queue and waiter in queue:
+				queue.remove(waiter)
+				if not queue:
+					del clients[waiter.job.client_id]
+				self._queued -= 1
+				return
+
+	def _pop_next(self) -> Optional[_Waiter]:
+		for priority in sorted(self._queues):
+			clients = self._queues[priority]
+			if not clients:
+				continue
+			client_id, queue = next(iter(clients.items()))
+			waiter = queue.popleft()
+			# Rotate this client to the back so the next slot goes to someone else
+			del clients[client_id]
+			if queue:
+				clients[client_id] = queue
+			self._queued -= 1
+			return waiter
+		return None
+
+	def _waiting_ahead(self, priority: int) -> int:
+		return sum(len(q) for p, clients in self._queues.items() if p <= priority for q in clients.values())
+
+	def _shed_one(self, incoming_priority: int) -> bool:
+		"""Drop the newest waiter of the lowest priority class if it ranks below incoming."""
+		for priority in sorted(self._queues, reverse=True):
+			if priority <= incoming_priority:
+				return False
+			clients = self._queues[priority]
+			if not clients:
+				continue
+			victim = max((q[-1] for q in clients.values()), key=lambda w: w.seq)
+			self._remove(victim)
+			victim.shed = True
+			victim.event.set()
+			return True
+		return False
+
+	# -- public API --
+
+	def acquire(self, job: JobContext) -> float:
+		"""Block until a slot is free; returns the queue wait in milliseconds."""
+		token = current_token()
+		start = time.monotonic()
+		priority = PRIORITIES[job.priority]
+		with self._lock:
+			if self._active < self.capacity and self._queued == 0:
+				self._active += 1
+				return 0.0
+			remaining = job.remaining_ms()
+			if remaining is not None and self._service_ewma_ms:
+				rounds = self._waiting_ahead(priority) // self.capacity + 1
+				estimate = rounds * self._service_ewma_ms + self._service_ewma_ms
+				if estimate > remaining:
+					metrics.increment(f"scheduler.{self.name}.deadline_rejected")
+					raise DeadlineExceeded(f"{self.name} queue wait (~{estimate:.0f} ms) exceeds the request deadline", retry_after=estimate / 1000)
+			if self._queued >= self.max_queue and not self._shed_one(priority):
+				metrics.increment(f"scheduler.{self.name}.rejected")
+				raise Overloaded(f"{self.name} is saturated", retry_after=max(1.0, self._service_ewma_ms / 1000))
+			self._seq += 1
+			waiter = _Waiter(job=job, seq=self._seq)
+			self._enqueue(waiter)
+
+		handle = token.add_callback(waiter.event.set) if token is not None else 0
+		try:
+			remaining = job.remaining_ms()
+			waiter.event.wait(None if remaining is None else max(0.0, remaining) / 1000)
+		finally:
+			if token is not None:
+				token.remove_callback(handle)
+
+		waited_ms = (time.monotonic() - start) * 1000
+		with self._lock:
+			if waiter.granted:
+				if token is not None and token.cancelled:
+					self._release_locked()
+					raise OperationCancelled(token.reason)
+				return waited_ms
+			self._remove(waiter)
+		if waiter.shed:
+			metrics.increment(f"scheduler.{self.name}.shed")
+			raise Overloaded(f"{self.name} is saturated; lower-priority work was shed", retry_after=1.0)
+		if token is not None and token.cancelled:
+			raise OperationCancelled(token.reason)
+		metrics.increment(f"scheduler.{self.name}.deadline_expired")
+		raise DeadlineExceeded(f"request deadline passed while waiting for {self.name}")
+
+	def _release_locked(self) -> None:
+		self._active -= 1
+		waiter = self._pop_next()
+		if waiter is not None:
+			waiter.granted = True
+			self._active += 1
+			waiter.event.set()
+
+	def release(self, service_ms: Optional[float] = None) -> None:
+		with self._lock:
+			if service_ms is not None:
+				self._service_ewma_ms = service_ms if not self._service_ewma_ms else 0.8 * self._service_ewma_ms + 0.2 * service_ms
+			self._release_locked()
+
+	@contextmanager
+	def slot(self, job: Optional[JobContext] = None) -> Iterator[None]:
+		job = job or current_job() or JobContext()
+		waited_ms = self.acquire(job)
+		job.queue_wait_ms += waited_ms
+		metrics.observe(f"scheduler.{self.name}.queue_wait_ms", waited_ms)
+		start = time.monotonic()
+		try:
+			yield
+		finally:
+			service_ms = (time.monotonic() - start) * 1000
+			job.service_ms += service_ms
+			metrics.observe(f"scheduler.{self.name}.service_ms", service_ms)
+			self.release(service_ms)
+
+	def promote(self, job: JobContext, priority: str) -> bool:
+		"""Raise a job's priority, moving any of its queued waiters to the new class."""
+		with self._lock:
+			# Equal is allowed: another backend may already have updated job.priority
+			if PRIORITIES[priority] > PRIORITIES[job.priority]:
+				return False
+			waiters = [w for clients in self._queues.values() for q in clients.values() for w in q if w.job is job]
+			for waiter in waiters:
+				self._remove(waiter)
+			job.priority = priority
+			for waiter in waiters:
+				self._enqueue(waiter)
+			return bool(waiters)
+
+	def stats(self) -> dict:
+		with self._lock:
+			return {
+				"capacity": self.capacity,
+				"active": self._active,
+				"queued": self._queued,
+				"service_ewma_ms": round(self._service_ewma_ms, 1),
+			}
+
+
+ocr_scheduler = BackendScheduler(
+	"ocr",
+	capacity=int(os.getenv("OCR_CONCURRENCY", str(os.cpu_count() or 2))),
+	max_queue=int(os.getenv("OCR_MAX_QUEUE", "64")),
+)
+llm_scheduler = BackendScheduler(
+	"llm",
+	capacity=int(os.getenv("LLM_CONCURRENCY", "8")),
+	max_queue=int(os.getenv("LLM_MAX_QUEUE", "128")),
+)
+
+
+def promote_job(job: JobContext, priority: str) -> None:
+	"""Promote a job on every backend, e.g. when a client starts waiting on speculative work."""
+	for scheduler in (ocr_scheduler, llm_scheduler):
+		scheduler.promote(job, priority)
+
+
+class SchedulingMiddleware:
+	"""
+	Attach a JobContext (client, priority, deadline) to every HTTP request and report
+	queue wait vs service time in a Server-Timing header.
+	"""
+
+	def __init__(self, app):
+		self.app = app
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+		headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+		client = scope.get("client")
+		job = job_from_headers(headers, client[0] if client else None)
+		job.endpoint = scope.get("path", "")
+
+		async def send_wrapper(message):
+			if message["type"] == "http.response.start":
+				headers = list(message.get("headers", []))
+				if job.queue_wait_ms or job.service_ms:
+					timing = f"queue;dur={job.queue_wait_ms:.1f}, service;dur={job.service_ms:.1f}"
+					headers.append((b"server-timing", timing.encode()))
+				if job.prompt_tokens_saved:
+					headers.append((b"x-prompt-tokens-saved", str(job.prompt_tokens_saved).encode()))
+				message = {**message, "headers": headers}
+			await send(message)
+
+		with use_job(job):
+			await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,318 @@
+"""
+Speculative precomputation after /upload.
+
+The frontend almost always calls /simplify and /checklist right after an upload, so with
+?speculate=true the upload schedules both in the background at `speculative` priority as
+soon as the text is ready. A later call with the same text and parameters takes the
+finished result, or joins the in-flight task (promoting it to the caller's priority).
+Speculative spend is capped per worker by concurrent tasks and by characters sent per time window;
+results nobody claims expire after SPECULATION_TTL seconds and count as wasted.
+
+Under several worker processes the follow-up call may land on a different worker than the
+upload. Simplify/checklist speculations are therefore reserved and published in SQLite
+under AIDOCMATE_DATA_DIR (SPECULATION_SHARED, on by default): a task reserved by one
+worker is never started again by another, and a claim on any worker takes the published
+result or waits (up to SPECULATION_JOIN_TIMEOUT seconds) for the owning worker to finish.
+Only a same-worker join can promote the task's priority.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Deque, Optional, Tuple
+
+from app.models.schemas import ChecklistResponse, SimplifyResponse
+from app.services.near_duplicates import data_dir, document_key, params_key
+from app.services.scheduler import DEFAULT_PRIORITY, JobContext, background_job, current_job, promote_job, use_job
+from app.utils import metrics
+from app.utils.cancellation import CancelToken, current_token, use_token
+
+_enabled = os.getenv("SPECULATION_ENABLED", "true").lower() in {"1", "true", "yes"}
+_max_inflight = int(os.getenv("SPECULATION_MAX_INFLIGHT", "4"))
+_max_text_chars = int(os.getenv("SPECULATION_MAX_TEXT_CHARS", "30000"))
+_budget_chars = int(os.getenv("SPECULATION_BUDGET_CHARS", "2000000"))
+_budget_window = float(os.getenv("SPECULATION_BUDGET_WINDOW", "3600"))
+_ttl = float(os.getenv("SPECULATION_TTL", "900"))
+_max_entries = int(os.getenv("SPECULATION_MAX_ENTRIES", "256"))
+_shared_enabled = os.getenv("SPECULATION_SHARED", "true").lower() in {"1", "true", "yes"}
+_join_timeout = float(os.getenv("SPECULATION_JOIN_TIMEOUT", "120"))
+
+# Kinds whose (response, meta) results can be published to other workers
+_RESULT_MODELS = {"simplify": SimplifyResponse, "checklist": ChecklistResponse}
+
+
+class SharedResults:
+	"""
+	Cross-process reservations and results of speculative tasks. A row is "running" while
+	its owner works on it and "done" once the result is published; running rows older than
+	the join timeout belong to a dead worker and may be taken over.
+	"""
+
+	def __init__(self, path: Path, ttl: float = _ttl, join_timeout: float = _join_timeout):
+		self.path = Path(path)
+		self.ttl = ttl
+		self.join_timeout = join_timeout
+		self._lock = threading.Lock()
+		self._db: Optional[sqlite3.Connection] = None
+		self._pid = 0
+
+	def _connect(self) -> sqlite3.Connection:
+		# Opened lazily and per process: the app is imported in the gunicorn master before fork
+		if self._db is None or self._pid != os.getpid():
+			self.path.parent.mkdir(parents=True, exist_ok=True)
+			db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5)
+			db.execute("PRAGMA journal_mode=WAL")
+			db.execute("CREATE TABLE IF NOT EXISTS speculation (key TEXT PRIMARY KEY, state TEXT NOT NULL, payload TEXT, updated REAL NOT NULL)")
+			db.commit()
+			self._db, self._pid = db, os.getpid()
+		return self._db
+
+	def reserve(self, key: str) -> bool:
+		"""Take ownership of key; False when another worker already has it running or done."""
+		now = time.time()
+		with self._lock:
+			db = self._connect()
+			db.execute(
+				"DELETE FROM speculation WHERE (state = 'done' AND updated < ?) OR (state = 'running' AND updated < ?)",
+				(now - self.ttl, now - self.join_timeout),
+			)
+			reserved = db.execute(
+				"INSERT OR IGNORE INTO speculation (key, state, updated) VALUES (?, 'running', ?)", (key, now)
+			).rowcount == 1
+			db.commit()
+		return reserved
+
+	def publish(self, key: str, payload: str) -> None:
+		with self._lock:
+			db = self._connect()
+			db.execute("UPDATE speculation SET state = 'done', payload = ?, updated = ? WHERE key = ?", (payload, time.time(), key))
+			db.commit()
+
+	def release(self, key: str) -> None:
+		"""Give up a reservation (the task failed) so another worker may compute it."""
+		with self._lock:
+			db = self._connect()
+			db.execute("DELETE FROM speculation WHERE key = ?", (key,))
+			db.commit()
+
+	def lookup(self, key: str) -> Tuple[Optional[str], Optional[str]]:
+		"""(state, payload) of a fresh row, or (None, None)."""
+		now = time.time()
+		with self._lock:
+			row = self._connect().execute("SELECT state, payload, updated FROM speculation WHERE key = ?", (key,)).fetchone()
+		if row is None:
+			return None, None
+		state, payload, updated = row
+		if (state == "done" and now - updated > self.ttl) or (state == "running" and now - updated > self.join_timeout):
+			return None, None
+		return state, payload
+
+
+def _encode(result) -> str:
+	response, meta = result
+	return json.dumps({"response": response.model_dump(), "meta": meta}, ensure_ascii=False)
+
+
+def _decode(kind: str, payload: str):
+	data = json.loads(payload)
+	return _RESULT_MODELS[kind](**data["response"]), data["meta"]
+
+
+@dataclass
+class _Entry:
+	kind: str
+	future: Future
+	job: JobContext
+	token: CancelToken
+	created: float
+	claimed: bool = False
+
+
+class Speculator:
+	def __init__(self, max_inflight: int = _max_inflight, budget_chars: int = _budget_chars, budget_window: float = _budget_window, ttl: float = _ttl, shared: Optional[SharedResults] = None):
+		self.shared = shared if shared is not None else (SharedResults(data_dir() / "speculation.sqlite3", ttl) if _shared_enabled else None)
+		self.max_inflight = max_inflight
+		self.budget_chars = budget_chars
+		self.budget_window = budget_window
+		self.ttl = ttl
+		self._lock = threading.Lock()
+		self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+		self._spent: Deque[Tuple[float, int]] = deque()
+		self._spent_chars = 0
+		self._inflight = 0
+		self._executor = ThreadPoolExecutor(max_workers=max(1, max_inflight), thread_name_prefix="aidocmate-speculate")
+
+	@staticmethod
+	def _key(kind: str, text: str, params: dict) -> str:
+		return f"{kind}:{document_key(text)}:{params_key(params)}"
+
+	def _drop_locked(self, key: str) -> None:
+		entry = self._entries.pop(key)
+		if not entry.claimed:
+			metrics.increment(f"speculation.{entry.kind}.wasted")
+			entry.token.cancel("speculative result expired")
+
+	def _expire_locked(self, now: float) -> None:
+		while self._entries:
+			key, entry = next(iter(self._entries.items()))
+			if now - entry.created < self.ttl and len(self._entries) <= _max_entries:
+				break
+			self._drop_locked(key)
+		while self._spent and now - self._spent[0][0] > self.budget_window:
+			self._spent_chars -= self._spent.popleft()[1]
+
+	def _shares(self, kind: str) -> bool:
+		return self.shared is not None and kind in _RESULT_MODELS
+
+	def schedule(self, kind: str, text: str, params: dict, func: Callable[..., Any]) -> bool:
+		"""Start func(text=text, **params) in the background unless already known (on any worker) or over budget."""
+		if not _enabled or not text:
+			return False
+		if len(text) > _max_text_chars:
+			metrics.increment("speculation.skipped_large")
+			return False
+		key = self._key(kind, text, params)
+		now = time.monotonic()
+		parent = current_job()
+		with self._lock:
+			self._expire_locked(now)
+			if key in self._entries:
+				return True
+			if self._inflight >= self.max_inflight:
+				metrics.increment("speculation.skipped_busy")
+				return False
+			if self._spent_chars + len(text) > self.budget_chars:
+				metrics.increment("speculation.skipped_budget")
+				return False
+			if self._shares(kind) and not self._reserve(key):
+				metrics.increment(f"speculation.{kind}.elsewhere")
+				return True
+			self._spent.append((now, len(text)))
+			self._spent_chars += len(text)
+			self._inflight += 1
+			job = background_job("speculative", parent.client_id if parent else "anonymous", endpoint="speculation")
+			token = CancelToken()
+			future = self._executor.submit(self._run, kind, key, func, job, token, dict(params, text=text))
+			self._entries[key] = _Entry(kind, future, job, token, now)
+		metrics.increment(f"speculation.{kind}.scheduled")
+		metrics.increment("speculation.chars", len(text))
+		return True
+
+	def _reserve(self, key: str) -> bool:
+		try:
+			return self.shared.reserve(key)
+		except sqlite3.Error as e:
+			print(f"[speculation] shared reservation failed, running locally: {e}")
+			return True
+
+	def _run(self, kind: str, key: str, func, job: JobContext, token: CancelToken, kwargs: dict):
+		published = False
+		try:
+			with use_job(job), use_token(token):
+				result = func(**kwargs)
+			published = self._shares(kind) and self._publish(kind, key, result)
+			return result
+		finally:
+			if self._shares(kind) and not published:
+				try:
+					self.shared.release(key)
+				except sqlite3.Error as e:
+					print(f"[speculation] could not release {kind} reservation: {e}")
+			with self._lock:
+				self._inflight -= 1
+
+	def _publish(self, kind: str, key: str, result) -> bool:
+		try:
+			self.shared.publish(key, _encode(result))
+			return True
+		except (sqlite3.Error, ValueError, TypeError, AttributeError) as e:
+			print(f"[speculation] {kind} result not shared with other workers: {type(e).__name__}: {e}")
+			return False
+
+	def _claim_shared(self, kind: str, key: str) -> Optional[Any]:
+		"""Result published by (or awaited from) the worker that reserved key, else None."""
+		token = current_token()
+		deadline = time.monotonic() + self.shared.join_timeout
+		joined = False
+		try:
+			while True:
+				state, payload = self.shared.lookup(key)
+				if state == "done":
+					metrics.increment(f"speculation.{kind}.joined" if joined else f"speculation.{kind}.hits")
+					return _decode(kind, payload)
+				if state is None or time.monotonic() > deadline:
+					break
+				joined = True
+				if token is not None:
+					token.raise_if_cancelled()
+				time.sleep(0.1)
+		except (sqlite3.Error, ValueError, KeyError, TypeError) as e:
+			print(f"[speculation] shared {kind} result unavailable: {type(e).__name__}: {e}")
+		metrics.increment(f"speculation.{kind}.misses")
+		return None
+
+	def claim(self, kind: str, text: str, params: dict) -> Optional[Any]:
+		"""Result of a matching speculative task (waiting for it if still running), else None."""
+		key = self._key(kind, text, params)
+		with self._lock:
+			self._expire_locked(time.monotonic())
+			entry = self._entries.get(key)
+		if entry is None:
+			if self._shares(kind):
+				return self._claim_shared(kind, key)
+			metrics.increment(f"speculation.{kind}.misses")
+			return None
+		if entry.future.done():
+			metrics.increment(f"speculation.{kind}.hits")
+		else:
+			metrics.increment(f"speculation.{kind}.joined")
+			caller = current_job()
+			promote_job(entry.job, caller.priority if caller else DEFAULT_PRIORITY)
+			token = current_token()
+			while True:
+				try:
+					entry.future.result(timeout=0.1)
+					break
+				except FutureTimeout:
+					if token is not None:
+						token.raise_if_cancelled()
+				except Exception:
+					break
+		try:
+			result = entry.future.result()
+		except Exception as e:
+			print(f"[speculation] {kind} task failed: {type(e).__name__}: {e}")
+			metrics.increment(f"speculation.{kind}.failed")
+			with self._lock:
+				self._entries.pop(key, None)
+			return None
+		entry.claimed = True
+		return result
+
+	def stats(self) -> dict:
+		counters = {}
+		for kind in ("simplify", "checklist"):
+			scheduled = metrics.counter(f"speculation.{kind}.scheduled")
+			used = metrics.counter(f"speculation.{kind}.hits") + metrics.counter(f"speculation.{kind}.joined")
+			lookups = used + metrics.counter(f"speculation.{kind}.misses")
+			counters[kind] = {
+				"hit_rate": round(used / lookups, 3) if lookups else None,
+				"used_rate": round(used / scheduled, 3) if scheduled else None,
+			}
+		with self._lock:
+			return {
+				"inflight": self._inflight,
+				"entries": len(self._entries),
+				"budget_chars_used": self._spent_chars,
+				"budget_chars": self.budget_chars,
+				**counters,
+			}
+
+
+speculator = Speculator()
@@ -0,0 +1,219 @@
+"""
+Registry of known document templates with vetted, precomputed outputs.
+
+Standard forms (PAN Form 49A, scholarship forms, Aadhaar update, ...) are described by
+JSON files in app/templates/. Each template lists keyword phrases and the headings it
+carries in order (its layout). An uploaded document is fingerprinted once from the OCR
+text (its word set plus a whitespace-normalised copy); matching against every template is
+then a few set lookups and str.find calls. On a match the template's reviewed
+simplification/checklist is served, and only its variable fields (dates, fees, ...) are
+filled: by regex first, then by one small LLM call over the most relevant passages.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional
+
+from app.models.schemas import ChecklistItem, ChecklistResponse, SimplifyResponse
+from app.services import llm
+from app.services.near_duplicates import document_key
+from app.services.retrieval import BM25Index
+from app.utils import metrics
+from app.utils.chunking import split_into_chunks
+
+_enabled = os.getenv("TEMPLATES_ENABLED", "true").lower() in {"1", "true", "yes"}
+_templates_dir = Path(os.getenv("TEMPLATES_DIR", str(Path(__file__).resolve().parent.parent / "templates")))
+_threshold = float(os.getenv("TEMPLATE_MATCH_THRESHOLD", "0.75"))
+_field_context_chunks = int(os.getenv("TEMPLATE_FIELD_CONTEXT_CHUNKS", "2"))
+
+_WORD = re.compile(r"\w+")
+_SPACE = re.compile(r"\s+")
+# Checklist document_type values that do not name a specific form
+GENERIC_DOCUMENT_TYPES = {"", "government_form", "form", "document"}
+
+
+def _normalize(text: str) -> str:
+	return _SPACE.sub(" ", unicodedata.normalize("NFC", text or "").lower())
+
+
+@dataclass
+class Fingerprint:
+	words: FrozenSet[str]
+	normalized: str
+
+
+def fingerprint(text: str) -> Fingerprint:
+	normalized = _normalize(text)
+	return Fingerprint(frozenset(_WORD.findall(normalized)), normalized)
+
+
+@dataclass
+class Template:
+	id: str
+	name: str
+	keywords: List[str]
+	layout: List[str]
+	fields: Dict[str, dict]
+	simplify: Dict[str, str]
+	checklist: List[dict]
+	document_types: List[str] = field(default_factory=list)
+	reading_levels: List[str] = field(default_factory=lambda: ["basic", "simple"])
+	_keyword_words: List[FrozenSet[str]] = field(default_factory=list, repr=False)
+
+	@classmethod
+	def from_dict(cls, data: dict) -> "Template":
+		template = cls(
+			id=data["id"],
+			name=data["name"],
+			keywords=[_normalize(k).strip() for k in data.get("keywords", [])],
+			layout=[_normalize(h).strip() for h in data.get("layout", [])],
+			fields=data.get("fields", {}),
+			simplify=data.get("simplify", {}),
+			checklist=data.get("checklist", []),
+			document_types=[d.lower() for d in data.get("document_types", [])],
+			reading_levels=data.get("reading_levels", ["basic", "simple"]),
+		)
+		template._keyword_words = [frozenset(_WORD.findall(k)) for k in template.keywords]
+		return template
+
+	def score(self, fp: Fingerprint) -> float:
+		"""0.6 * share of keyword phrases present + 0.4 * share of headings found in order."""
+		if not self.keywords:
+			return 0.0
+		keyword_share = sum(1 for words in self._keyword_words if words <= fp.words) / len(self.keywords)
+		if keyword_share * 0.6 + 0.4 < _threshold:
+			return keyword_share * 0.6
+		found, position = 0, 0
+		for heading in self.layout:
+			index = fp.normalized.find(heading, position)
+			if index >= 0:
+				found += 1
+				position = index + len(heading)
+		layout_share = found / len(self.layout) if self.layout else 1.0
+		return keyword_share * 0.6 + layout_share * 0.4
+
+
+@dataclass
+class TemplateMatch:
+	template: Template
+	score: float
+
+
+class _Fields(dict):
+	def __missing__(self, key):
+		return "{" + key + "}"
+
+
+class TemplateRegistry:
+	def __init__(self, templates: List[Template], threshold: float = _threshold):
+		self.templates = templates
+		self.threshold = threshold
+		self._field_cache: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	@classmethod
+	def from_directory(cls, path: Path) -> "TemplateRegistry":
+		templates = []
+		for file in sorted(Path(path).glob("*.json")):
+			try:
+				templates.append(Template.from_dict(json.loads(file.read_text(encoding="utf-8"))))
+			except Exception as e:
+				print(f"[templates] skipping {file.name}: {e}")
+		print(f"[templates] loaded {len(templates)} template(s) from {path}")
+		return cls(templates)
+
+	def match(self, text: str) -> Optional[TemplateMatch]:
+		start = time.perf_counter()
+		fp = fingerprint(text)
+		fingerprinted = time.perf_counter()
+		best: Optional[TemplateMatch] = None
+		for template in self.templates:
+			score = template.score(fp)
+			if score >= self.threshold and (best is None or score > best.score):
+				best = TemplateMatch(template, score)
+		metrics.observe("templates.fingerprint_ms", (fingerprinted - start) * 1000)
+		metrics.observe("templates.match_ms", (time.perf_counter() - fingerprinted) * 1000)
+		metrics.increment("templates.matches" if best else "templates.no_match")
+		return best
+
+	def fields_for(self, template: Template, text: str) -> Dict[str, str]:
+		"""Variable field values: regex first, one small LLM call for the rest, then defaults."""
+		key = f"{template.id}:{document_key(text)}"
+		with self._lock:
+			cached = self._field_cache.get(key)
+		if cached is not None:
+			return cached
+
+		values: Dict[str, str] = {}
+		missing: Dict[str, str] = {}
+		for name, spec in template.fields.items():
+			found = re.search(spec["pattern"], text, re.IGNORECASE) if spec.get("pattern") else None
+			if found:
+				values[name] = _SPACE.sub(" ", found.group(1)).strip()
+			elif spec.get("llm", True):
+				missing[name] = spec.get("description", name)
+		cacheable = True
+		if missing:
+			metrics.increment("templates.field_llm_calls")
+			extracted = llm.extract_fields_with_llm(_field_passages(text, missing), missing)
+			values.update({k: v for k, v in extracted.items() if k in missing and v})
+			# An empty result usually means the call failed; retry next time
+			cacheable = bool(extracted)
+		for name, spec in template.fields.items():
+			values.setdefault(name, spec.get("default", "see the document"))
+
+		if cacheable:
+			with self._lock:
+				self._field_cache[key] = values
+				if len(self._field_cache) > 256:
+					self._field_cache.popitem(last=False)
+		return values
+
+	def simplify(self, match: TemplateMatch, text: str, language: str, reading_level: str, use_bullets: bool) -> Optional[SimplifyResponse]:
+		template = match.template
+		body = template.simplify.get(language)
+		if body is None or not use_bullets or reading_level not in template.reading_levels:
+			return None
+		return SimplifyResponse(language=language, reading_level=reading_level, text=body.format_map(_Fields(self.fields_for(template, text))))
+
+	def checklist(self, match: TemplateMatch, text: str, document_type: Optional[str], context: Optional[str]) -> Optional[ChecklistResponse]:
+		template = match.template
+		if context or not template.checklist:
+			return None
+		if (document_type or "").lower() not in GENERIC_DOCUMENT_TYPES | set(template.document_types):
+			return None
+		values = _Fields(self.fields_for(template, text))
+		items = [
+			ChecklistItem(**{k: v.format_map(values) if isinstance(v, str) else v for k, v in item.items()})
+			for item in template.checklist
+		]
+		return ChecklistResponse(items=items)
+
+
+def _field_passages(text: str, missing: Dict[str, str]) -> List[str]:
+	index = BM25Index(split_into_chunks(text, target_chars=500, max_chars=1000))
+	hits = index.search(" ".join(list(missing) + list(missing.values())), k=_field_context_chunks)
+	return [chunk.text for chunk, _ in hits] or [text[:1000]]
+
+
+_registry: Optional[TemplateRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> Optional[TemplateRegistry]:
+	"""Process-wide registry, loaded on first use; None when disabled."""
+	global _registry
+	if not _enabled:
+		return None
+	if _registry is None:
+		with _registry_lock:
+			if _registry is None:
+				_registry = TemplateRegistry.from_directory(_templates_dir)
+	return _registry
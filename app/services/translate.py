@@ -1,26 +1,53 @@
 import os
-from typing import Tuple
+from typing import Optional, Tuple
 
 _target_location = os.getenv("GOOGLE_TRANSLATE_LOCATION", "global")
 _project_id = os.getenv("GOOGLE_PROJECT_ID")
 _use_fallback = os.getenv("USE_TRANSLATE_FALLBACK", "false").lower() in {"1", "true", "yes"}
 
-try:
-	from google.cloud import translate
-	_has_translate = True
-except Exception:
-	_has_translate = False
+# Provider SDKs are imported on first use (or by warm_up) to keep startup cheap.
+translate = None  # type: ignore
+_GTTranslator = None  # type: ignore
+_has_translate: Optional[bool] = None
+_has_googletrans: Optional[bool] = None
 
-try:
-	from googletrans import Translator as _GTTranslator  # type: ignore
-	_has_googletrans = True
-except Exception:
-	_has_googletrans = False
+
+def _load_translate():
+	global translate, _has_translate
+	if _has_translate is None:
+		try:
+			from google.cloud import translate as _translate
+			translate, _has_translate = _translate, True
+		except Exception:
+			_has_translate = False
+	return translate if _has_translate else None
+
+
+def _load_googletrans():
+	global _GTTranslator, _has_googletrans
+	if _has_googletrans is None:
+		try:
+			from googletrans import Translator  # type: ignore
+			_GTTranslator, _has_googletrans = Translator, True
+		except Exception:
+			_has_googletrans = False
+	return _GTTranslator if _has_googletrans else None
+
+
+def warm_up() -> dict:
+	"""Preload the translation provider this deployment is configured to use."""
+	loaded = {}
+	if _project_id:
+		loaded["google_translate"] = _load_translate() is not None
+	if _use_fallback:
+		loaded["googletrans"] = _load_googletrans() is not None
+	return loaded
 
 
 def translate_text_with_provider(text: str, target_language: str) -> Tuple[str, str]:
 	# Prefer GCP Translate if credentials/project are configured
-	if _has_translate and _project_id:
+	translate = _load_translate() if _project_id else None
+	if translate is not None:
 		client = translate.TranslationServiceClient()
 		parent = f"projects/{_project_id}/locations/{_target_location}"
 		response = client.translate_text(
@@ -35,8 +62,9 @@ def translate_text_with_provider(text: str, target_language: str) -> Tuple[str,
 		return translated_text, "google-cloud-translate"
 
 	# Optional fallback: googletrans (no API key) - not guaranteed accuracy
-	if _use_fallback and _has_googletrans:
-		translator = _GTTranslator()
+	Translator = _load_googletrans() if _use_fallback else None
+	if Translator is not None:
+		translator = Translator()
 		translated = translator.translate(text, dest=target_language)
 		return translated.text, "googletrans"
 
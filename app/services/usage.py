@@ -0,0 +1,314 @@
+"""
+Per-tenant usage accounting and daily quotas.
+
+A tenant is the scheduler's client id (hashed X-API-Key, else the peer address). LLM
+tokens (from the usage chunk at the end of each completion stream), OCR'd pages, cache
+reuse, prompt tokens saved by boilerplate stripping and request latency are charged to
+the current job's (tenant, endpoint) and summed per UTC day. Charges accumulate in
+memory and are written to SQLite under AIDOCMATE_DATA_DIR in one upsert batch every
+USAGE_FLUSH_SECONDS, so accounting adds no disk I/O to the request path.
+
+Quotas (USAGE_DAILY_TOKENS, USAGE_DAILY_OCR_PAGES, per-tenant overrides in USAGE_QUOTAS
+as JSON, e.g. {"key:1a2b3c4d5e6f": {"tokens": 500000, "ocr_pages": 200}}; 0 means
+unlimited) are checked by UsageMiddleware before a metered request starts: a tenant that
+has used up its day gets 429 with Retry-After until midnight UTC. Each check re-reads the
+day's totals from SQLite, which every worker flushes to, plus this worker's unflushed
+charges, so quotas hold across workers up to one flush interval of the others' spend.
+
+GET /usage reports only the caller's own tenant; USAGE_ADMIN_KEY (sent as X-Admin-Key)
+unlocks every tenant.
+"""
+
+import hmac
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.services.near_duplicates import data_dir
+from app.services.scheduler import current_job
+from app.utils import metrics
+
+_enabled = os.getenv("USAGE_ACCOUNTING", "true").lower() in {"1", "true", "yes"}
+_flush_seconds = float(os.getenv("USAGE_FLUSH_SECONDS", "5"))
+_daily_tokens = int(os.getenv("USAGE_DAILY_TOKENS", "0"))
+_daily_ocr_pages = int(os.getenv("USAGE_DAILY_OCR_PAGES", "0"))
+_tenant_quotas: Dict[str, dict] = json.loads(os.getenv("USAGE_QUOTAS", "") or "{}")
+_admin_key = os.getenv("USAGE_ADMIN_KEY", "")
+
+# Requests to these paths are counted, timed and subject to quotas
+METERED_PATHS = {"/upload", "/simplify", "/translate", "/checklist", "/explain", "/ask"}
+# OCR quota only gates the endpoint that runs OCR
+_OCR_PATHS = {"/upload"}
+
+FIELDS = (
+	"requests",
+	"rejected",
+	"prompt_tokens",
+	"completion_tokens",
+	"ocr_pages",
+	"cache_hits",
+	"chunks_reused",
+	"tokens_saved",
+	"latency_ms",
+	"latency_ms_max",
+)
+# Summed on every charge/flush except latency_ms_max, which keeps the maximum
+_MAX_FIELDS = {"latency_ms_max"}
+
+Key = Tuple[str, str, str]  # (tenant, endpoint, day)
+
+
+def _today() -> str:
+	return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def _seconds_until_tomorrow() -> float:
+	now = datetime.now(timezone.utc)
+	tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+	return (tomorrow - now).total_seconds()
+
+
+def quota_for(tenant: str) -> dict:
+	quota = {"tokens": _daily_tokens, "ocr_pages": _daily_ocr_pages}
+	quota.update(_tenant_quotas.get(tenant, {}))
+	return quota
+
+
+def _merge(into: Dict[str, float], deltas: Dict[str, float]) -> None:
+	for name, value in deltas.items():
+		if name in _MAX_FIELDS:
+			into[name] = max(into.get(name, 0.0), value)
+		else:
+			into[name] = into.get(name, 0.0) + value
+
+
+class QuotaExceeded(Exception):
+	status_code = 429
+
+	def __init__(self, message: str, retry_after: float):
+		super().__init__(message)
+		self.retry_after = retry_after
+
+
+class UsageLedger:
+	def __init__(self, path: Path, flush_seconds: float = _flush_seconds):
+		self.path = Path(path)
+		self.flush_seconds = flush_seconds
+		self._lock = threading.Lock()
+		self._write_lock = threading.Lock()
+		self._pending: Dict[Key, Dict[str, float]] = {}
+		self._flusher: Optional[threading.Thread] = None
+		self._stop = threading.Event()
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+		self._db.execute("PRAGMA journal_mode=WAL")
+		columns = ", ".join(f"{name} REAL NOT NULL DEFAULT 0" for name in FIELDS)
+		self._db.execute(
+			f"CREATE TABLE IF NOT EXISTS usage (tenant TEXT NOT NULL, endpoint TEXT NOT NULL, day TEXT NOT NULL, {columns}, PRIMARY KEY (tenant, endpoint, day))"
+		)
+		self._db.execute("CREATE INDEX IF NOT EXISTS usage_day ON usage (day)")
+		self._db.commit()
+
+	def _start_flusher(self) -> None:
+		if self._flusher is None and self.flush_seconds > 0:
+			self._flusher = threading.Thread(target=self._flush_loop, name="aidocmate-usage", daemon=True)
+			self._flusher.start()
+
+	def _flush_loop(self) -> None:
+		while not self._stop.wait(self.flush_seconds):
+			try:
+				self.flush()
+			except Exception as e:
+				print(f"[usage.flush] failed: {type(e).__name__}: {e}")
+
+	def charge(self, tenant: str, endpoint: str, **deltas: float) -> None:
+		day = _today()
+		with self._lock:
+			_merge(self._pending.setdefault((tenant, endpoint, day), {}), deltas)
+			self._start_flusher()
+
+	def flush(self) -> int:
+		"""Write pending charges in one transaction; returns the number of rows upserted."""
+		with self._write_lock:
+			with self._lock:
+				pending, self._pending = self._pending, {}
+			if not pending:
+				return 0
+			names = ", ".join(FIELDS)
+			marks = ", ".join("?" for _ in FIELDS)
+			updates = ", ".join(
+				f"{name} = MAX({name}, excluded.{name})" if name in _MAX_FIELDS else f"{name} = {name} + excluded.{name}"
+				for name in FIELDS
+			)
+			rows = [(tenant, endpoint, day, *(values.get(name, 0.0) for name in FIELDS)) for (tenant, endpoint, day), values in pending.items()]
+			self._db.executemany(
+				f"INSERT INTO usage (tenant, endpoint, day, {names}) VALUES (?, ?, ?, {marks}) ON CONFLICT (tenant, endpoint, day) DO UPDATE SET {updates}",
+				rows,
+			)
+			self._db.commit()
+		metrics.increment("usage.rows_flushed", len(rows))
+		return len(rows)
+
+	def today(self, tenant: str) -> Dict[str, float]:
+		"""
+		Today's totals for a tenant across endpoints: what every worker has flushed to
+		SQLite plus this worker's unflushed charges. Blocking; call off the event loop.
+		"""
+		day = _today()
+		# Same lock order as flush(); the connection is only used under _write_lock
+		with self._write_lock:
+			row = self._db.execute(
+				f"SELECT {', '.join(f'SUM({name})' for name in FIELDS)} FROM usage WHERE tenant = ? AND day = ?",
+				(tenant, day),
+			).fetchone()
+			totals = {name: value or 0.0 for name, value in zip(FIELDS, row)}
+			with self._lock:
+				for (pending_tenant, _, pending_day), values in self._pending.items():
+					if pending_tenant == tenant and pending_day == day:
+						_merge(totals, values)
+		return totals
+
+	def check_quota(self, tenant: str, path: str) -> None:
+		"""Raise QuotaExceeded if the tenant has used up today's tokens (or OCR pages for path)."""
+		quota = quota_for(tenant)
+		if not quota.get("tokens") and not (path in _OCR_PATHS and quota.get("ocr_pages")):
+			return
+		used = self.today(tenant)
+		tokens = used["prompt_tokens"] + used["completion_tokens"]
+		if quota.get("tokens") and tokens >= quota["tokens"]:
+			raise QuotaExceeded(f"daily token quota of {quota['tokens']} exhausted", _seconds_until_tomorrow())
+		if path in _OCR_PATHS and quota.get("ocr_pages") and used["ocr_pages"] >= quota["ocr_pages"]:
+			raise QuotaExceeded(f"daily OCR page quota of {quota['ocr_pages']} exhausted", _seconds_until_tomorrow())
+
+	def report(self, days: int = 1, tenant: Optional[str] = None) -> dict:
+		"""Per-tenant totals and per-endpoint breakdown for the last `days` UTC days."""
+		self.flush()
+		since = (datetime.now(timezone.utc) - timedelta(days=max(1, days) - 1)).strftime("%Y-%m-%d")
+		query = f"SELECT tenant, endpoint, {', '.join(FIELDS)} FROM usage WHERE day >= ?"
+		params: tuple = (since,)
+		if tenant:
+			query += " AND tenant = ?"
+			params += (tenant,)
+		with self._write_lock:
+			rows = self._db.execute(query, params).fetchall()
+
+		tenants: Dict[str, dict] = defaultdict(lambda: {"totals": {}, "endpoints": defaultdict(dict)})
+		for row in rows:
+			values = dict(zip(FIELDS, row[2:]))
+			entry = tenants[row[0]]
+			_merge(entry["totals"], values)
+			_merge(entry["endpoints"][row[1]], values)
+		return {
+			"since": since,
+			"tenants": {
+				name: {
+					**_summarise(entry["totals"]),
+					"quota": quota_for(name),
+					"endpoints": {endpoint: _summarise(values) for endpoint, values in sorted(entry["endpoints"].items())},
+				}
+				for name, entry in sorted(tenants.items())
+			},
+		}
+
+	def close(self) -> None:
+		self._stop.set()
+		self.flush()
+		with self._write_lock:
+			self._db.close()
+
+
+def _summarise(values: Dict[str, float]) -> dict:
+	summary = {name: int(values.get(name, 0)) for name in FIELDS if not name.startswith("latency")}
+	summary["total_tokens"] = summary["prompt_tokens"] + summary["completion_tokens"]
+	requests = values.get("requests", 0)
+	summary["latency_ms_avg"] = round(values.get("latency_ms", 0) / requests, 1) if requests else None
+	summary["latency_ms_max"] = round(values.get("latency_ms_max", 0), 1)
+	return summary
+
+
+_ledger: Optional[UsageLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger() -> Optional[UsageLedger]:
+	global _ledger
+	if not _enabled:
+		return None
+	if _ledger is None:
+		with _ledger_lock:
+			if _ledger is None:
+				_ledger = UsageLedger(data_dir() / "usage.sqlite3")
+	return _ledger
+
+
+def is_admin(headers) -> bool:
+	"""Whether the request carries USAGE_ADMIN_KEY (X-Admin-Key); never true when it is unset."""
+	supplied = headers.get("x-admin-key") or ""
+	return bool(_admin_key) and hmac.compare_digest(supplied.encode("utf-8"), _admin_key.encode("utf-8"))
+
+
+def charge(**deltas: float) -> None:
+	"""Charge usage to the current job's tenant and endpoint (no-op when accounting is off)."""
+	ledger = get_ledger()
+	if ledger is None:
+		return
+	job = current_job()
+	ledger.charge(job.client_id if job else "anonymous", job.endpoint if job else "", **deltas)
+
+
+def charge_result(meta: dict) -> None:
+	"""Record cache reuse described by a pipeline meta dict."""
+	if meta.get("speculative") or meta.get("source") in {"template", "near_duplicate"}:
+		charge(cache_hits=1)
+	elif meta.get("chunks_reused"):
+		charge(chunks_reused=meta["chunks_reused"])
+
+
+class UsageMiddleware:
+	"""
+	Enforce quotas before metered requests start and charge each one's latency and the
+	prompt tokens boilerplate stripping saved. Must run inside SchedulingMiddleware so
+	the request's JobContext (tenant) is set, and inside CORSMiddleware so a 429 carries
+	CORS headers.
+	"""
+
+	def __init__(self, app):
+		self.app = app
+
+	async def __call__(self, scope, receive, send):
+		path = scope.get("path", "")
+		ledger = get_ledger() if scope["type"] == "http" and path in METERED_PATHS else None
+		job = current_job()
+		if ledger is None or job is None:
+			await self.app(scope, receive, send)
+			return
+		try:
+			# The check reads SQLite; keep it off the event loop
+			await run_in_threadpool(ledger.check_quota, job.client_id, path)
+		except QuotaExceeded as e:
+			ledger.charge(job.client_id, path, rejected=1)
+			metrics.increment("usage.quota_rejected")
+			await _send_json(send, e.status_code, {"detail": str(e)}, {"retry-after": str(max(1, round(e.retry_after)))})
+			return
+		start = time.perf_counter()
+		try:
+			await self.app(scope, receive, send)
+		finally:
+			elapsed_ms = (time.perf_counter() - start) * 1000
+			ledger.charge(job.client_id, path, requests=1, latency_ms=elapsed_ms, latency_ms_max=elapsed_ms, tokens_saved=job.prompt_tokens_saved)
+
+
+async def _send_json(send, status: int, payload: dict, headers: Dict[str, str]) -> None:
+	body = json.dumps(payload).encode("utf-8")
+	raw_headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+	raw_headers += [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+	await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+	await send({"type": "http.response.body", "body": body})
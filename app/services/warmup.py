@@ -0,0 +1,60 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from app.services import llm, ocr, translate
+
+# WARMUP=background (default) preloads configured backends off the startup path so
+# /health answers immediately; "blocking" finishes before serving; "off" skips it.
+_warmup_mode = os.getenv("WARMUP", "background").lower()
+_OFF_MODES = {"off", "false", "0", "no"}
+
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_state = {"status": "pending", "loaded": {}, "elapsed_ms": None}
+
+
+def warm_up_backends() -> dict:
+	"""Import the heavy optional dependencies of every configured backend."""
+	with _lock:
+		if _state["status"] == "ready":
+			return dict(_state)
+		_state["status"] = "running"
+	start = time.perf_counter()
+	loaded = {}
+	for name, service in (("ocr", ocr), ("llm", llm), ("translate", translate)):
+		try:
+			loaded.update(service.warm_up())
+		except Exception as e:
+			print(f"[warmup] {name} warm-up failed: {e}")
+			loaded[name] = False
+	elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+	with _lock:
+		_state.update(status="ready", loaded=loaded, elapsed_ms=elapsed_ms)
+	print(f"[warmup] ready in {elapsed_ms} ms: {loaded}")
+	return dict(_state)
+
+
+def warm_up_disabled(mode: Optional[str] = None) -> bool:
+	return (mode or _warmup_mode).lower() in _OFF_MODES
+
+
+def start_warm_up(mode: Optional[str] = None) -> None:
+	"""Run the warm-up stage according to WARMUP (or an explicit mode)."""
+	global _thread
+	mode = (mode or _warmup_mode).lower()
+	if warm_up_disabled(mode):
+		_state["status"] = "disabled"
+		return
+	if mode == "blocking":
+		warm_up_backends()
+		return
+	if _thread is None or not _thread.is_alive():
+		_thread = threading.Thread(target=warm_up_backends, name="aidocmate-warmup", daemon=True)
+		_thread.start()
+
+
+def warm_up_status() -> dict:
+	with _lock:
+		return dict(_state)
@@ -0,0 +1,136 @@
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Optional
+
+from app.utils import metrics
+
+_enabled = os.getenv("STRIP_BOILERPLATE", "true").lower() in {"1", "true", "yes"}
+
+# tiktoken is optional; without it tokens are estimated from character counts
+_encoding = None
+_has_tiktoken: Optional[bool] = None
+
+_DIGITS = re.compile(r"[0-9०-९]+")
+_SPACE = re.compile(r"\s+")
+_LETTER = re.compile(r"[^\W\d_]")
+_PAGE_BREAK = "\f"
+
+# Lines that never carry document content, wherever they appear
+_KNOWN_BOILERPLATE = [re.compile(p, re.IGNORECASE) for p in (
+	r"^(?:page|pg\.?|पृष्ठ|पान)\s*(?:no\.?\s*)?[0-9०-९]{1,4}(?:\s*(?:of|/|का)\s*[0-9०-९]{1,4})?$",
+	r"^[0-9०-९]{1,4}\s+of\s+[0-9०-९]{1,4}$",
+	r"^[-–—]\s*[0-9०-९]{1,4}\s*[-–—]$",
+	r"^this is an? (?:system|computer|electronically)[- ]generated (?:document|letter|receipt|statement|notice)\b.*$",
+	r"^.{0,40}does not require (?:any )?(?:physical )?signature\.?$",
+	r"^(?:printed|generated|downloaded) (?:on|at)\s*:?\s*[0-9०-९/.:\- ]+(?:[ap]m)?$",
+	r"^scan(?:ned)? (?:by|with) camscanner$",
+)]
+
+
+@dataclass
+class StripResult:
+	text: str
+	removed_lines: int
+	tokens_before: int
+	tokens_after: int
+
+	@property
+	def tokens_saved(self) -> int:
+		return self.tokens_before - self.tokens_after
+
+
+def _load_tiktoken():
+	global _encoding, _has_tiktoken
+	if _has_tiktoken is None:
+		try:
+			import tiktoken
+			_encoding, _has_tiktoken = tiktoken.get_encoding("o200k_base"), True
+		except Exception:
+			_has_tiktoken = False
+	return _encoding if _has_tiktoken else None
+
+
+def estimate_tokens(text: str) -> int:
+	encoding = _load_tiktoken()
+	if encoding is not None:
+		return len(encoding.encode(text))
+	# ~4 chars per token for Latin script, ~2 for Indic scripts
+	non_ascii = sum(1 for ch in text if ord(ch) > 127)
+	return (len(text) - non_ascii + 3) // 4 + (non_ascii + 1) // 2
+
+
+def _line_key(line: str) -> str:
+	"""Page-independent form of a line: numbers masked so 'Page 3 of 9' == 'Page 4 of 9'."""
+	return _DIGITS.sub("#", _SPACE.sub(" ", line.strip().lower()))
+
+
+def _is_known_boilerplate(line: str) -> bool:
+	stripped = line.strip()
+	return any(pattern.match(stripped) for pattern in _KNOWN_BOILERPLATE)
+
+
+def strip_boilerplate(text: str, pages: Optional[List[str]] = None) -> StripResult:
+	"""
+	Remove page furniture before prompting: page numbers and known boilerplate lines
+	everywhere, and lines that recur on most pages (letterheads, footers, disclaimers)
+	except on the first page they appear on. Pages come from `pages` or from the form
+	feeds extraction puts between pages; text without page breaks is never de-duplicated,
+	since a line repeated within one page (e.g. a form label) is content.
+	"""
+	tokens_before = estimate_tokens(text or "")
+	if not _enabled or not text:
+		return StripResult(text or "", 0, tokens_before, tokens_before)
+	if pages is None:
+		pages = text.split(_PAGE_BREAK)
+	page_lines = [page.split("\n") for page in pages]
+
+	repeated = set()
+	if len(page_lines) > 1:
+		per_page = Counter(key for lines in page_lines for key in {_line_key(line) for line in lines})
+		# Short or letter-free repeats (e.g. "Yes", "____") are more likely form content
+		repeated = {
+			key for key, count in per_page.items()
+			if count >= max(2, len(page_lines) // 2 + 1) and len(key) >= 8 and _LETTER.search(key)
+		}
+
+	kept_pages: List[str] = []
+	seen = set()
+	removed = 0
+	for lines in page_lines:
+		kept: List[str] = []
+		on_page = set()
+		for line in lines:
+			key = _line_key(line)
+			if not key:
+				kept.append(line)
+				continue
+			if _is_known_boilerplate(line):
+				removed += 1
+				continue
+			if key in repeated:
+				# Furniture appears once per page: drop that copy on every page after the first
+				if key in seen and key not in on_page:
+					on_page.add(key)
+					removed += 1
+					continue
+				on_page.add(key)
+			kept.append(line)
+		seen.update(on_page)
+		kept_pages.append("\n".join(kept))
+
+	if not removed:
+		return StripResult(text.replace(_PAGE_BREAK, "\n\n"), 0, tokens_before, tokens_before)
+	stripped = re.sub(r"\n{3,}", "\n\n", "\n\n".join(page.strip("\n") for page in kept_pages if page.strip())).strip()
+	return StripResult(stripped, removed, tokens_before, estimate_tokens(stripped))
+
+
+def strip_for_prompt(text: str) -> StripResult:
+	"""strip_boilerplate for prompt builders; records what was removed in metrics."""
+	result = strip_boilerplate(text)
+	if result.removed_lines:
+		metrics.increment("boilerplate.lines_removed", result.removed_lines)
+		metrics.increment("boilerplate.tokens_saved", result.tokens_saved)
+		print(f"[boilerplate] removed {result.removed_lines} line(s), ~{result.tokens_saved} of {result.tokens_before} tokens")
+	return result
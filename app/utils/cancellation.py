@@ -0,0 +1,150 @@
+import asyncio
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, Optional
+
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from app.utils import metrics
+
+_disconnect_poll_seconds = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.25"))
+
+
+class OperationCancelled(Exception):
+	"""Raised inside OCR/LLM work once the request that needed it has gone away."""
+
+
+class CancelToken:
+	"""
+	Thread-safe cancellation flag shared between the event loop and worker threads.
+	Callbacks (e.g. killing a subprocess, closing an HTTP stream) run once on cancel.
+	"""
+
+	def __init__(self):
+		self._event = threading.Event()
+		self._lock = threading.Lock()
+		self._callbacks: Dict[int, Callable[[], None]] = {}
+		self._next_id = 0
+		self.reason: Optional[str] = None
+
+	@property
+	def cancelled(self) -> bool:
+		return self._event.is_set()
+
+	def cancel(self, reason: str = "cancelled") -> None:
+		with self._lock:
+			if self._event.is_set():
+				return
+			self.reason = reason
+			self._event.set()
+			callbacks = list(self._callbacks.values())
+			self._callbacks.clear()
+		for callback in callbacks:
+			try:
+				callback()
+			except Exception as e:
+				print(f"[cancel] callback failed: {e}")
+
+	def raise_if_cancelled(self) -> None:
+		if self._event.is_set():
+			raise OperationCancelled(self.reason)
+
+	def add_callback(self, callback: Callable[[], None]) -> int:
+		"""Register a callback; runs immediately if the token is already cancelled."""
+		with self._lock:
+			if not self._event.is_set():
+				self._next_id += 1
+				self._callbacks[self._next_id] = callback
+				return self._next_id
+		callback()
+		return 0
+
+	def remove_callback(self, handle: int) -> None:
+		with self._lock:
+			self._callbacks.pop(handle, None)
+
+
+_current_token: ContextVar[Optional[CancelToken]] = ContextVar("aidocmate_cancel_token", default=None)
+
+
+def current_token() -> Optional[CancelToken]:
+	return _current_token.get()
+
+
+def raise_if_cancelled() -> None:
+	token = _current_token.get()
+	if token is not None:
+		token.raise_if_cancelled()
+
+
+@contextmanager
+def use_token(token: CancelToken) -> Iterator[CancelToken]:
+	reset = _current_token.set(token)
+	try:
+		yield token
+	finally:
+		_current_token.reset(reset)
+
+
+async def _cancel_on_disconnect(request, token: CancelToken) -> None:
+	while not token.cancelled:
+		if await request.is_disconnected():
+			metrics.increment("cancel.requests")
+			print(f"[cancel] client disconnected from {request.url.path}; cancelling work")
+			token.cancel("client disconnected")
+			return
+		await asyncio.sleep(_disconnect_poll_seconds)
+
+
+async def run_cancellable(request, func, *args, **kwargs):
+	"""
+	Run blocking OCR/LLM work in the threadpool with a CancelToken that fires when the
+	HTTP client disconnects. The token is the current token inside func.
+	"""
+	token = CancelToken()
+
+	def call():
+		with use_token(token):
+			return func(*args, **kwargs)
+
+	watcher = asyncio.create_task(_cancel_on_disconnect(request, token))
+	try:
+		return await run_in_threadpool(call)
+	finally:
+		watcher.cancel()
+
+
+class _TokenIterator:
+	"""Advances a generator with the token set, like run_cancellable's call()."""
+
+	def __init__(self, iterator, token: CancelToken):
+		self._iterator = iterator
+		self._token = token
+
+	def __iter__(self):
+		return self
+
+	def __next__(self):
+		# Each step runs in a fresh copy of the request context, so the token is set
+		# per step rather than once inside the generator
+		with use_token(self._token):
+			return next(self._iterator)
+
+
+async def stream_cancellable(iterator, token: CancelToken):
+	"""
+	Iterate a blocking generator in the threadpool with token as the current token; if
+	the response is torn down before it finishes (client disconnect), cancel the token
+	so in-flight page work is aborted.
+	"""
+	finished = False
+	try:
+		async for chunk in iterate_in_threadpool(_TokenIterator(iterator, token)):
+			yield chunk
+		finished = True
+	finally:
+		if not finished and not token.cancelled:
+			metrics.increment("cancel.requests")
+			token.cancel("client disconnected")
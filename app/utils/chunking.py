@@ -0,0 +1,129 @@
+import hashlib
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Iterator, List, Tuple
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?।])\s+")
+_LINE = re.compile(r"[^\n\f]+")
+
+
+@dataclass
+class Chunk:
+	index: int
+	text: str
+	start: int  # character offset in the source text
+	digest: str = ""  # content hash, set by content_defined_chunks
+
+
+def _split_long(paragraph: str, max_chars: int) -> List[str]:
+	"""Break an oversized paragraph on sentence ends, then hard-wrap if still too long."""
+	pieces: List[str] = []
+	current = ""
+	for sentence in _SENTENCE_END.split(paragraph):
+		if current and len(current) + len(sentence) + 1 > max_chars:
+			pieces.append(current)
+			current = ""
+		current = f"{current} {sentence}".strip()
+		while len(current) > max_chars:
+			pieces.append(current[:max_chars])
+			current = current[max_chars:]
+	if current:
+		pieces.append(current)
+	return pieces
+
+
+def split_into_chunks(text: str, target_chars: int = 800, max_chars: int = 1500) -> List[Chunk]:
+	"""
+	Group paragraphs into chunks of roughly target_chars, never exceeding max_chars.
+	Offsets point back into the original text so passages can be cited.
+	"""
+	chunks: List[Chunk] = []
+	buffer: List[str] = []
+	buffer_len = 0
+	buffer_start = 0
+	position = 0
+
+	def flush():
+		nonlocal buffer, buffer_len
+		if buffer:
+			chunks.append(Chunk(len(chunks), "\n\n".join(buffer), buffer_start))
+		buffer, buffer_len = [], 0
+
+	for match in _PARAGRAPH_BREAK.finditer(text + "\n\n"):
+		paragraph = text[position:match.start()].strip()
+		paragraph_start = position
+		position = match.end()
+		if not paragraph:
+			continue
+		for piece in _split_long(paragraph, max_chars) if len(paragraph) > max_chars else [paragraph]:
+			if buffer and buffer_len + len(piece) > target_chars:
+				flush()
+			if not buffer:
+				buffer_start = paragraph_start
+			buffer.append(piece)
+			buffer_len += len(piece)
+	flush()
+	return chunks
+
+
+def _normalized(text: str) -> str:
+	return " ".join(text.split())
+
+
+def content_digest(text: str) -> str:
+	return hashlib.sha1(_normalized(text).encode("utf-8")).hexdigest()
+
+
+def _content_units(text: str) -> Iterator[Tuple[int, int]]:
+	"""
+	(start, end) offsets of the sentences on each line. Line breaks and form feeds are
+	boundaries as well as blank lines, since pypdf text wraps with single newlines and joins
+	pages with "\f"; a unit longer than max_chars is hard-wrapped by content_defined_chunks.
+	"""
+	for line in _LINE.finditer(text):
+		position = line.start()
+		for end in _SENTENCE_END.finditer(line.group()):
+			yield position, line.start() + end.start()
+			position = line.start() + end.end()
+		yield position, line.end()
+
+
+def content_defined_chunks(text: str, min_chars: int = 400, max_chars: int = 3000, divisor: int = 4) -> List[Chunk]:
+	"""
+	Split text into chunks whose boundaries depend only on local content: a chunk ends after
+	a line or sentence whose hash is 0 mod divisor, once min_chars is reached, or when
+	max_chars would be exceeded. An edit therefore changes only the chunk(s) it touches; the
+	rest keep their digests across revisions. Chunk text is the original slice, line and page
+	breaks included.
+	"""
+	chunks: List[Chunk] = []
+	buffer_start = buffer_end = -1
+
+	def flush():
+		nonlocal buffer_start
+		if buffer_start >= 0:
+			body = text[buffer_start:buffer_end]
+			chunks.append(Chunk(len(chunks), body, buffer_start, content_digest(body)))
+		buffer_start = -1
+
+	for start, end in _content_units(text):
+		while start < end and text[start].isspace():
+			start += 1
+		while end > start and text[end - 1].isspace():
+			end -= 1
+		while start < end:
+			# An oversized line without sentence ends is hard-wrapped
+			stop = min(end, start + max_chars)
+			if buffer_start >= 0 and stop - buffer_start > max_chars:
+				flush()
+			if buffer_start < 0:
+				buffer_start = start
+			buffer_end = stop
+			unit = text[start:stop]
+			start = stop
+			if buffer_end - buffer_start >= min_chars and zlib.crc32(_normalized(unit).encode("utf-8")) % divisor == 0:
+				flush()
+	flush()
+	return chunks
@@ -1,13 +1,120 @@
 import re
+import unicodedata
+
+# Characters with no meaning in extracted text: carriage returns, zero-width space,
+# BOM/ZWNBSP and soft hyphens
+_DELETE = ("\r", "\u200b", "\ufeff", "\u00ad")
+
+# Tabs, vertical tabs, NBSP and the Unicode space family become a single space
+_HSPACE_CHARS = "\t\x0b\xa0\u1680\u2000-\u200a\u202f\u205f\u3000"
+_HSPACE = re.compile(f"[{_HSPACE_CHARS}]+")
+# Written with a literal prefix so the engine can skip ahead to it (" {2,}" cannot)
+_SPACE_RUN = re.compile("  +")
+
+# ZWNJ/ZWJ are meaningful only right after a virama (e.g. Marathi eyelash ra, Malayalam
+# chillus); anywhere else they are OCR debris that splits words and cache keys
+_VIRAMAS = "\u094d\u09cd\u0a4d\u0acd\u0b4d\u0bcd\u0c4d\u0ccd\u0d4d\u0dca"
+_STRAY_JOINER = re.compile(f"[\u200c\u200d](?<![{_VIRAMAS}][\u200c\u200d])")
+
+# A word split across lines ("ac-" / "count"); the lookbehind sits after the literal
+# "-\n" so the regex engine can scan for it instead of trying every position
+
+_HYPHEN_BREAK = re.compile(r"-\n(?<=[^\W\d_]-\n)(?=[a-z])")
+_BLANK_LINES = re.compile(r"\n\n\n+")
+
+
+def _nfc(text: str) -> str:
+	"""
+	NFC line by line. Nothing composes across a newline, so this equals normalising the
+	whole text, but normalize() returns lines that pass its quick check untouched and only
+	the lines with combining sequences (nukta, split vowel signs) pay for a full pass.
+	"""
+	return "\n".join([unicodedata.normalize("NFC", line) for line in text.split("\n")])
+
+
+def _join_pages(text: str) -> str:
+	"""
+	Form feeds are page breaks (extraction joins pages with "\f"). They are kept, without
+	the blank lines around them or empty pages between them, so boilerplate stripping can
+	tell pages apart.
+	"""
+	pages = text.split("\f")
+	last = len(pages) - 1
+	kept = [pages[0].rstrip(" \n")]
+	kept.extend(page for page in (page.strip(" \n") for page in pages[1:last]) if page)
+	kept.append(pages[last].lstrip(" \n"))
+	return "\f".join(kept)
+
+
+def _clean_block(text: str) -> str:
+	"""
+	Each step is a C-level scan that skips text it cannot match (literal-led patterns,
+	`in` checks before str.replace); measured faster under CPython than a single combined
+	regex. See scripts/bench_cleaning.py.
+	"""
+	for char in _DELETE:
+		if char in text:
+			text = text.replace(char, "")
+	if _HSPACE.search(text):
+		text = _HSPACE.sub(" ", text)
+	text = _SPACE_RUN.sub(" ", text)
+	if not text.isascii():
+		if "\u200c" in text or "\u200d" in text:
+			text = _STRAY_JOINER.sub("", text)
+		text = _nfc(text)
+	text = text.replace(" \n", "\n").replace("\n ", "\n")
+	if "\f" in text:
+		text = _join_pages(text)
+	text = _HYPHEN_BREAK.sub("", text)
+	return _BLANK_LINES.sub("\n\n", text)
+
+
+class TextCleaner:
+	"""
+	Incremental cleaner for OCR/PDF text with Indic-aware Unicode normalisation.
+
+	feed() accepts pages or arbitrary chunks and returns the cleaned text for everything
+	up to the last safe line break, holding back only the final line (which may continue
+	in the next chunk, e.g. a hyphenated word). Each chunk is cleaned once while it is
+	small and hot, so memory is bounded by the chunk size rather than the document size.
+	flush() ends a page or document; feed() + flush() per page equals
+	clean_extracted_text(page).
+	"""
+
+	def __init__(self):
+		self._tail = ""
+		self._started = False
+
+	def _emit(self, cleaned: str) -> str:
+		if not self._started:
+			cleaned = cleaned.lstrip(" \n\f")
+			self._started = bool(cleaned)
+		return cleaned
+
+	def feed(self, chunk: str) -> str:
+		buffer = self._tail + chunk
+		content_end = len(buffer.rstrip())
+		cut = buffer.rfind("\n", 0, content_end)
+		# Never split between "hyphen-" and the line that continues the word
+		while cut > 0 and buffer[cut - 1] == "-":
+			cut = buffer.rfind("\n", 0, cut - 1)
+		# Hold back the whole whitespace run so blank lines are collapsed across chunks
+		cut = len(buffer[:cut].rstrip()) if cut > 0 else 0
+		if cut == 0:
+			self._tail = buffer
+			return ""
+		self._tail = buffer[cut:]
+		return self._emit(_clean_block(buffer[:cut]).rstrip(" "))
+
+	def flush(self) -> str:
+		"""Clean whatever is buffered (end of a page or document); the next feed starts afresh."""
+		tail, self._tail = self._tail, ""
+		cleaned = self._emit(_clean_block(tail).rstrip(" \n\f")) if tail else ""
+		self._started = False
+		return cleaned
 
 
 def clean_extracted_text(text: str) -> str:
 	if not text:
 		return ""
-	# Normalize whitespace and remove stray hyphenation artifacts common in OCR
-	cleaned = text.replace("\r", "")
-	cleaned = re.sub(r"[\t\f]+", " ", cleaned)
-	cleaned = re.sub(r"\s+-\n\s*", "", cleaned)  # join broken words at line ends
-	cleaned = re.sub(r"\n{3,}", "\n\n", cleaned)
-	cleaned = re.sub(r"[ \t]{2,}", " ", cleaned)
-	return cleaned.strip() 
\ No newline at end of file
+	return _clean_block(text).strip(" \n\f")
@@ -0,0 +1,137 @@
+import gzip
+import os
+from typing import List, Optional, Tuple
+
+try:
+	import brotli  # type: ignore
+	_has_brotli = True
+except Exception:
+	brotli = None  # type: ignore
+	_has_brotli = False
+
+
+COMPRESSIBLE_TYPES = (
+	"text/",
+	"application/json",
+	"application/javascript",
+	"application/x-ndjson",
+	"application/xml",
+	"image/svg+xml",
+)
+
+_min_size = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+_gzip_level = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+_brotli_quality = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
+
+def parse_accept_encoding(header: str) -> dict:
+	"""Return {coding: q} for an Accept-Encoding header."""
+	accepted = {}
+	for part in (header or "").split(","):
+		token, _, params = part.strip().partition(";")
+		token = token.strip().lower()
+		if not token:
+			continue
+		q = 1.0
+		params = params.strip()
+		if params.startswith("q="):
+			try:
+				q = float(params[2:])
+			except ValueError:
+				q = 0.0
+		accepted[token] = q
+	return accepted
+
+
+def choose_encoding(header: str, available: Tuple[str, ...] = ("br", "gzip")) -> Optional[str]:
+	"""
+	Pick the supported content-coding with the client's highest q-value; ties go to the
+	order of `available` (br first).
+	"""
+	accepted = parse_accept_encoding(header)
+	best, best_q = None, 0.0
+	for coding in available:
+		if coding == "br" and not _has_brotli:
+			continue
+		q = accepted.get(coding, accepted.get("*", 0.0))
+		if q > best_q:
+			best, best_q = coding, q
+	return best
+
+
+def compress(body: bytes, coding: str) -> bytes:
+	if coding == "br":
+		return brotli.compress(body, quality=_brotli_quality)
+	return gzip.compress(body, compresslevel=_gzip_level, mtime=0)
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+	for key, value in headers:
+		if key.lower() == name:
+			return value
+	return None
+
+
+class CompressionMiddleware:
+	"""
+	ASGI middleware that brotli/gzip-compresses buffered responses above a size threshold.
+	Streaming responses (more_body) and already-encoded bodies pass through untouched so
+	incremental output is not held back by the compressor.
+	"""
+
+	def __init__(self, app, minimum_size: int = _min_size):
+		self.app = app
+		self.minimum_size = minimum_size
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+		accept = _header(scope.get("headers", []), b"accept-encoding") or b""
+		coding = choose_encoding(accept.decode("latin-1"))
+		if coding is None:
+			await self.app(scope, receive, send)
+			return
+
+		start_message = None
+		passthrough = False
+
+		async def send_wrapper(message):
+			nonlocal start_message, passthrough
+			if passthrough:
+				await send(message)
+				return
+			if message["type"] == "http.response.start":
+				start_message = message
+				return
+			if message["type"] != "http.response.body":
+				await send(message)
+				return
+
+			body = message.get("body", b"")
+			headers = list(start_message.get("headers", []))
+			content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+			if (
+				message.get("more_body", False)
+				or _header(headers, b"content-encoding") is not None
+				or len(body) < self.minimum_size
+				or not content_type.startswith(COMPRESSIBLE_TYPES)
+			):
+				passthrough = True
+				await send(start_message)
+				await send(message)
+				return
+
+			compressed = compress(body, coding)
+			headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+			headers.append((b"content-encoding", coding.encode()))
+			headers.append((b"content-length", str(len(compressed)).encode()))
+			vary = _header(headers, b"vary")
+			if vary is None:
+				headers.append((b"vary", b"Accept-Encoding"))
+			elif b"accept-encoding" not in vary.lower():
+				headers = [(k, v + b", Accept-Encoding" if k.lower() == b"vary" else v) for k, v in headers]
+			await send({**start_message, "headers": headers})
+			await send({**message, "body": compressed})
+
+		await self.app(scope, receive, send_wrapper)
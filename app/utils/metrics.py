@@ -0,0 +1,45 @@
+import threading
+from collections import defaultdict
+from typing import Dict
+
+# Process-local counters and timing summaries, exposed at /metrics. With several
+# workers each process reports its own numbers.
+_lock = threading.Lock()
+_counters: Dict[str, float] = defaultdict(float)
+_timings: Dict[str, Dict[str, float]] = {}
+
+
+def increment(name: str, value: float = 1) -> None:
+	with _lock:
+		_counters[name] += value
+
+
+def observe(name: str, value: float) -> None:
+	"""Record one sample (e.g. milliseconds) into a count/sum/max summary."""
+	with _lock:
+		summary = _timings.get(name)
+		if summary is None:
+			summary = _timings[name] = {"count": 0, "sum": 0.0, "max": 0.0}
+		summary["count"] += 1
+		summary["sum"] += value
+		summary["max"] = max(summary["max"], value)
+
+
+def counter(name: str) -> float:
+	with _lock:
+		return _counters.get(name, 0)
+
+
+def snapshot() -> dict:
+	with _lock:
+		timings = {
+			name: {**summary, "avg": round(summary["sum"] / summary["count"], 3) if summary["count"] else 0.0}
+			for name, summary in _timings.items()
+		}
+		return {"counters": dict(_counters), "timings": timings}
+
+
+def reset() -> None:
+	with _lock:
+		_counters.clear()
+		_timings.clear()
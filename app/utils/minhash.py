@@ -0,0 +1,136 @@
+import random
+import re
+import unicodedata
+import zlib
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = 0xFFFFFFFF
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def shingles(text: str, k: int = 3) -> Set[int]:
+	"""Stable 32-bit hashes of k-word shingles; robust to whitespace/case OCR noise."""
+	words = _WORD.findall(unicodedata.normalize("NFC", text or "").lower())
+	if not words:
+		return set()
+	if len(words) < k:
+		return {zlib.crc32(" ".join(words).encode("utf-8"))}
+	return {zlib.crc32(" ".join(words[i:i + k]).encode("utf-8")) for i in range(len(words) - k + 1)}
+
+
+class MinHasher:
+	"""MinHash signatures with seeded universal hash permutations (stable across processes)."""
+
+	def __init__(self, num_perm: int = 64, seed: int = 1):
+		rng = random.Random(seed)
+		self.num_perm = num_perm
+		self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+
+	def signature_of_hashes(self, hashes: Iterable[int]) -> array:
+		hashes = list(hashes)
+		if not hashes:
+			return array("I", [_MAX_HASH] * self.num_perm)
+		return array("I", [
+			min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+			for a, b in self._perms
+		])
+
+	def signature(self, text: str, k: int = 3) -> array:
+		return self.signature_of_hashes(shingles(text, k))
+
+
+def similarity(left, right) -> float:
+	"""Estimated Jaccard similarity of two MinHash signatures."""
+	if not left:
+		return 0.0
+	return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+
+class LSHIndex:
+	"""
+	Banded LSH over MinHash signatures with a fixed capacity. Signatures live in one flat
+	array('I') used as a ring buffer, so memory is bounded by capacity * num_perm * 4 bytes
+	plus one bucket entry per band per document; the oldest document is evicted when full.
+	"""
+
+	def __init__(self, num_perm: int = 64, bands: int = 8, capacity: int = 100_000):
+		if num_perm % bands:
+			raise ValueError("num_perm must be divisible by bands")
+		self.num_perm = num_perm
+		self.bands = bands
+		self.rows = num_perm // bands
+		self.capacity = capacity
+		self._sigs = array("I", bytes(4 * num_perm * capacity))
+		self._keys: List[Optional[str]] = [None] * capacity
+		self._slot_of: Dict[str, int] = {}
+		# One dict per band: band hash -> slot (int) or list of slots on collision
+		self._buckets: List[Dict[int, object]] = [{} for _ in range(bands)]
+		self._next = 0
+
+	def __len__(self) -> int:
+		return len(self._slot_of)
+
+	def __contains__(self, key: str) -> bool:
+		return key in self._slot_of
+
+	def _band_hashes(self, sig) -> List[int]:
+		r = self.rows
+		return [hash(tuple(sig[i * r:(i + 1) * r])) for i in range(self.bands)]
+
+	def _stored(self, slot: int):
+		base = slot * self.num_perm
+		return self._sigs[base:base + self.num_perm]
+
+	def _unlink(self, slot: int) -> None:
+		for bucket, band_hash in zip(self._buckets, self._band_hashes(self._stored(slot))):
+			entry = bucket.get(band_hash)
+			if entry == slot:
+				del bucket[band_hash]
+			elif isinstance(entry, list):
+				entry.remove(slot)
+				if len(entry) == 1:
+					bucket[band_hash] = entry[0]
+
+	def add(self, key: str, sig) -> Tuple[int, Optional[str]]:
+		"""Insert a signature; returns (slot, evicted key or None)."""
+		if key in self._slot_of:
+			return self._slot_of[key], None
+		slot = self._next
+		self._next = (slot + 1) % self.capacity
+		evicted = self._keys[slot]
+		if evicted is not None:
+			self._unlink(slot)
+			del self._slot_of[evicted]
+		base = slot * self.num_perm
+		self._sigs[base:base + self.num_perm] = array("I", sig)
+		self._keys[slot] = key
+		self._slot_of[key] = slot
+		for bucket, band_hash in zip(self._buckets, self._band_hashes(sig)):
+			entry = bucket.get(band_hash)
+			if entry is None:
+				bucket[band_hash] = slot
+			elif isinstance(entry, list):
+				entry.append(slot)
+			else:
+				bucket[band_hash] = [entry, slot]
+		return slot, evicted
+
+	def query(self, sig, threshold: float = 0.0, limit: int = 5) -> List[Tuple[str, float]]:
+		candidates: Set[int] = set()
+		for bucket, band_hash in zip(self._buckets, self._band_hashes(sig)):
+			entry = bucket.get(band_hash)
+			if entry is None:
+				continue
+			if isinstance(entry, list):
+				candidates.update(entry)
+			else:
+				candidates.add(entry)
+		scored = []
+		for slot in candidates:
+			score = similarity(sig, self._stored(slot))
+			if score >= threshold:
+				scored.append((self._keys[slot], score))
+		scored.sort(key=lambda item: item[1], reverse=True)
+		return scored[:limit]
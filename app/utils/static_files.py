@@ -0,0 +1,157 @@
+import hashlib
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+
+from app.utils.compression import _has_brotli, choose_encoding, compress
+
+PRECOMPRESS_SUFFIXES = {".js", ".css", ".html", ".json", ".map", ".svg", ".txt", ".ico"}
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# CRA emits content-hashed names such as main.3f2a9c1b.js / 787.1c2d3e4f.chunk.css
+_HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.")
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+
+def _available_encodings() -> Tuple[str, ...]:
+	return ("br", "gzip") if _has_brotli else ("gzip",)
+
+
+def default_build_path() -> Path:
+	"""frontend/build inside the project, falling back to its parent (other repo layouts)."""
+	inner = Path(__file__).resolve().parent.parent.parent / "frontend" / "build"
+	outer = inner.parent.parent.parent / "frontend" / "build"
+	return inner if inner.exists() else outer
+
+
+def _write_atomic(target: Path, data: bytes) -> None:
+	"""Write via a temp file and os.replace so readers never see a truncated variant."""
+	fd, tmp = tempfile.mkstemp(prefix=f".{target.name}.", suffix=".tmp", dir=str(target.parent))
+	try:
+		with os.fdopen(fd, "wb") as f:
+			f.write(data)
+		os.replace(tmp, target)
+	except BaseException:
+		try:
+			os.unlink(tmp)
+		except OSError:
+			pass
+		raise
+
+
+def precompress_directory(root: Path, minimum_size: int = 512) -> int:
+	"""
+	Write .br/.gz siblings for compressible build assets that lack an up-to-date one.
+	Run once per deployment (build step, or the launcher before workers start), not per
+	worker. Returns the number of files written; read-only deployments are skipped quietly.
+	"""
+	written = 0
+	root = Path(root)
+	if not root.is_dir():
+		return 0
+	for path in root.rglob("*"):
+		if not path.is_file() or path.suffix not in PRECOMPRESS_SUFFIXES:
+			continue
+		stat = path.stat()
+		if stat.st_size < minimum_size:
+			continue
+		data = None
+		for coding in _available_encodings():
+			target = path.with_name(path.name + ENCODING_SUFFIXES[coding])
+			if target.exists() and target.stat().st_mtime >= stat.st_mtime:
+				continue
+			if data is None:
+				data = path.read_bytes()
+			try:
+				_write_atomic(target, compress(data, coding))
+				written += 1
+			except OSError as e:
+				print(f"[static] cannot precompress {path.name}: {e}")
+				return written
+	return written
+
+
+class PrecompressedStaticFiles(StaticFiles):
+	"""
+	StaticFiles that serves precompressed .br/.gz siblings by Accept-Encoding and marks
+	content-hashed build assets as immutable.
+	"""
+
+	def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+		request_headers = Headers(scope=scope)
+		full_path = str(full_path)
+		name = os.path.basename(full_path)
+		cache_control = IMMUTABLE_CACHE if _HASHED_NAME.search(name) else REVALIDATE_CACHE
+		headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+
+		coding = choose_encoding(request_headers.get("accept-encoding", ""), _available_encodings())
+		if coding:
+			variant = full_path + ENCODING_SUFFIXES[coding]
+			try:
+				variant_stat = os.stat(variant)
+			except OSError:
+				variant_stat = None
+			if variant_stat is not None and variant_stat.st_mtime >= stat_result.st_mtime:
+				response = FileResponse(
+					variant,
+					status_code=status_code,
+					stat_result=variant_stat,
+					media_type=FileResponse(full_path, stat_result=stat_result).media_type,
+					headers={**headers, "Content-Encoding": coding},
+				)
+				if self.is_not_modified(response.headers, request_headers):
+					return Response(status_code=304, headers={k: v for k, v in response.headers.items() if k in {"etag", "cache-control", "vary"}})
+				return response
+
+		response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+		if self.is_not_modified(response.headers, request_headers):
+			return Response(status_code=304, headers={k: v for k, v in response.headers.items() if k in {"etag", "cache-control", "vary"}})
+		return response
+
+
+class CachedIndex:
+	"""index.html held in memory with an ETag and pre-built compressed variants."""
+
+	def __init__(self, path: Path):
+		self.path = Path(path)
+		self._variants: Optional[Dict[Optional[str], bytes]] = None
+		self.etag: Optional[str] = None
+
+	def _load(self) -> Dict[Optional[str], bytes]:
+		if self._variants is None:
+			body = self.path.read_bytes()
+			self.etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+			variants: Dict[Optional[str], bytes] = {None: body}
+			for coding in _available_encodings():
+				variants[coding] = compress(body, coding)
+			self._variants = variants
+		return self._variants
+
+	def exists(self) -> bool:
+		return self._variants is not None or self.path.exists()
+
+	def response(self, request_headers: Headers) -> Response:
+		variants = self._load()
+		headers = {"ETag": self.etag, "Cache-Control": REVALIDATE_CACHE, "Vary": "Accept-Encoding"}
+		if_none_match = request_headers.get("if-none-match", "")
+		if self.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+			return Response(status_code=304, headers=headers)
+		coding = choose_encoding(request_headers.get("accept-encoding", ""), _available_encodings())
+		if coding:
+			headers["Content-Encoding"] = coding
+		return Response(content=variants[coding], media_type="text/html", headers=headers)
+
+
+if __name__ == "__main__":
+	# Build step: python -m app.utils.static_files frontend/build
+	target = Path(sys.argv[1]) if len(sys.argv) > 1 else default_build_path()
+	count = precompress_directory(target)
+	print(f"[static] wrote {count} precompressed file(s) under {target}")
@@ -20,13 +20,36 @@ function App() {
     formData.append('file', file);
     
     try {
-      const response = await fetch(`${API_BASE}/upload`, {
+      const response = await fetch(`${API_BASE}/upload?stream=true&speculate=true`, {
         method: 'POST',
         body: formData,
       });
       
       if (response.ok) {
-        const result = await response.json();
+        // Pages arrive as newline-delimited JSON; show text as soon as page 1 is ready
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        const pages = [];
+        let buffered = '';
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffered += decoder.decode(value, { stream: true });
+          const lines = buffered.split('\n');
+          buffered = lines.pop();
+          for (const line of lines) {
+            if (!line.trim()) continue;
+            const event = JSON.parse(line);
+            if (event.type === 'page' && event.text) {
+              pages.push(event.text);
+              // Form feeds mark page breaks, matching the server's own join
+              setDocumentText(pages.join('\f'));
+            } else if (event.type === 'error') {
+              throw new Error(event.detail);
+            }
+          }
+        }
+        const result = { extracted_text: pages.join('\f') || 'Could not extract text.' };
         setExtractedText(result.extracted_text);
         setDocumentText(result.extracted_text);
         setUploadedFile(file);
@@ -151,7 +174,7 @@ function App() {
     setIsProcessing(true);
     
     try {
-      const response = await fetch(`${API_BASE}/translate`, {
+      const response = await fetch(`${API_BASE}/translate?echo=false`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -168,7 +191,7 @@ function App() {
         setChatMessages(prev => [...prev, {
           id: Date.now(),
           type: 'bot',
-          content: `🌐 **Translation to Hindi:**\n\n**Original (English):**\n${result.original_text.substring(0, 150)}${result.original_text.length > 150 ? '...' : ''}\n\n**Translated (Hindi):**\n${result.translated_text}`,
+          content: `🌐 **Translation to Hindi:**\n\n**Original (English):**\n${documentText.substring(0, 150)}${documentText.length > 150 ? '...' : ''}\n\n**Translated (Hindi):**\n${result.translated_text}`,
           timestamp: new Date().toLocaleTimeString()
         }]);
       } else {
@@ -1,4 +1,13 @@
 #!/usr/bin/env python3
+"""
+Local entry point.
+
+    python run_server.py            same launcher as production (app.server: gunicorn +
+                                    uvicorn workers, WEB_CONCURRENCY etc.), bound to
+                                    127.0.0.1:8000 unless HOST/PORT are set
+    python run_server.py --reload   single uvicorn process with auto-reload for development
+                                    (also RELOAD=true); multi-worker behaviour is not exercised
+"""
 import sys
 import os
 from pathlib import Path
@@ -8,5 +17,10 @@ current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=True)
+    if "--reload" in sys.argv[1:] or os.getenv("RELOAD", "false").lower() in {"1", "true", "yes"}:
+        import uvicorn
+        uvicorn.run("app.main:app", host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", "8000")), reload=True)
+    else:
+        os.environ.setdefault("HOST", "127.0.0.1")
+        from app.server import run
+        run()
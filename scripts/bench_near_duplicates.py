@@ -0,0 +1,84 @@
+"""
+Benchmark the near-duplicate LSH index.
+
+    python scripts/bench_near_duplicates.py [--documents 1000000] [--queries 2000]
+
+Fills an LSHIndex with synthetic MinHash signatures (a tenth of them near-duplicates of
+earlier ones), then reports insert throughput, peak RSS and lookup latency percentiles,
+plus the cost of computing a signature for a realistic multi-page document.
+"""
+
+import argparse
+import random
+import resource
+import sys
+import time
+from array import array
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.near_duplicates import BANDS, NUM_PERM  # noqa: E402
+from app.utils.minhash import LSHIndex, MinHasher  # noqa: E402
+
+
+def _perturb(sig, rng, changes):
+    noisy = array("I", sig)
+    for i in rng.sample(range(len(noisy)), changes):
+        noisy[i] = rng.getrandbits(32)
+    return noisy
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    index = LSHIndex(NUM_PERM, BANDS, capacity=args.documents)
+    bases = []
+    start = time.perf_counter()
+    for i in range(args.documents):
+        if bases and i % 10 == 0:
+            sig = _perturb(rng.choice(bases), rng, 4)
+        else:
+            sig = array("I", [rng.getrandbits(32) for _ in range(NUM_PERM)])
+            if len(bases) < 10_000:
+                bases.append(sig)
+        index.add(f"doc{i}", sig)
+    insert_s = time.perf_counter() - start
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    hits = [_perturb(rng.choice(bases), rng, 4) for _ in range(args.queries // 2)]
+    misses = [array("I", [rng.getrandbits(32) for _ in range(NUM_PERM)]) for _ in range(args.queries - len(hits))]
+    latencies, found = [], 0
+    for sig in hits + misses:
+        t = time.perf_counter()
+        result = index.query(sig, threshold=0.85)
+        latencies.append((time.perf_counter() - t) * 1e6)
+        found += bool(result)
+
+    words = ("notice applicant scholarship certificate deadline fee office district "
+             "form aadhaar pan income caste submit verify").split()
+    document = " ".join(rng.choice(words) for _ in range(5000))
+    hasher = MinHasher(NUM_PERM)
+    t = time.perf_counter()
+    hasher.signature(document)
+    signature_ms = (time.perf_counter() - t) * 1000
+
+    print(f"documents:            {len(index):,}")
+    print(f"insert throughput:    {args.documents / insert_s:,.0f} docs/s ({insert_s:.1f} s)")
+    print(f"peak RSS:             {rss_mb:,.0f} MB")
+    print(f"lookup p50 / p99:     {_percentile(latencies, 50):.1f} / {_percentile(latencies, 99):.1f} us")
+    print(f"near-dup recall:      {found} / {args.queries} queries matched ({len(hits)} were near-duplicates)")
+    print(f"signature (5k words): {signature_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -64,14 +64,19 @@ def main():
     print("=" * 50)
     
     try:
-        # Start the FastAPI server
-        uvicorn.run(
-            "app.main:app",
-            host=host,
-            port=port,
-            reload=reload_enabled,
-            log_level="info"
-        )
+        if reload_enabled:
+            # Development: single process with auto-reload
+            uvicorn.run(
+                "app.main:app",
+                host=host,
+                port=port,
+                reload=True,
+                log_level="info"
+            )
+        else:
+            # Production: multi-worker launcher configured via WEB_CONCURRENCY etc.
+            from app.server import run
+            run()
     except KeyboardInterrupt:
         print("\n\n🛑 AIDocMate server stopped by user")
     except Exception as e:
@@ -1,7 +1,13 @@
 import io
+import os
+import tempfile
+
 import pytest
 from PIL import Image
 
+# Keep persistent stores (near-duplicate index, ...) out of the working tree during tests
+os.environ.setdefault("AIDOCMATE_DATA_DIR", tempfile.mkdtemp(prefix="aidocmate-tests-"))
+
 
 @pytest.fixture()
 def sample_text() -> str:
@@ -0,0 +1,63 @@
+import gzip
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.utils import compression
+
+client = TestClient(main.app)
+
+
+def test_translate_can_omit_echoed_input(monkeypatch):
+    monkeypatch.setattr(main, "translate_text_with_llm", lambda text, target_language: "नमस्ते")
+
+    echoed = client.post("/translate", json={"text": "Hello " * 500, "target_language": "hi"}).json()
+    slim = client.post("/translate?echo=false", json={"text": "Hello " * 500, "target_language": "hi"}).json()
+    assert echoed["original_text"].startswith("Hello")
+    assert "original_text" not in slim
+    assert slim["translated_text"] == "नमस्ते"
+
+
+def test_large_json_is_compressed_and_small_is_not(monkeypatch):
+    monkeypatch.setattr(main, "translate_text_with_llm", lambda text, target_language: text)
+
+    big = client.post("/translate", json={"text": "Aadhaar update " * 400, "target_language": "hi"},
+                      headers={"Accept-Encoding": "gzip"})
+    assert big.headers["content-encoding"] == "gzip"
+    assert int(big.headers["content-length"]) < len(big.content) // 5
+    assert big.json()["translated_text"].startswith("Aadhaar")
+
+    small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+
+def test_accept_encoding_negotiation():
+    assert compression.choose_encoding("gzip, deflate") == "gzip"
+    assert compression.choose_encoding("identity") is None
+    assert compression.choose_encoding("gzip;q=0, br;q=0") is None
+    assert gzip.decompress(compression.compress(b"abc", "gzip")) == b"abc"
+    if compression._has_brotli:
+        assert compression.choose_encoding("gzip, br") == "br"
+        assert compression.choose_encoding("gzip;q=1, br;q=0.1") == "gzip"
+        assert compression.choose_encoding("gzip;q=0.5, *;q=0.8") == "br"
+
+
+def test_upload_stream_emits_ndjson_per_page(monkeypatch):
+    import json
+
+    from app.services import ocr
+    from app.services.ocr import PageText
+
+    def fake_pages(file_bytes, use_vision, language_hint, cancel_token=None):
+        yield from [PageText(1, "Page  one", "text_layer", 3.0), PageText(2, "Page two", "tesseract", 40.0)]
+
+    # Raw page text; iter_extracted_pages cleans it before the stream sees it
+    monkeypatch.setattr(ocr, "_iter_pdf_pages", fake_pages)
+
+    resp = client.post("/upload?stream=true", files={"file": ("doc.pdf", b"%PDF-1.7", "application/pdf")})
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [line["type"] for line in lines] == ["page", "page", "done"]
+    assert lines[0]["text"] == "Page one"
+    assert lines[1]["method"] == "tesseract"
+    assert lines[2]["pages"] == 2
@@ -0,0 +1,78 @@
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services import llm, pipeline
+from app.utils.boilerplate import strip_boilerplate
+
+client = TestClient(main.app)
+
+
+def _page(number, body):
+    return "\n".join([
+        "GOVERNMENT OF MAHARASHTRA",
+        "Revenue and Forest Department, Mantralaya, Mumbai 400032",
+        body,
+        "This is a computer generated document and does not require signature.",
+        f"Page {number} of 4",
+    ])
+
+
+PAGES = [
+    _page(1, "Subject: Crop loss compensation for the kharif season 2024."),
+    _page(2, "Farmers must submit Form A with the 7/12 extract to the Talathi."),
+    _page(3, "Compensation of Rs. 13,600 per hectare will be credited to the bank account."),
+    _page(4, "The last date for applications is 30 November 2024."),
+]
+
+
+def test_strips_repeated_letterhead_footer_and_page_numbers():
+    result = strip_boilerplate("\f".join(PAGES))
+    assert result.text.count("GOVERNMENT OF MAHARASHTRA") == 1
+    assert "Page" not in result.text
+    assert "computer generated" not in result.text
+    for body in ("Crop loss", "Form A", "13,600", "30 November 2024"):
+        assert body in result.text
+    assert result.tokens_saved > result.tokens_before * 0.3
+
+
+def test_page_aware_mode_requires_repeats_on_most_pages():
+    pages = ["Attach the income certificate.\nName of applicant", "Name of applicant\nAddress", "Signature", "Date"]
+    result = strip_boilerplate("\n".join(pages), pages=pages)
+    assert result.text.count("Name of applicant") == 2
+    assert strip_boilerplate("Total fee\n500\n500\n500").text.count("500") == 3
+
+
+def test_repeats_without_page_breaks_are_content():
+    form = "\n".join(["Name of applicant: ____", "Name of father/husband", "Name of applicant: ____", "Name of applicant: ____", "Page 1 of 1"])
+    result = strip_boilerplate(form)
+    assert result.text.count("Name of applicant") == 3
+    assert "Page 1" not in result.text and result.removed_lines == 1
+    # The same label twice on a later page: only the per-page furniture copy goes
+    pages = ["Office of the Tahsildar\nSubject", "Office of the Tahsildar\nOffice of the Tahsildar\nBody", "Office of the Tahsildar\nEnd"]
+    assert strip_boilerplate("\f".join(pages)).text.count("Office of the Tahsildar") == 2
+
+
+def test_prompt_tokens_saved_are_reported(monkeypatch):
+    monkeypatch.setattr(pipeline, "get_registry", lambda: None)
+    monkeypatch.setattr(pipeline, "get_store", lambda: None)
+    prompts = []
+
+    def fake_chat(messages, response_format=None, temperature=0.2):
+        prompts.append(messages[-1]["content"])
+        return "- Apply by 30 November"
+
+    monkeypatch.setattr(llm, "_chat", fake_chat)
+    resp = client.post("/simplify", json={"text": "\f".join(PAGES), "reading_level": "intermediate"})
+    assert resp.status_code == 200
+    assert int(resp.headers["x-prompt-tokens-saved"]) > 0
+    assert prompts[0].count("Mantralaya") == 1
+
+
+def test_translate_and_ask_prompts_are_stripped_too():
+    from app.prompts import build_ask_messages, build_translate_messages
+
+    translate = build_translate_messages("\f".join(PAGES), target_language="mr")[-1]["content"]
+    assert "\f" not in translate and translate.count("Mantralaya") == 1 and "Page 2 of 4" not in translate
+    ask = build_ask_messages("When is the deadline?", ["\f".join(PAGES[2:]), PAGES[1]])[-1]["content"]
+    assert "\f" not in ask and "Page" not in ask and "computer generated" not in ask
+    assert "[1]" in ask and "[2]" in ask and "30 November 2024" in ask
@@ -0,0 +1,116 @@
+import io
+import os
+import stat
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from app.services import llm, ocr
+from app.utils import metrics
+from app.utils.cancellation import CancelToken, OperationCancelled, current_token, stream_cancellable, use_token
+
+
+def test_token_runs_callbacks_once():
+    token = CancelToken()
+    calls = []
+    handle = token.add_callback(lambda: calls.append("a"))
+    token.add_callback(lambda: calls.append("b"))
+    token.remove_callback(handle)
+    token.cancel("gone")
+    token.cancel("again")
+    assert calls == ["b"]
+    assert token.reason == "gone"
+    # Late registration fires immediately
+    token.add_callback(lambda: calls.append("late"))
+    assert calls == ["b", "late"]
+    with pytest.raises(OperationCancelled):
+        token.raise_if_cancelled()
+
+
+def test_streamed_generator_sees_the_token():
+    import asyncio
+
+    token = CancelToken()
+
+    def pages():
+        for _ in range(3):
+            yield current_token() is token
+
+    async def collect():
+        return [seen async for seen in stream_cancellable(pages(), token)]
+
+    assert asyncio.run(collect()) == [True, True, True]
+    assert current_token() is None
+
+
+def _blank_pdf(pages: int) -> bytes:
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=100, height=100)
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+def test_remaining_pages_are_skipped_after_cancel(monkeypatch):
+    metrics.reset()
+    token = CancelToken()
+    monkeypatch.setattr(ocr._PdfRenderer, "render", lambda self, index: Image.new("RGB", (10, 10)))
+    monkeypatch.setattr(ocr, "_tesseract_ocr_image", lambda image, hint, cancel_token=None: "text")
+
+    pages = ocr.iter_extracted_pages(_blank_pdf(4), "scan.pdf", language_hint="en", cancel_token=token)
+    assert next(pages).page == 1
+    token.cancel("client disconnected")
+    with pytest.raises(OperationCancelled):
+        next(pages)
+    assert metrics.counter("cancel.pages_skipped") == 3
+
+
+@pytest.mark.skipif(os.name == "nt", reason="uses a shell script as a fake tesseract")
+def test_tesseract_process_is_killed_on_cancel(monkeypatch, tmp_path):
+    metrics.reset()
+    fake = tmp_path / "tesseract"
+    fake.write_text("#!/bin/sh\nexec sleep 30\n")
+    fake.chmod(fake.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(ocr.pytesseract.pytesseract, "tesseract_cmd", str(fake))
+
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel).start()
+    start = time.perf_counter()
+    with pytest.raises(OperationCancelled):
+        ocr._run_tesseract_cancellable(Image.new("RGB", (10, 10)), "eng", token)
+    assert time.perf_counter() - start < 5
+    assert metrics.counter("cancel.ocr_processes_killed") == 1
+
+
+class _SlowStream:
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        for _ in range(100):
+            if self.closed.is_set():
+                raise RuntimeError("connection closed")
+            time.sleep(0.02)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="x"))])
+
+    def close(self):
+        self.closed.set()
+
+
+def test_llm_stream_is_aborted_on_cancel():
+    metrics.reset()
+    stream = _SlowStream()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: stream)))
+    token = CancelToken()
+    threading.Timer(0.1, token.cancel).start()
+
+    with use_token(token), pytest.raises(OperationCancelled):
+        llm._complete(client, "gpt-4o-mini", [{"role": "user", "content": "hi"}], 0.2)
+    assert stream.closed.is_set()
+    assert metrics.counter("cancel.llm_calls_aborted") == 1
@@ -0,0 +1,41 @@
+import unicodedata
+
+from app.utils.cleaning import TextCleaner, clean_extracted_text
+
+RAW = (
+    "  Post-Matric\tScholarship  \r\n\n\n\n"
+    "Submit the income certi-\nficate and the Ex-\nServicemen card.\n"
+    "आवेदन‌ पत्र​  जमा करें\n"
+    "क्‍ष\n\n"
+)
+
+
+def test_cleans_layout_and_invisible_characters():
+    assert clean_extracted_text(RAW) == (
+        "Post-Matric Scholarship\n\n"
+        "Submit the income certificate and the Ex-\nServicemen card.\n"
+        "आवेदन पत्र जमा करें\n"
+        "क्‍ष"
+    )
+
+
+def test_normalises_indic_text_to_nfc():
+    decomposed = unicodedata.normalize("NFD", "प्रवेश शुल्क माफ़ी; ক্ষেত্রে কোন")
+    assert clean_extracted_text(decomposed) == unicodedata.normalize("NFC", decomposed)
+
+
+def test_streaming_matches_one_shot_for_any_chunking():
+    expected = clean_extracted_text(RAW)
+    for size in range(1, len(RAW) + 1):
+        cleaner = TextCleaner()
+        chunks = [RAW[i:i + size] for i in range(0, len(RAW), size)]
+        assert "".join(cleaner.feed(chunk) for chunk in chunks) + cleaner.flush() == expected
+
+
+def test_page_breaks_survive_cleaning_and_streaming():
+    paged = "Page one body.  \n\n\f\n  Page two body.\n\f\f  Page three-\nBody.\n\f"
+    assert clean_extracted_text(paged) == "Page one body.\fPage two body.\fPage three-\nBody."
+    for size in range(1, len(paged) + 1):
+        cleaner = TextCleaner()
+        chunks = [paged[i:i + size] for i in range(0, len(paged), size)]
+        assert "".join(cleaner.feed(chunk) for chunk in chunks) + cleaner.flush() == clean_extracted_text(paged)
@@ -0,0 +1,144 @@
+from app.services import incremental, llm, pipeline
+from app.services.incremental import ChunkCache
+from app.utils.chunking import content_defined_chunks
+
+
+def _notice(deadline="31 October", extra=None):
+    paragraphs = [
+        f"Paragraph {i}: the district collector informs all ration card holders about the verification "
+        f"drive in ward {i}, which requires proof of residence and the family register."
+        for i in range(30)
+    ]
+    paragraphs[12] = f"The last date to complete e-KYC at the ration shop is {deadline}."
+    if extra:
+        paragraphs.insert(20, extra)
+    return "\n\n".join(paragraphs)
+
+
+def test_content_defined_chunks_are_stable_under_edits():
+    before = {c.digest for c in content_defined_chunks(_notice())}
+    edited = content_defined_chunks(_notice(deadline="15 November", extra="A new camp will be held on Sunday."))
+    changed = [c for c in edited if c.digest not in before]
+    assert len(before) > 3
+    assert 1 <= len(changed) <= 2
+    assert all(len(c.text) <= 3000 for c in edited)
+
+
+def test_single_newline_pages_still_get_content_defined_boundaries():
+    # pypdf text: wrapped lines with single newlines, pages joined by form feeds
+    lines = [line for paragraph in _notice().split("\n\n") for line in (paragraph[:90], paragraph[90:])]
+    pages = ["\n".join(lines[i:i + 12]) for i in range(0, len(lines), 12)]
+    before = content_defined_chunks("\f".join(pages))
+    lines[21] = lines[21].replace("ward", "zone")
+    pages = ["\n".join(lines[i:i + 12]) for i in range(0, len(lines), 12)]
+    edited = content_defined_chunks("\f".join(pages))
+    digests = {c.digest for c in before}
+    assert len(before) > 3
+    assert sum(c.digest not in digests for c in edited) == 1
+    assert all(len(c.text) <= 3000 for c in edited)
+
+
+def test_revision_reprocesses_only_changed_chunks(monkeypatch, tmp_path):
+    monkeypatch.setattr(incremental, "_cache", ChunkCache(tmp_path / "chunks.sqlite3"))
+    monkeypatch.setattr(pipeline, "get_registry", lambda: None)
+    sent = []
+
+    def fake_chat(messages, response_format=None, temperature=0.2):
+        sent.append(messages[-1]["content"])
+        return "- summary of a part"
+
+    monkeypatch.setattr(llm, "_chat", fake_chat)
+    _, meta = pipeline.simplify(_notice(), incremental=True)
+    assert meta["source"] == "incremental" and meta["chunks_reused"] == 0
+    assert len(sent) == meta["chunks"]
+
+    sent.clear()
+    second, meta = pipeline.simplify(_notice(deadline="15 November"), incremental=True)
+    # The edited unit may also move one content-defined boundary, so at most two chunks change
+    assert 1 <= len(sent) <= 2 and any("15 November" in prompt for prompt in sent)
+    assert meta["chunks_reused"] >= meta["chunks"] - 2 > 0
+    assert second.text.count("- summary of a part") == meta["chunks"]
+
+
+def test_incremental_checklist_merges_duplicate_items(monkeypatch, tmp_path):
+    monkeypatch.setattr(incremental, "_cache", ChunkCache(tmp_path / "chunks.sqlite3"))
+    monkeypatch.setattr(pipeline, "get_registry", lambda: None)
+    monkeypatch.setattr(
+        llm, "_chat",
+        lambda messages, response_format=None, temperature=0.2: '{"items":[{"name":"Ration card","mandatory":true,"copies":1}]}',
+    )
+    result, meta = pipeline.checklist(_notice(), incremental=True)
+    assert meta["chunks"] > 1
+    assert [item.name for item in result.items] == ["Ration card"]
+
+
+def test_large_document_does_not_queue_other_requests(monkeypatch, tmp_path):
+    import threading
+    import time
+
+    from app.services.scheduler import JobContext, current_job, use_job
+
+    monkeypatch.setattr(incremental, "_cache", ChunkCache(tmp_path / "chunks.sqlite3"))
+    monkeypatch.setattr(incremental, "_workers", 2)
+    release = threading.Event()
+    active = {"big": 0, "peak": 0}
+    lock = threading.Lock()
+    clients = []
+
+    def slow_chunk(chunk_text):
+        clients.append(current_job().client_id)
+        with lock:
+            active["big"] += 1
+            active["peak"] = max(active["peak"], active["big"])
+        release.wait(2)
+        with lock:
+            active["big"] -= 1
+        return {"text": "part"}
+
+    def big_request():
+        with use_job(JobContext(client_id="key:big")):
+            incremental.process("simplify", _notice(), {}, slow_chunk)
+
+    worker = threading.Thread(target=big_request)
+    worker.start()
+    time.sleep(0.1)
+    started = time.monotonic()
+    payloads, _ = incremental.process("simplify", "A short unrelated notice.", {}, lambda chunk_text: {"text": "small"})
+    assert payloads == [{"text": "small"}] and time.monotonic() - started < 1
+    release.set()
+    worker.join(5)
+    assert active["peak"] == 2
+    assert set(clients) == {"key:big"}
+
+
+def test_failed_chunk_cancels_the_rest_and_keeps_finished_work(monkeypatch, tmp_path):
+    import threading
+    import time
+
+    import pytest
+
+    from app.services.scheduler import SchedulerRejected
+
+    cache = ChunkCache(tmp_path / "chunks.sqlite3")
+    monkeypatch.setattr(incremental, "_cache", cache)
+    monkeypatch.setattr(incremental, "_workers", 2)
+    release = threading.Event()
+    started = []
+
+    def chunk(chunk_text):
+        started.append(chunk_text)
+        if len(started) == 1:
+            raise SchedulerRejected("queue full")
+        release.wait(2)
+        return {"text": "part"}
+
+    start = time.monotonic()
+    with pytest.raises(SchedulerRejected):
+        incremental.process("simplify", _notice(), {}, chunk)
+    assert time.monotonic() - start < 1
+    release.set()
+    time.sleep(0.2)
+    digests = [c.digest for c in content_defined_chunks(_notice(), min_chars=incremental._min_chunk_chars, max_chars=incremental._max_chunk_chars)]
+    # Chunks not yet started were cancelled; those already running finished and were kept
+    assert len(started) <= 3 < len(digests)
+    assert len(cache.get_many("simplify", incremental.params_key({}), digests)) == len(started) - 1
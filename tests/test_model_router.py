@@ -0,0 +1,178 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from app.services import model_router
+from app.services.model_router import ModelRouter, ModelUnavailable
+from app.utils import metrics
+from app.utils.cancellation import CancelToken, OperationCancelled, current_token, use_token
+
+
+def _slow_until_cancelled(seconds):
+    token = current_token()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        token.raise_if_cancelled()
+        time.sleep(0.005)
+    return "slow"
+
+
+def test_hedge_bounds_tail_latency_and_cancels_loser(monkeypatch):
+    monkeypatch.setattr(model_router, "_hedge_min_ms", 50)
+    monkeypatch.setattr(model_router, "_hedge_default_ms", 50)
+    metrics.reset()
+    router = ModelRouter("primary", "secondary")
+    cancelled = threading.Event()
+
+    def call(model):
+        if model == "primary":
+            try:
+                return _slow_until_cancelled(5)
+            except OperationCancelled:
+                cancelled.set()
+                raise
+        return "fast"
+
+    start = time.monotonic()
+    assert router.complete(call) == "fast"
+    assert time.monotonic() - start < 1
+    assert cancelled.wait(1)
+    assert metrics.counter("llm.router.hedges") == 1
+    assert metrics.counter("llm.router.hedge_wins") == 1
+
+
+def test_failover_and_circuit_breaker(monkeypatch):
+    monkeypatch.setattr(model_router, "_breaker_failures", 2)
+    router = ModelRouter("primary", "secondary", hedge=False)
+    calls = []
+
+    def call(model):
+        calls.append(model)
+        if model == "primary":
+            raise RuntimeError("503 from provider")
+        return "ok"
+
+    for _ in range(3):
+        assert router.complete(call) == "ok"
+    # Breaker opened after two failures, so the third request skips the primary entirely
+    assert calls == ["primary", "secondary", "primary", "secondary", "secondary"]
+    assert router.health("primary").state() == "open"
+
+
+def test_all_breakers_open_fails_fast(monkeypatch):
+    monkeypatch.setattr(model_router, "_breaker_failures", 1)
+    router = ModelRouter("primary", None, hedge=False)
+
+    def failing(model):
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        router.complete(failing)
+    with pytest.raises(ModelUnavailable):
+        router.complete(failing)
+
+
+def test_client_cancel_reaches_model_call():
+    router = ModelRouter("primary", None, hedge=False)
+    token = CancelToken()
+    threading.Timer(0.05, token.cancel).start()
+    with use_token(token), pytest.raises(OperationCancelled):
+        router.complete(lambda model: _slow_until_cancelled(5))
+
+
+class _QueuedScheduler:
+    """Stands in for llm_scheduler: every slot is granted after a local queue wait."""
+
+    def __init__(self, wait_seconds):
+        self.wait_seconds = wait_seconds
+
+    @contextmanager
+    def slot(self):
+        time.sleep(self.wait_seconds)
+        yield
+
+
+def test_queue_wait_is_not_model_latency(monkeypatch):
+    monkeypatch.setattr(model_router, "_hedge_min_ms", 100)
+    monkeypatch.setattr(model_router, "_hedge_default_ms", 100)
+    monkeypatch.setattr(model_router, "llm_scheduler", _QueuedScheduler(0.3))
+    metrics.reset()
+    router = ModelRouter("primary", "secondary")
+
+    def call(model):
+        time.sleep(0.02)
+        return model
+
+    assert router.complete(call) == "primary"
+    assert metrics.counter("llm.router.hedges") == 0
+    assert router.health("primary")._latencies[0] < 200
+
+
+def test_no_hedge_onto_the_same_model_or_over_budget(monkeypatch):
+    monkeypatch.setattr(model_router, "_hedge_min_ms", 30)
+    monkeypatch.setattr(model_router, "_hedge_default_ms", 30)
+    metrics.reset()
+    calls = []
+
+    def call(model):
+        calls.append(model)
+        time.sleep(0.2 if model == "primary" else 0.01)
+        return model
+
+    assert ModelRouter("primary", None).complete(call) == "primary"
+    assert calls == ["primary"] and metrics.counter("llm.router.hedges") == 0
+
+    router = ModelRouter("primary", "secondary")
+    assert router.complete(call) == "secondary"
+    # 5% of two requests rounds down; the one-hedge floor is already spent
+    assert router.complete(call) == "primary"
+    assert metrics.counter("llm.router.hedges") == 1
+    assert metrics.counter("llm.router.hedges_over_budget") == 1
+
+
+def test_refused_hedge_keeps_the_secondary_for_failover(monkeypatch):
+    monkeypatch.setattr(model_router, "_hedge_min_ms", 30)
+    monkeypatch.setattr(model_router, "_hedge_default_ms", 30)
+    metrics.reset()
+    router = ModelRouter("primary", "secondary")
+    # Spend the one-hedge floor so the next slow primary is over budget
+    router._take_hedge(router._track_request())
+    calls = []
+
+    def call(model):
+        calls.append(model)
+        if model == "primary":
+            time.sleep(0.1)
+            raise RuntimeError("502 after a slow start")
+        return "fallback"
+
+    assert router.complete(call) == "fallback"
+    assert calls == ["primary", "secondary"]
+    assert metrics.counter("llm.router.hedges_over_budget") == 1
+    assert metrics.counter("llm.router.failovers") == 1
+
+
+def test_hedge_loser_time_joins_the_latency_window(monkeypatch):
+    monkeypatch.setattr(model_router, "_hedge_min_ms", 50)
+    monkeypatch.setattr(model_router, "_hedge_default_ms", 50)
+    router = ModelRouter("primary", "secondary")
+    cancelled = threading.Event()
+
+    def call(model):
+        if model == "primary":
+            try:
+                return _slow_until_cancelled(5)
+            except OperationCancelled:
+                cancelled.set()
+                raise
+        return "fast"
+
+    assert router.complete(call) == "fast"
+    assert cancelled.wait(1)
+    deadline = time.monotonic() + 1
+    while not router.health("primary")._latencies and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert router.health("primary")._latencies[0] >= 50
+    assert router.health("primary").successes == 0
@@ -0,0 +1,93 @@
+from app.services import llm, pipeline
+from app.services.near_duplicates import NearDuplicateStore, differs_only_by_noise
+from app.services.scheduler import JobContext, use_job
+from app.utils.minhash import LSHIndex, MinHasher, similarity
+
+CIRCULAR = (
+    "Government of Maharashtra Department of Higher Education. Applications are invited for the "
+    "post matric scholarship scheme for the academic year. Eligible students must submit the "
+    "application form along with income certificate, caste certificate, previous year mark sheet, "
+    "bank passbook copy and Aadhaar card before the last date. Incomplete applications will be "
+    "rejected. For details contact the district social welfare office during working hours."
+)
+
+
+def _rescan(text: str) -> str:
+    # Same circular, different OCR noise and applicant name
+    return text.replace("working hours", "working  hours.").replace("Eligible", "Eiigible") + " Applicant: R. Sharma"
+
+
+def _noisy(text: str) -> str:
+    # Same circular, OCR noise only
+    return text.replace("working hours", "working  hours.").replace("Eligible", "Eiigible")
+
+
+def test_minhash_similarity_tracks_overlap():
+    hasher = MinHasher(64)
+    same = similarity(hasher.signature(CIRCULAR), hasher.signature(_rescan(CIRCULAR)))
+    other = similarity(hasher.signature(CIRCULAR), hasher.signature("PAN card application form 49A for individuals " * 5))
+    assert same > 0.6
+    assert other < 0.2
+
+
+def test_lsh_index_is_bounded():
+    hasher = MinHasher(64)
+    index = LSHIndex(64, 8, capacity=2)
+    for i in range(3):
+        index.add(f"doc{i}", hasher.signature(f"document number {i} " + CIRCULAR[: 40 * (i + 1)]))
+    assert len(index) == 2
+    assert "doc0" not in index
+
+
+def test_only_ocr_noise_counts_as_the_same_text():
+    assert differs_only_by_noise(CIRCULAR, _noisy(CIRCULAR))
+    assert not differs_only_by_noise(CIRCULAR, _rescan(CIRCULAR))
+    assert not differs_only_by_noise(CIRCULAR + " Last date 31 March 2024.", CIRCULAR + " Last date 31 March 2025.")
+
+
+def test_store_is_scoped_per_tenant_and_shared_between_workers(tmp_path):
+    path = tmp_path / "nd.sqlite3"
+    store = NearDuplicateStore(path, threshold=0.6)
+    other_worker = NearDuplicateStore(path, threshold=0.6)
+    params = {"language": "en"}
+    store.remember("key:a", CIRCULAR, "simplify", params, {"text": "- Apply for the scholarship"})
+
+    hit = other_worker.lookup("key:a", _rescan(CIRCULAR), "simplify", params)
+    assert hit is not None and hit.payload["text"] == "- Apply for the scholarship" and hit.text == CIRCULAR
+    assert other_worker.lookup("key:b", _rescan(CIRCULAR), "simplify", params) is None
+    assert store.lookup("key:a", _rescan(CIRCULAR), "simplify", {"language": "hi"}) is None
+    assert store.lookup("key:a", _rescan(CIRCULAR), "checklist", params) is None
+    store.close()
+    other_worker.close()
+
+    reopened = NearDuplicateStore(path, threshold=0.6)
+    assert reopened.lookup("key:a", _rescan(CIRCULAR), "simplify", params) is not None
+    reopened.close()
+
+
+def test_pipeline_reuses_noise_only_rescans_and_hints_the_rest(monkeypatch, tmp_path):
+    store = NearDuplicateStore(tmp_path / "nd.sqlite3", threshold=0.6)
+    monkeypatch.setattr(pipeline, "get_store", lambda: store)
+    # The circular is also a known template; exercise the near-duplicate layer alone
+    monkeypatch.setattr(pipeline, "get_registry", lambda: None)
+    calls = []
+
+    def fake_chat(messages, response_format=None, temperature=0.2):
+        calls.append(messages[-1]["content"])
+        return "- Submit the form before the last date"
+
+    monkeypatch.setattr(llm, "_chat", fake_chat)
+    with use_job(JobContext(client_id="key:a")):
+        first, meta = pipeline.simplify(CIRCULAR)
+        second, meta2 = pipeline.simplify(_noisy(CIRCULAR))
+        assert len(calls) == 1
+        assert meta["source"] == "llm" and meta2["source"] == "near_duplicate"
+        assert second.text == first.text
+
+        _, meta3 = pipeline.simplify(_rescan(CIRCULAR))
+        assert len(calls) == 2 and meta3 == {"source": "llm", "hint": "near_duplicate", "similarity": meta3["similarity"]}
+        assert "Earlier answer:\n- Submit the form before the last date" in calls[-1]
+
+    with use_job(JobContext(client_id="key:b")):
+        _, meta4 = pipeline.simplify(_noisy(CIRCULAR))
+    assert len(calls) == 3 and meta4 == {"source": "llm"}
@@ -19,4 +19,107 @@ def test_extract_text_from_pdf_tesseract(monkeypatch):
     monkeypatch.setattr(ocr.pytesseract, "image_to_string", lambda img, lang=None: "Page 1")
 
     text = ocr.extract_text_from_file(b"%PDF-1.7 fake bytes%", filename="doc.pdf", use_vision=False, language_hint="en")
-    assert text == "Page 1" 
\ No newline at end of file
+    assert text == "Page 1" 
+
+def test_missing_hint_uses_detected_script_and_rotates(monkeypatch, sample_png_bytes):
+    calls = {}
+
+    def fake_osd(image, output_type=None):
+        calls["osd_size"] = image.size
+        return {"rotate": 180, "script": "Devanagari", "script_conf": 5.0}
+
+    def fake_image_to_string(image, lang=None):
+        calls["lang"] = lang
+        return "नमस्ते"
+
+    monkeypatch.setattr(ocr.pytesseract, "image_to_osd", fake_osd)
+    monkeypatch.setattr(ocr.pytesseract, "image_to_string", fake_image_to_string)
+    monkeypatch.setattr(ocr, "_installed_langs", {"eng", "hin", "mar"})
+
+    text = ocr.extract_text_from_file(sample_png_bytes, filename="doc.png", use_vision=False, language_hint=None)
+    assert text == "नमस्ते"
+    assert calls["lang"] == "hin+mar+eng"
+
+    # Marathi data not installed: the hint is trimmed to what tesseract has
+    monkeypatch.setattr(ocr, "_installed_langs", {"eng", "hin"})
+    ocr.extract_text_from_file(sample_png_bytes, filename="doc.png", use_vision=False, language_hint=None)
+    assert calls["lang"] == "hin+eng"
+
+
+def test_osd_runs_on_downscaled_copy(monkeypatch):
+    seen = {}
+
+    def fake_osd(image, output_type=None):
+        seen["size"] = image.size
+        return {"rotate": 0, "script": "Latin", "script_conf": 3.0}
+
+    monkeypatch.setattr(ocr.pytesseract, "image_to_osd", fake_osd)
+    big = Image.new("RGB", (4000, 3000), color="white")
+    rotate, script = ocr._detect_orientation_and_script(big)
+    assert (rotate, script) == (0, "Latin")
+    assert max(seen["size"]) <= ocr._osd_max_side
+
+
+def test_failed_osd_falls_back_to_english(monkeypatch):
+    def broken_osd(image, output_type=None):
+        raise RuntimeError("osd.traineddata missing")
+
+    monkeypatch.setattr(ocr.pytesseract, "image_to_osd", broken_osd)
+    image, lang = ocr._prepare_for_tesseract(Image.new("RGB", (10, 10)), None)
+    assert lang == "eng"
+
+
+def test_iter_pages_ocrs_pdf_pages_without_text_layer(monkeypatch):
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    writer.add_blank_page(width=200, height=200)
+    writer.add_blank_page(width=200, height=200)
+    buf = io.BytesIO()
+    writer.write(buf)
+
+    monkeypatch.setattr(ocr._PdfRenderer, "render", lambda self, index: Image.new("RGB", (10, 10), color="white"))
+    monkeypatch.setattr(ocr.pytesseract, "image_to_string", lambda img, lang=None: "Scanned page")
+
+    pages = list(ocr.iter_extracted_pages(buf.getvalue(), filename="scan.pdf", language_hint="en"))
+    assert [p.page for p in pages] == [1, 2]
+    assert all(p.method == "tesseract" and p.text == "Scanned page" for p in pages)
+
+
+def test_vision_upload_is_not_decoded(monkeypatch, sample_png_bytes):
+    sent = []
+    monkeypatch.setattr(ocr, "_vision_ocr_image_bytes", lambda image_bytes, hint: sent.append(image_bytes) or "Vision text")
+    monkeypatch.setattr(ocr, "_load_pixels", lambda image: (_ for _ in ()).throw(AssertionError("decoded")))
+
+    pages = list(ocr.iter_extracted_pages(sample_png_bytes, filename="photo.png", use_vision=True))
+    assert [(p.page, p.text, p.method) for p in pages] == [(1, "Vision text", "vision")]
+    assert sent == [sample_png_bytes]
+
+
+def test_multipage_tiff_frames_are_pages_in_order(monkeypatch):
+    import time
+
+    frames = [Image.new("1", (100 + i, 50), color=1) for i in range(5)]
+    buf = io.BytesIO()
+    frames[0].save(buf, format="TIFF", save_all=True, append_images=frames[1:])
+
+    def fake_tesseract(image, hint, cancel_token=None):
+        # Earlier frames finish last, so ordering comes from the pipeline, not timing
+        time.sleep((105 - image.size[0]) * 0.01)
+        return f"frame {image.size[0] - 100} ({image.mode})"
+
+    monkeypatch.setattr(ocr, "_tesseract_ocr_image", fake_tesseract)
+    pages = list(ocr.iter_extracted_pages(buf.getvalue(), filename="fax.tif", language_hint="en"))
+    assert [p.page for p in pages] == [1, 2, 3, 4, 5]
+    assert [p.text for p in pages] == [f"frame {i} (1)" for i in range(5)]
+
+
+def test_huge_photo_is_downsampled_before_ocr(monkeypatch):
+    buf = io.BytesIO()
+    Image.new("RGB", (2400, 1800), color="white").save(buf, format="JPEG")
+    seen = {}
+    monkeypatch.setattr(ocr, "_max_image_side", 600)
+    monkeypatch.setattr(ocr, "_tesseract_ocr_image", lambda image, hint, cancel_token=None: seen.setdefault("size", image.size) and "ok")
+
+    assert ocr.extract_text_from_file(buf.getvalue(), filename="photo.jpg", language_hint="en") == "ok"
+    assert max(seen["size"]) == 600
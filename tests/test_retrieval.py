@@ -0,0 +1,84 @@
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services.retrieval import BM25Index, tokenize
+from app.utils.chunking import split_into_chunks
+
+client = TestClient(main.app)
+
+NOTICE = "\n\n".join([
+    "Government of Maharashtra. Post matric scholarship scheme for the academic year 2024-25.",
+    "Eligibility: students whose family income is below 2.5 lakh per year may apply.",
+    "Documents required: income certificate, caste certificate, Aadhaar card and bank passbook.",
+    "The last date for submitting the application is 31 October. Late applications will be rejected.",
+    "छात्रवृत्ति के लिए आवेदन जिला समाज कल्याण कार्यालय में जमा करें।",
+])
+
+
+def test_tokenize_keeps_indic_words_whole():
+    tokens = tokenize("छात्रवृत्ति के लिए आवेदन। The LAST date")
+    assert "छात्रवृत्ति" in tokens
+    assert "आवेदन" in tokens
+    assert "के" not in tokens and "the" not in tokens
+    assert "last" in tokens
+
+
+def test_chunks_respect_limits_and_offsets():
+    text = "\n\n".join(["word " * 100] * 12)
+    chunks = split_into_chunks(text, target_chars=800, max_chars=1500)
+    assert len(chunks) > 1
+    assert all(len(c.text) <= 1500 for c in chunks)
+    assert [c.index for c in chunks] == list(range(len(chunks)))
+    assert text[chunks[1].start:].startswith("word")
+
+
+def test_bm25_ranks_relevant_chunk_first():
+    index = BM25Index(split_into_chunks(NOTICE, target_chars=60, max_chars=200))
+    top, _ = index.search("What is the last date for the application?", k=1)[0]
+    assert "31 October" in top.text
+    top, _ = index.search("छात्रवृत्ति आवेदन कहाँ जमा करें", k=1)[0]
+    assert "कार्यालय" in top.text
+
+
+def test_ask_sends_only_retrieved_passages(monkeypatch):
+    seen = {}
+
+    def fake_answer(question, passages, language="en"):
+        seen["passages"] = passages
+        return "31 October [1]"
+
+    monkeypatch.setattr(main, "answer_question_with_llm", fake_answer)
+    filler = "\n\n".join(f"Clause {i}: the scheme is administered by the district office as per rules." for i in range(40))
+    doc = main.documents.register(NOTICE + "\n\n" + filler)
+    resp = client.post("/ask", json={"question": "Which documents are required?", "document_id": doc.document_id, "k": 1})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["answer"] == "31 October [1]"
+    assert len(seen["passages"]) == 1
+    assert "income certificate" in seen["passages"][0]
+    assert body["context_chars"] <= 1500
+
+
+def test_ask_unknown_document_is_404():
+    resp = client.post("/ask", json={"question": "anything", "document_id": "missing"})
+    assert resp.status_code == 404
+
+
+def test_document_registered_by_another_worker_can_be_asked(tmp_path):
+    from app.services.documents import DocumentStore
+
+    uploader = DocumentStore(tmp_path / "documents.sqlite3")
+    other_worker = DocumentStore(tmp_path / "documents.sqlite3", max_documents=1)
+    doc = uploader.register(NOTICE)
+    found = other_worker.get(doc.document_id)
+    assert found is not None and found.text == NOTICE
+    top, _ = found.index.search("last date", k=1)[0]
+    assert "31 October" in top.text
+    assert other_worker.get("0" * 20) is None
+
+    small = DocumentStore(tmp_path / "documents.sqlite3", max_persisted=1)
+    small.register("Another notice entirely.")
+    assert other_worker.get(doc.document_id) is not None  # still in that worker's index cache
+    assert DocumentStore(tmp_path / "documents.sqlite3").get(doc.document_id) is None
+    for store in (uploader, other_worker, small):
+        store.close()
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services import scheduler as sched
+from app.services.scheduler import BackendScheduler, DeadlineExceeded, JobContext, Overloaded
+
+
+def _hold_slot(backend, job, started, release):
+    with backend.slot(job):
+        started.set()
+        release.wait(5)
+
+
+def _queue(backend, job, order):
+    def run():
+        try:
+            with backend.slot(job):
+                order.append(job.client_id)
+        except Exception as e:
+            order.append(type(e).__name__)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_queued(backend, n):
+    deadline = time.time() + 5
+    while backend.stats()["queued"] < n and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_interactive_beats_batch_and_clients_share_fairly():
+    backend = BackendScheduler("test", capacity=1, max_queue=10)
+    started, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_hold_slot, args=(backend, JobContext(client_id="h"), started, release))
+    holder.start()
+    started.wait(5)
+
+    order = []
+    threads = [
+        _queue(backend, JobContext(client_id="bulk", priority="batch"), order),
+    ]
+    _wait_queued(backend, 1)
+    for client in ["a", "a", "b"]:
+        threads.append(_queue(backend, JobContext(client_id=client), order))
+        _wait_queued(backend, len(threads))
+    release.set()
+    for thread in threads + [holder]:
+        thread.join(5)
+    # Interactive first, round-robin between clients a and b, batch last
+    assert order == ["a", "b", "a", "bulk"]
+
+
+def test_full_queue_sheds_lowest_priority_first():
+    backend = BackendScheduler("test", capacity=1, max_queue=1)
+    started, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_hold_slot, args=(backend, JobContext(client_id="h"), started, release))
+    holder.start()
+    started.wait(5)
+
+    order = []
+    batch = _queue(backend, JobContext(client_id="bulk", priority="batch"), order)
+    _wait_queued(backend, 1)
+    interactive = _queue(backend, JobContext(client_id="user"), order)
+    batch.join(5)
+    assert order == ["Overloaded"]
+
+    with pytest.raises(Overloaded):
+        backend.acquire(JobContext(client_id="late", priority="speculative"))
+    release.set()
+    interactive.join(5)
+    holder.join(5)
+    assert order == ["Overloaded", "user"]
+
+
+def test_deadline_fails_fast_when_queue_is_too_long():
+    backend = BackendScheduler("test", capacity=1, max_queue=10)
+    backend.release(service_ms=500)  # seed the service-time estimate
+    backend._active = 1
+    job = JobContext(deadline=time.monotonic() + 0.1)
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        backend.acquire(job)
+    assert time.monotonic() - start < 0.05
+
+
+def test_rejection_maps_to_503_with_retry_after(monkeypatch):
+    def overloaded(**kwargs):
+        raise Overloaded("llm is saturated", retry_after=3)
+
+    monkeypatch.setattr(main.pipeline, "simplify", overloaded)
+    resp = TestClient(main.app).post("/simplify", json={"text": "hello"}, headers={"X-Priority": "batch"})
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "3"
+
+
+def test_job_context_from_headers():
+    job = sched.job_from_headers({"x-api-key": "secret", "x-priority": "batch", "x-deadline-ms": "2000"}, "10.0.0.1")
+    assert job.client_id.startswith("key:") and "secret" not in job.client_id
+    assert job.priority == "batch" and job.priority_explicit
+    assert 0 < job.remaining_ms() <= 2000
+    anonymous = sched.job_from_headers({}, "10.0.0.1")
+    assert anonymous.client_id == "ip:10.0.0.1"
+    anonymous.demote("batch")
+    assert anonymous.priority == "batch"
@@ -0,0 +1,73 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from app import server
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_settings_are_read_from_environment(monkeypatch):
+    monkeypatch.setenv("PORT", "9123")
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    monkeypatch.setenv("MAX_REQUESTS", "250")
+    monkeypatch.setenv("KEEPALIVE", "15")
+    monkeypatch.setenv("PRELOAD_APP", "false")
+
+    settings = server.load_settings()
+    options = server.gunicorn_options(settings)
+    assert options["bind"].endswith(":9123")
+    assert options["workers"] == 3
+    assert options["max_requests"] == 250
+    assert options["keepalive"] == 15
+    assert options["preload_app"] is False
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="SIGTERM drain is POSIX-only")
+def test_multi_worker_smoke_and_graceful_shutdown():
+    port = _free_port()
+    env = dict(os.environ, HOST="127.0.0.1", PORT=str(port), WEB_CONCURRENCY="2", WARMUP="off")
+    proc = subprocess.Popen([sys.executable, "-m", "app.server"], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 30
+        body = None
+        while time.time() < deadline:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as resp:
+                    body = json.loads(resp.read())
+                    break
+            except OSError:
+                time.sleep(0.2)
+        assert body is not None and body["status"] == "healthy"
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        returncode = proc.wait(timeout=30)
+    assert returncode == 0
+
+
+@pytest.mark.skipif(not server._has_gunicorn, reason="gunicorn not installed")
+def test_preload_respects_warmup_off(monkeypatch):
+    from app.services import warmup
+
+    calls = []
+    monkeypatch.setattr(warmup, "_warmup_mode", "off")
+    monkeypatch.setattr(warmup, "warm_up_backends", lambda: calls.append(1))
+    settings = server.load_settings()
+    settings.preload_app = True
+    server._GunicornServer(settings).load()
+    assert calls == []
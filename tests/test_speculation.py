@@ -0,0 +1,110 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services import llm, pipeline
+from app.services.scheduler import BackendScheduler, JobContext
+from app.models.schemas import SimplifyResponse
+from app.services.speculation import SharedResults, Speculator
+from app.utils import metrics
+
+client = TestClient(main.app)
+
+NOTICE = "Notice under section 138 regarding a dishonoured cheque issued by the tenant. " * 5
+
+
+def test_upload_speculation_serves_simplify_and_checklist(monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(pipeline, "speculator", Speculator())
+    monkeypatch.setattr(pipeline, "get_store", lambda: None)
+    monkeypatch.setattr(main, "extract_text_from_file", lambda **kwargs: NOTICE)
+    calls = []
+
+    def fake_chat(messages, response_format=None, temperature=0.2):
+        calls.append(messages)
+        if "JSON" in messages[-1]["content"]:
+            return '{"items":[{"name":"Cheque copy","mandatory":true,"copies":1}]}'
+        return "- Pay within 15 days"
+
+    monkeypatch.setattr(llm, "_chat", fake_chat)
+    resp = client.post("/upload?speculate=true", files={"file": ("notice.png", b"png-bytes", "image/png")})
+    body = resp.json()
+    assert body["speculating"] == ["simplify", "checklist"]
+
+    simplified = client.post("/simplify", json={"text": body["extracted_text"], "language": "en", "reading_level": "simple"}).json()
+    checklist = client.post("/checklist", json={"text": body["extracted_text"], "document_type": "government_form"}).json()
+    assert simplified["speculative"] is True and simplified["simplified_text"] == "- Pay within 15 days"
+    assert checklist["speculative"] is True
+    assert len(calls) == 2
+
+
+def test_claim_joins_in_flight_task_and_respects_budget():
+    metrics.reset()
+    speculator = Speculator(max_inflight=2, budget_chars=100)
+    release = threading.Event()
+    runs = []
+
+    def slow(text, language):
+        runs.append(text)
+        release.wait(2)
+        return f"done:{text}"
+
+    assert speculator.schedule("simplify", "a" * 60, {"language": "en"}, slow)
+    # Over the character budget
+    assert not speculator.schedule("simplify", "b" * 60, {"language": "en"}, slow)
+    threading.Timer(0.1, release.set).start()
+    assert speculator.claim("simplify", "a" * 60, {"language": "en"}) == "done:" + "a" * 60
+    assert speculator.claim("simplify", "c", {"language": "en"}) is None
+    assert len(runs) == 1
+    assert metrics.counter("speculation.simplify.joined") == 1
+    assert metrics.counter("speculation.skipped_budget") == 1
+    assert speculator.stats()["simplify"]["hit_rate"] == 0.5
+
+
+def test_workers_share_speculation(tmp_path):
+    metrics.reset()
+    path = tmp_path / "speculation.sqlite3"
+    uploader, other_worker = Speculator(shared=SharedResults(path)), Speculator(shared=SharedResults(path))
+    release = threading.Event()
+    runs = []
+
+    def slow(text, language):
+        runs.append(text)
+        release.wait(2)
+        return SimplifyResponse(language=language, reading_level="simple", text="- Pay within 15 days"), {"source": "llm"}
+
+    assert uploader.schedule("simplify", NOTICE, {"language": "en"}, slow)
+    # The follow-up lands on another worker: nothing is recomputed, the claim waits for the owner
+    assert other_worker.schedule("simplify", NOTICE, {"language": "en"}, slow)
+    threading.Timer(0.2, release.set).start()
+    response, meta = other_worker.claim("simplify", NOTICE, {"language": "en"})
+    assert response.text == "- Pay within 15 days" and meta == {"source": "llm"}
+    assert runs == [NOTICE]
+    assert metrics.counter("speculation.simplify.elsewhere") == 1
+    assert metrics.counter("speculation.simplify.joined") == 1
+    assert other_worker.claim("simplify", NOTICE, {"language": "hi"}) is None
+
+
+def test_promote_moves_queued_waiter_ahead():
+    backend = BackendScheduler("test", capacity=1, max_queue=10)
+    speculative = JobContext(client_id="a", priority="speculative")
+    batch = JobContext(client_id="b", priority="batch")
+    order = []
+    backend.acquire(JobContext())
+
+    def wait_for(job, name):
+        backend.acquire(job)
+        order.append(name)
+        backend.release()
+
+    threads = [threading.Thread(target=wait_for, args=(speculative, "speculative")), threading.Thread(target=wait_for, args=(batch, "batch"))]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    assert backend.promote(speculative, "interactive")
+    backend.release()
+    for thread in threads:
+        thread.join(2)
+    assert order == ["speculative", "batch"]
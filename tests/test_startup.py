@@ -0,0 +1,38 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from app.services import warmup
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Heavy optional SDKs must not be imported just by loading the app.
+LAZY_MODULES = ["openai", "fitz", "pypdf", "google.cloud.vision", "google.cloud.translate", "googletrans"]
+IMPORT_BUDGET_SECONDS = 3.0
+
+
+def test_app_import_is_lazy_and_within_budget():
+    probe = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import app.main\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    assert result["loaded"] == []
+    assert result["elapsed"] < IMPORT_BUDGET_SECONDS
+
+
+def test_warm_up_loads_only_configured_backends(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.delenv("GOOGLE_APPLICATION_CREDENTIALS", raising=False)
+    monkeypatch.setitem(warmup._state, "status", "pending")
+
+    state = warmup.warm_up_backends()
+    assert state["status"] == "ready"
+    assert "openai" not in state["loaded"]
+    assert "vision" not in state["loaded"]
+    assert "pypdf" in state["loaded"]
@@ -0,0 +1,73 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.utils.static_files import CachedIndex, PrecompressedStaticFiles, precompress_directory
+
+
+def _build(tmp_path):
+    static = tmp_path / "static" / "js"
+    static.mkdir(parents=True)
+    (static / "main.3f2a9c1b.js").write_text("console.log('aidocmate');\n" * 200)
+    (tmp_path / "index.html").write_text("<html><body>" + "<div>AIDocMate</div>" * 100 + "</body></html>")
+    return tmp_path
+
+
+def _client(build):
+    app = FastAPI()
+    index = CachedIndex(build / "index.html")
+    app.mount("/static", PrecompressedStaticFiles(directory=str(build / "static")), name="static")
+
+    @app.get("/")
+    async def root(request: Request):
+        return index.response(request.headers)
+
+    return TestClient(app)
+
+
+def test_hashed_assets_are_precompressed_and_immutable(tmp_path):
+    build = _build(tmp_path)
+    assert precompress_directory(build) >= 2
+    assert (build / "static" / "js" / "main.3f2a9c1b.js.gz").exists()
+    # Second run finds everything up to date
+    assert precompress_directory(build) == 0
+
+    client = _client(build)
+    resp = client.get("/static/js/main.3f2a9c1b.js", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "immutable" in resp.headers["cache-control"]
+    assert resp.headers["content-type"].startswith(("application/javascript", "text/javascript"))
+    assert resp.text.startswith("console.log")
+
+    plain = client.get("/static/js/main.3f2a9c1b.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+
+def test_index_is_served_from_memory_with_etag(tmp_path):
+    build = _build(tmp_path)
+    client = _client(build)
+
+    first = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+    etag = first.headers["etag"]
+
+    (build / "index.html").unlink()  # cached: no further disk reads
+    again = client.get("/", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert "AIDocMate" in client.get("/").text
+
+
+def test_precompressed_variants_are_replaced_atomically(tmp_path, monkeypatch):
+    import os
+
+    build = _build(tmp_path)
+    asset = build / "static" / "js" / "main.3f2a9c1b.js"
+    replaced = []
+    real_replace = os.replace
+    monkeypatch.setattr(os, "replace", lambda src, dst: replaced.append(str(dst)) or real_replace(src, dst))
+
+    precompress_directory(build)
+    assert str(asset) + ".gz" in replaced
+    assert not [p for p in asset.parent.iterdir() if p.name.endswith(".tmp")]
@@ -0,0 +1,73 @@
+import time
+
+from app.services import llm, pipeline, templates
+from app.services.templates import TemplateRegistry
+
+SCHOLARSHIP = (
+    "Government of Maharashtra. Post Matric Scholarship scheme for the academic year 2024-25.\n"
+    "Eligibility: students whose family income is below Rs. 2.5 lakh per annum.\n"
+    "Documents: income certificate, caste certificate, previous mark sheet, bank passbook and Aadhaar.\n"
+    "Last date for submission: 31 October 2024. Incomplete applications will be rejected."
+)
+
+PAN_FORM = (
+    "Form No. 49A\nApplication for Allotment of Permanent Account Number\n[In the case of Indian Citizens]\n"
+    "Income Tax Department. Assessing Officer (AO code)\n1 Full Name\n3 Date of Birth\n7 Address for Communication\n"
+    "9 Telephone Number & Email ID\n15 Documents submitted as Proof of Identity, Proof of Address (Aadhaar)\nDeclaration"
+)
+
+
+def _registry():
+    return TemplateRegistry.from_directory(templates._templates_dir)
+
+
+def test_matches_known_forms_and_rejects_others():
+    registry = _registry()
+    assert registry.match(SCHOLARSHIP).template.id == "post_matric_scholarship"
+    assert registry.match(PAN_FORM).template.id == "pan_form_49a"
+    assert registry.match("Notice under section 138 of the Negotiable Instruments Act for a dishonoured cheque.") is None
+
+
+def test_matching_is_sub_millisecond():
+    registry = _registry()
+    fp = templates.fingerprint(SCHOLARSHIP * 20)
+    start = time.perf_counter()
+    for _ in range(100):
+        for template in registry.templates:
+            template.score(fp)
+    assert (time.perf_counter() - start) / 100 < 0.001
+
+
+def test_regex_fields_fill_precomputed_outputs_without_llm(monkeypatch):
+    def no_chat(*args, **kwargs):
+        raise AssertionError("LLM should not be called")
+
+    monkeypatch.setattr(llm, "_chat", no_chat)
+    monkeypatch.setattr(pipeline, "get_registry", _registry)
+    result, meta = pipeline.simplify(SCHOLARSHIP, reading_level="simple")
+    assert meta == {"source": "template", "template": "post_matric_scholarship"}
+    assert "31 October 2024" in result.text
+    assert "2.5 lakh" in result.text
+
+    checklist, meta = pipeline.checklist(SCHOLARSHIP, document_type="government_form")
+    assert meta["source"] == "template"
+    assert any("31 October 2024" in (item.notes or "") for item in checklist.items)
+
+
+def test_missing_fields_use_one_small_llm_call(monkeypatch):
+    calls = []
+
+    def fake_chat(messages, response_format=None, temperature=0.2):
+        calls.append(messages)
+        return '{"fee": "107"}'
+
+    monkeypatch.setattr(llm, "_chat", fake_chat)
+    registry = _registry()
+    match = registry.match(PAN_FORM)
+    result = registry.simplify(match, PAN_FORM, "en", "basic", True)
+    registry.checklist(match, PAN_FORM, None, None)
+    assert "fee of 107" in result.text
+    assert len(calls) == 1
+    # Other languages/levels and user-specific checklists still go to the LLM
+    assert registry.simplify(match, PAN_FORM, "hi", "basic", True) is None
+    assert registry.checklist(match, PAN_FORM, None, "farmer") is None
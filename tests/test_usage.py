@@ -0,0 +1,138 @@
+import sqlite3
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services import llm, pipeline, usage
+from app.services.scheduler import JobContext, client_id_from_headers, use_job
+from app.services.usage import UsageLedger
+
+client = TestClient(main.app)
+
+
+def _rows(path):
+    with sqlite3.connect(str(path)) as db:
+        return db.execute("SELECT tenant, endpoint, requests, latency_ms, latency_ms_max FROM usage ORDER BY endpoint").fetchall()
+
+
+def test_charges_are_batched_until_flush(tmp_path):
+    ledger = UsageLedger(tmp_path / "usage.sqlite3", flush_seconds=0)
+    for latency in (10, 30, 20):
+        ledger.charge("key:a", "/simplify", requests=1, latency_ms=latency, latency_ms_max=latency)
+    ledger.charge("key:a", "/ask", requests=1, latency_ms=5, latency_ms_max=5)
+    assert _rows(tmp_path / "usage.sqlite3") == []
+    assert ledger.today("key:a")["requests"] == 4
+
+    assert ledger.flush() == 2
+    ledger.charge("key:a", "/ask", requests=1, latency_ms=50, latency_ms_max=50)
+    ledger.flush()
+    assert _rows(tmp_path / "usage.sqlite3") == [("key:a", "/ask", 2, 55, 50), ("key:a", "/simplify", 3, 60, 30)]
+    report = ledger.report()["tenants"]["key:a"]
+    assert report["requests"] == 5
+    assert report["endpoints"]["/simplify"]["latency_ms_avg"] == 20.0
+    assert report["latency_ms_max"] == 50
+
+
+def test_stream_usage_is_charged_to_the_current_tenant(monkeypatch, tmp_path):
+    ledger = UsageLedger(tmp_path / "usage.sqlite3", flush_seconds=0)
+    monkeypatch.setattr(usage, "_ledger", ledger)
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="ok"))], usage=None),
+            SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30)),
+        ]
+        return (chunk for chunk in chunks)
+
+    stream_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    with use_job(JobContext(client_id="key:abc", endpoint="/simplify")):
+        assert llm._complete(stream_client, "gpt-4o-mini", [{"role": "user", "content": "hi"}], 0.2) == "ok"
+    assert calls[0]["stream_options"] == {"include_usage": True}
+    ledger.flush()
+    assert ledger.report()["tenants"]["key:abc"]["endpoints"]["/simplify"]["total_tokens"] == 150
+
+
+def test_exhausted_quota_is_rejected_before_any_work(monkeypatch, tmp_path):
+    ledger = UsageLedger(tmp_path / "usage.sqlite3", flush_seconds=0)
+    monkeypatch.setattr(usage, "_ledger", ledger)
+    monkeypatch.setattr(usage, "_daily_tokens", 100)
+    monkeypatch.setattr(pipeline, "get_registry", lambda: None)
+    monkeypatch.setattr(pipeline, "get_store", lambda: None)
+    calls = []
+    monkeypatch.setattr(llm, "_chat", lambda messages, response_format=None, temperature=0.2: calls.append(1) or "- Done")
+    over = client_id_from_headers({"x-api-key": "runaway"})
+    ledger.charge(over, "/simplify", prompt_tokens=90, completion_tokens=15)
+
+    resp = client.post("/simplify", json={"text": "Submit the form."}, headers={"X-API-Key": "runaway", "Origin": "https://aidocmate.example"})
+    assert resp.status_code == 429 and int(resp.headers["retry-after"]) >= 1
+    assert resp.headers["access-control-allow-origin"] == "https://aidocmate.example"
+    assert calls == []
+
+    resp = client.post("/simplify", json={"text": "Submit the form."}, headers={"X-API-Key": "other"})
+    assert resp.status_code == 200 and calls == [1]
+
+    report = client.get("/usage", headers={"X-API-Key": "runaway"}).json()["tenants"]
+    assert list(report) == [over]
+    assert report[over]["rejected"] == 1 and report[over]["total_tokens"] == 105
+    assert report[over]["quota"]["tokens"] == 100
+
+
+def test_usage_report_is_limited_to_the_callers_tenant(monkeypatch, tmp_path):
+    ledger = UsageLedger(tmp_path / "usage.sqlite3", flush_seconds=0)
+    monkeypatch.setattr(usage, "_ledger", ledger)
+    mine, theirs = client_id_from_headers({"x-api-key": "mine"}), client_id_from_headers({"x-api-key": "theirs"})
+    ledger.charge(mine, "/ask", requests=1)
+    ledger.charge(theirs, "/ask", requests=1)
+    ledger.charge("ip:10.0.0.7", "/ask", requests=1)
+
+    assert list(client.get("/usage", headers={"X-API-Key": "mine"}).json()["tenants"]) == [mine]
+    assert client.get("/usage", params={"tenant": theirs}, headers={"X-API-Key": "mine"}).status_code == 403
+    assert client.get("/usage", headers={"X-Admin-Key": "guess"}).json()["tenants"] == {}
+
+    monkeypatch.setattr(usage, "_admin_key", "s3cret")
+    everyone = client.get("/usage", headers={"X-Admin-Key": "s3cret"}).json()["tenants"]
+    assert set(everyone) == {mine, theirs, "ip:10.0.0.7"}
+    assert list(client.get("/usage", params={"tenant": theirs}, headers={"X-Admin-Key": "s3cret"}).json()["tenants"]) == [theirs]
+
+
+def test_quota_counts_spend_flushed_by_other_workers(monkeypatch, tmp_path):
+    monkeypatch.setattr(usage, "_daily_tokens", 100)
+    worker_a = UsageLedger(tmp_path / "usage.sqlite3", flush_seconds=0)
+    worker_b = UsageLedger(tmp_path / "usage.sqlite3", flush_seconds=0)
+    worker_a.charge("key:a", "/simplify", prompt_tokens=60)
+    worker_b.check_quota("key:a", "/simplify")
+    worker_a.flush()
+    worker_b.charge("key:a", "/simplify", prompt_tokens=50)
+    try:
+        worker_b.check_quota("key:a", "/simplify")
+    except usage.QuotaExceeded:
+        pass
+    else:
+        raise AssertionError("quota should count the other worker's flushed tokens")
+
+
+def test_stream_closed_early_is_charged_an_estimate(monkeypatch, tmp_path):
+    from app.utils.cancellation import CancelToken, OperationCancelled, use_token
+
+    ledger = UsageLedger(tmp_path / "usage.sqlite3", flush_seconds=0)
+    monkeypatch.setattr(usage, "_ledger", ledger)
+    token = CancelToken()
+
+    def create(**kwargs):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="partial answer"))], usage=None)
+        # A losing hedge is cancelled before the provider's final usage chunk
+        token.cancel("superseded by another model")
+        yield SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=999, completion_tokens=999))
+
+    stream_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    with use_job(JobContext(client_id="key:abc", endpoint="/simplify")), use_token(token):
+        try:
+            llm._complete(stream_client, "gpt-4o-mini", [{"role": "user", "content": "word " * 40}], 0.2)
+        except OperationCancelled:
+            pass
+    ledger.flush()
+    charged = ledger.report()["tenants"]["key:abc"]["endpoints"]["/simplify"]["total_tokens"]
+    assert 0 < charged < 999